@@ -0,0 +1,653 @@
+#!/usr/bin/env python3
+"""
+CodeCRISPR benchmark suite
+
+    python3 benchmarks/bench.py run [--tools python_tool,sql_tool] [--sizes 1000,10000]
+                                    [--profiles typical,nested] [--repeat 3]
+                                    [--extras startup,edits,api,diff,map,classify] [-o FILE]
+                                    [--save-baseline]
+    python3 benchmarks/bench.py compare [BASELINE] [RESULTS] [--threshold 10]
+
+`run` generates synthetic files (see corpora.py) for every tool in
+LANGUAGE_MAP, caches them under benchmarks/data/, and measures each stage
+of an edit in a fresh interpreter per case: _read_file(), parse,
+`--inspect --json` as a subprocess, one replace_method(),
+batch_replace_methods() with up to 1,000 updates, and save. Each stage
+records its best wall time over --repeat runs and its tracemalloc peak;
+each case records the peak RSS of its process. Extras measure CLI startup,
+10,000 edits on a file with 100,000 blocks, 1,000 concurrent requests
+through the async library API, preview diffs of 10,000-line blocks with
+each diff algorithm, the memory a 100,000-block reference map retains, and
+the lines per second each tool's signature classifier and parser get
+through on a 100,000-line file. Results are written as JSON
+(benchmarks/results/latest.json by default).
+
+`compare` reports every measurement that got slower or bigger than the
+baseline by more than --threshold percent, and exits with status 1 if
+there is any.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+DATA_DIR = os.path.join(BENCH_DIR, 'data')
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+LATEST = os.path.join(RESULTS_DIR, 'latest.json')
+BASELINE = os.path.join(RESULTS_DIR, 'baseline.json')
+
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+import codecrispr  # noqa: E402
+from corpora import PROFILES, generate  # noqa: E402
+
+# Updates in the batch stage
+BATCH_UPDATES = 1000
+# Blocks and edits of the `edits` extra, and the tools it runs for
+EDIT_BLOCKS = 100_000
+EDIT_COUNT = 10_000
+EDIT_TOOLS = ('python_tool', 'sql_tool')
+# Concurrent requests of the `api` extra, the files they target, and the
+# share of them that are previews and replacements (the rest are inspects)
+API_REQUESTS = 1000
+API_FILES = 20
+API_MIX = (0.1, 0.1)
+# Block length of the `diff` extra
+DIFF_LINES = 10_000
+# Blocks of the `map` extra, and the lookups by name it times
+MAP_BLOCKS = 100_000
+MAP_LOOKUPS = 10_000
+# Lines of the corpus the `classify` extra runs each tool over
+CLASSIFY_LINES = 100_000
+# Changes smaller than these are noise, whatever the percentage
+MIN_SECONDS = 0.001
+MIN_KIB = 256
+
+# The CLI runs with default settings and no reference-map cache
+CLI_ENV = dict(os.environ, CODECRISPR_CONFIG=os.devnull, CODECRISPR_CACHE_ENABLED='false')
+
+
+def _tools():
+    return sorted(set(codecrispr.LANGUAGE_MAP.values()))
+
+
+def _extension(tool):
+    return next(ext for ext, name in codecrispr.LANGUAGE_MAP.items() if name == tool)
+
+
+def corpus(tool, profile, lines):
+    """Path of the cached synthetic file, generating it on first use"""
+    path = os.path.join(DATA_DIR, f'{tool}-{profile}-{lines}{_extension(tool)}')
+    if not os.path.exists(path):
+        os.makedirs(DATA_DIR, exist_ok=True)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            f.write(generate(tool, lines, profile))
+        os.replace(path + '.tmp', path)
+    return path
+
+
+def _max_rss_kib(usage):
+    # ru_maxrss is in bytes on macOS and in KiB elsewhere
+    return usage.ru_maxrss // 1024 if sys.platform == 'darwin' else usage.ru_maxrss
+
+
+def run_cli(args):
+    """Run codecrispr.py with args; return (seconds, peak RSS in KiB or None)"""
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, os.path.join(ROOT, 'codecrispr.py')] + args,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=CLI_ENV)
+    if hasattr(os, 'wait4'):
+        _, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        rss = _max_rss_kib(usage)
+    else:
+        proc.wait()
+        rss = None
+    seconds = time.perf_counter() - start
+    if proc.returncode:
+        raise RuntimeError(f"codecrispr.py {' '.join(args)} exited with status {proc.returncode}")
+    return seconds, rss
+
+
+def _block_text(editor, name):
+    if hasattr(editor, 'lines'):
+        block = editor.reference_map[name]
+        return '\n'.join(editor.lines[block['start']:block['end'] + 1])
+    return editor.reference_map.read(name).decode('utf-8')
+
+
+def _edited(text):
+    """A same-shape variant of a generated block
+
+    Every block ends with the value 42 after its name; toggling the last 42 or
+    43 leaves names that contain those digits alone.
+    """
+    pos = max(text.rfind('42'), text.rfind('43'))
+    if pos < 0:
+        return text
+    return text[:pos] + ('43' if text[pos:pos + 2] == '42' else '42') + text[pos + 2:]
+
+
+def _disjoint(editor, limit):
+    """Up to limit evenly spread block names whose spans do not overlap"""
+    spans = sorted((pos['start'], pos['end'], name) for name, pos in editor.reference_map.items())
+    chosen, last_end = [], -1
+    for start, end, name in spans:
+        if start > last_end:
+            chosen.append(name)
+            last_end = end
+    step = max(1, len(chosen) // limit)
+    return chosen[::step][:limit]
+
+
+def _stages(tool, path, out_path):
+    """(name, function) pairs run in order, each updating a shared state dict"""
+    cls = codecrispr.load_tool_module(tool).CodeCRISPR
+    line_based = hasattr(cls, '_parse_lines')
+
+    def read(state):
+        editor = cls.__new__(cls)
+        editor.filepath = path
+        editor.lines = editor._read_file()
+        state['editor'] = editor
+
+    def parse(state):
+        if line_based:
+            editor = state['editor']
+            editor.reference_map = editor._parse_lines(editor.lines.sequence())
+        else:
+            state['editor'] = cls(path)
+
+    def prepare(state):
+        editor = state['editor']
+        names = list(editor.reference_map)
+        state['blocks'] = len(names)
+        if names:
+            name = names[len(names) // 2]
+            state['single'] = (name, _edited(_block_text(editor, name)))
+        state['updates'] = [(name, _edited(_block_text(editor, name)))
+                            for name in _disjoint(editor, BATCH_UPDATES)]
+
+    def replace(state):
+        if 'single' in state:
+            state['editor'].replace_method(*state['single'])
+
+    def batch(state):
+        _, failed = codecrispr.batch_replace_methods(state['editor'], state['updates'])
+        if failed:
+            raise RuntimeError(f"{len(failed)} batch updates failed, e.g. {failed[0]}")
+
+    def save(state):
+        state['editor'].save(out_path)
+
+    stages = [('read', read)] if line_based else []
+    return stages + [('parse', parse), (None, prepare), ('replace', replace), ('batch', batch), ('save', save)]
+
+
+def measure_case(tool, profile, lines, repeat=3, trace=True):
+    """Measurements of one tool on one corpus, as a dict"""
+    path = corpus(tool, profile, lines)
+    with open(path, 'rb') as f:
+        data = f.read()
+    result = {'tool': tool, 'profile': profile, 'lines': data.count(b'\n'), 'bytes': len(data)}
+    del data
+    stages = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        out_path = os.path.join(tmp, os.path.basename(path))
+        pipeline = _stages(tool, path, out_path)
+        for _ in range(repeat):
+            state = {}
+            for name, stage in pipeline:
+                start = time.perf_counter()
+                stage(state)
+                seconds = time.perf_counter() - start
+                if name:
+                    best = stages.setdefault(name, {'seconds': seconds})
+                    best['seconds'] = min(best['seconds'], seconds)
+            result['blocks'] = state['blocks']
+            del state
+        seconds, rss = min(run_cli([path, '--inspect', '--json']) for _ in range(repeat))
+        stages['inspect'] = {'seconds': seconds, 'max_rss_kib': rss}
+        try:
+            import resource
+            result['max_rss_kib'] = _max_rss_kib(resource.getrusage(resource.RUSAGE_SELF))
+        except ImportError:
+            result['max_rss_kib'] = None
+        if trace:
+            # A separate pass: tracing slows allocation-heavy code down a lot
+            state = {}
+            tracemalloc.start()
+            for name, stage in pipeline:
+                tracemalloc.reset_peak()
+                stage(state)
+                if name:
+                    stages[name]['peak_kib'] = tracemalloc.get_traced_memory()[1] // 1024
+            tracemalloc.stop()
+    result['stages'] = stages
+    return result
+
+
+def measure_startup(repeat=10):
+    """CLI start to exit for --inspect --json on a small Python file"""
+    path = corpus('python_tool', 'typical', 100)
+    seconds, rss = min(run_cli([path, '--inspect', '--json']) for _ in range(repeat))
+    return {'stages': {'inspect': {'seconds': seconds, 'max_rss_kib': rss}}}
+
+
+def measure_edits(tool, blocks=EDIT_BLOCKS, edits=EDIT_COUNT):
+    """Random same-shape replace_method() calls on a file with about blocks blocks"""
+    # Flat corpora average one block per ~9 lines
+    path = corpus(tool, 'flat', blocks * 9)
+    cls = codecrispr.load_tool_module(tool).CodeCRISPR
+    start = time.perf_counter()
+    editor = cls(path)
+    load = time.perf_counter() - start
+    names = list(editor.reference_map)
+    rng = random.Random(0)
+    start = time.perf_counter()
+    for _ in range(edits):
+        name = rng.choice(names)
+        editor.replace_method(name, _edited(_block_text(editor, name)))
+    seconds = time.perf_counter() - start
+    return {'tool': tool, 'blocks': len(names), 'edits': edits,
+            'stages': {'load': {'seconds': load}, 'edit': {'seconds': seconds / edits}}}
+
+
+def _api_requests(api, paths, count, mix):
+    """count (kind, path, args) requests spread over paths, built from their current blocks"""
+    rng = random.Random(0)
+    editors = {path: api.open_editor(path) for path in paths}
+    requests = []
+    for _ in range(count):
+        path = rng.choice(paths)
+        editor = editors[path]
+        name = rng.choice(list(editor.reference_map))
+        roll = rng.random()
+        if roll < mix[0]:
+            requests.append(('preview', path, (name,)))
+        elif roll < mix[0] + mix[1]:
+            requests.append(('replace', path, (name, _edited(_block_text(editor, name)))))
+        else:
+            requests.append(('inspect', path, ()))
+    return requests
+
+
+def measure_api(requests=API_REQUESTS, files=API_FILES, mix=API_MIX):
+    """requests concurrent api.Session calls on files copies of a 1,000-line Python file
+
+    For comparison, the same requests are also run one after another with a
+    fresh open_editor() each, as an embedding without a session would.
+    """
+    import asyncio
+    import configparser
+    import shutil
+    from codecrispr import api
+
+    source = corpus('python_tool', 'typical', 1000)
+    with tempfile.TemporaryDirectory() as tmp:
+        config = configparser.ConfigParser()
+        config.read_dict(codecrispr.DEFAULT_CONFIG)
+        config.set('cache', 'enabled', 'false')
+        config.set('locking', 'dir', os.path.join(tmp, 'locks'))
+        paths = []
+        for i in range(files):
+            paths.append(os.path.join(tmp, f'file{i}.py'))
+            shutil.copyfile(source, paths[-1])
+        batch = _api_requests(api, paths, requests, mix)
+
+        async def run_all():
+            latencies = []
+
+            async def timed(session, kind, path, args):
+                start = time.perf_counter()
+                await getattr(session, kind)(path, *args)
+                latencies.append(time.perf_counter() - start)
+
+            async with api.Session(config) as session:
+                start = time.perf_counter()
+                await asyncio.gather(*(timed(session, *request) for request in batch))
+                return time.perf_counter() - start, sorted(latencies), session.stats()
+
+        seconds, latencies, stats = asyncio.run(run_all())
+
+        start = time.perf_counter()
+        for kind, path, args in batch:
+            editor = api.open_editor(path, config)
+            if kind == 'replace':
+                editor.replace_method(*args)
+                api.save_editor(editor, path, config)
+            elif kind == 'inspect':
+                codecrispr.block_hashes(editor)
+        serial = time.perf_counter() - start
+
+    return {'requests': requests, 'files': files, 'parses': stats['parses'],
+            'requests_per_sec': round(requests / seconds, 1),
+            'p50_ms': round(latencies[len(latencies) // 2] * 1000, 3),
+            'p99_ms': round(latencies[int(len(latencies) * 0.99)] * 1000, 3),
+            'stages': {'concurrent': {'seconds': seconds}, 'serial': {'seconds': serial}}}
+
+
+def _diff_scenarios(lines):
+    """name -> (old, new) pairs of blocks of about lines lines"""
+    rng = random.Random(0)
+
+    def edit(a, share):
+        b = list(a)
+        for _ in range(int(len(a) * share)):
+            k = rng.randrange(len(b))
+            roll = rng.random()
+            if roll < 0.33:
+                del b[k]
+            elif roll < 0.66:
+                b.insert(k, f'inserted {rng.random()}')
+            else:
+                b[k] = f'changed {rng.random()}'
+        return b
+
+    unique = [f'    value_{i} = compute({i}, {i * 7 % 13})' for i in range(lines)]
+    # A generated table: few distinct lines, each repeated many times
+    table = [f'| row | {i % 40} | {"x" * (i % 3)} |' for i in range(lines)]
+    half = lines // 2
+    return {
+        'unique-1%': (unique, edit(unique, 0.01)),
+        'table-1%': (table, edit(table, 0.01)),
+        'table-10%': (table, edit(table, 0.10)),
+        'insert': (unique, unique[:half] + [f'new {i}' for i in range(lines // 5)] + unique[half:]),
+        'rewrite': (unique, [f'other {i}' for i in range(lines)]),
+    }
+
+
+def measure_diff(lines=DIFF_LINES, repeat=3):
+    """unified_diff() of lines-line blocks with every algorithm in diff_engine"""
+    from codecrispr_tools import diff_engine
+
+    stages = {}
+    sizes = {}
+    for scenario, (old, new) in _diff_scenarios(lines).items():
+        for algorithm in diff_engine.ALGORITHMS:
+            seconds = float('inf')
+            for _ in range(repeat):
+                start = time.perf_counter()
+                diff = list(diff_engine.unified_diff(old, new, algorithm=algorithm))
+                seconds = min(seconds, time.perf_counter() - start)
+            tracemalloc.start()
+            diff = list(diff_engine.unified_diff(old, new, algorithm=algorithm))
+            peak = tracemalloc.get_traced_memory()[1] // 1024
+            tracemalloc.stop()
+            stages[f'{scenario}/{algorithm}'] = {'seconds': seconds, 'peak_kib': peak}
+            sizes[f'{scenario}/{algorithm}'] = len(diff)
+    return {'lines': lines, 'diff_lines': sizes, 'stages': stages}
+
+
+def measure_map(blocks=MAP_BLOCKS, lookups=MAP_LOOKUPS):
+    """Memory retained by a reference map of blocks blocks, as plain dicts and as a BlockTable
+
+    The `keyed` stages use `<kind>_<start line>` names, as SQL and shell
+    tools do. Names are created before measuring, since every form holds them.
+    """
+    from codecrispr_tools.block_table import BlockTable
+
+    spans = [(i * 9, i * 9 + 7) for i in range(blocks)]
+    named = [f'function_{i}' for i in range(blocks)]
+    keyed = [f'{("select", "insert", "update")[i % 3]}_{i * 9}' for i in range(blocks)]
+    probes = random.Random(0).sample(range(blocks), min(lookups, blocks))
+    forms = {
+        'dict': lambda names: {name: {'start': s, 'end': e} for name, (s, e) in zip(names, spans)},
+        'table': lambda names: BlockTable([(s, e, name) for name, (s, e) in zip(names, spans)]),
+        'table_keyed': lambda names: BlockTable([(s, e, name) for name, (s, e) in zip(names, spans)],
+                                                keys_by_line=True),
+    }
+    stages = {}
+    for form, build in forms.items():
+        names = keyed if form.endswith('keyed') else named
+        # Memory first; tracing slows allocation down, so timings get a pass of their own
+        tracemalloc.start()
+        table = build(names)
+        retained = tracemalloc.get_traced_memory()[0] // 1024
+        for i in probes:
+            table[names[i]]
+        # Tables index names on the first lookup
+        indexed = tracemalloc.get_traced_memory()[0] // 1024
+        tracemalloc.stop()
+        del table
+        start = time.perf_counter()
+        table = build(names)
+        seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        for i in probes:
+            table[names[i]]
+        stages[form] = {'seconds': seconds, 'retained_kib': retained, 'indexed_kib': indexed,
+                        'lookup_seconds': (time.perf_counter() - start) / len(probes)}
+        del table
+    return {'blocks': blocks, 'stages': stages}
+
+
+def _classifier_tools(tools):
+    """The tools among tools whose parser has a LineClassifier"""
+    return [tool for tool in tools if hasattr(codecrispr.load_tool_module(tool), 'CLASSIFIER')]
+
+
+def measure_classify(tool, lines=CLASSIFY_LINES, repeat=3):
+    """Lines per second through a tool's CLASSIFIER, against trying its patterns one by one
+
+    The `loop` stage matches every line of a typical corpus against each
+    pattern in turn, compiled on its own and without the keyword prefilter,
+    as the tools did before LineClassifier; `combined` runs CLASSIFIER.match()
+    and `parse` the whole _parse_lines(). Both matchers must agree on the
+    kind of every line.
+    """
+    module = codecrispr.load_tool_module(tool)
+    classifier = module.CLASSIFIER
+    compiled = [(kind, re.compile(regex, classifier.flags)) for kind, regex in classifier.patterns]
+
+    def loop(line):
+        for kind, regex in compiled:
+            if regex.match(line):
+                return kind
+        return None
+
+    path = corpus(tool, 'typical', lines)
+    editor = module.CodeCRISPR.__new__(module.CodeCRISPR)
+    editor.filepath = path
+    editor.lines = editor._read_file()
+    text = list(editor.lines)
+    disagreements = sum(loop(line) != classifier.kind(line) for line in text)
+
+    def parse():
+        editor._parse_lines(editor.lines.sequence())
+
+    stages = {}
+    for stage, run in (('loop', lambda: [loop(line) for line in text]),
+                       ('combined', lambda: [classifier.match(line) for line in text]),
+                       ('parse', parse)):
+        seconds = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            seconds = min(seconds, time.perf_counter() - start)
+        stages[stage] = {'seconds': seconds}
+    return {'tool': tool, 'lines': len(text), 'patterns': len(compiled), 'disagreements': disagreements,
+            'lines_per_sec': {stage: round(len(text) / m['seconds']) for stage, m in stages.items()},
+            'stages': stages}
+
+
+def _case_process(args):
+    """Run one case in a fresh interpreter so its memory peaks are its own"""
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), 'case'] + args,
+                          capture_output=True, text=True)
+    if proc.returncode:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'case failed')
+    return json.loads(proc.stdout)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', '-C', ROOT, 'rev-parse', '--short', 'HEAD'],
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def cmd_run(args):
+    tools = args.tools.split(',') if args.tools else _tools()
+    sizes = [int(size) for size in args.sizes.split(',')]
+    profiles = args.profiles.split(',')
+    extras = [extra for extra in args.extras.split(',') if extra]
+    cases = {}
+
+    def record(key, case_args):
+        print(f"[BENCH] {key}", file=sys.stderr, flush=True)
+        try:
+            cases[key] = _case_process(case_args)
+        except RuntimeError as e:
+            print(f"[ERROR] {key}: {e}", file=sys.stderr)
+            cases[key] = {'error': str(e)}
+
+    for tool in tools:
+        for profile in profiles:
+            for size in sizes:
+                record(f'{tool}/{profile}/{size}',
+                       [tool, profile, str(size), '--repeat', str(args.repeat)]
+                       + ([] if args.tracemalloc else ['--no-tracemalloc']))
+    if 'startup' in extras:
+        record('startup', ['startup'])
+    if 'edits' in extras:
+        for tool in EDIT_TOOLS:
+            record(f'edits/{tool}', ['edits', tool])
+    if 'api' in extras:
+        record('api', ['api'])
+    if 'diff' in extras:
+        record('diff', ['diff', '--repeat', str(args.repeat)])
+    if 'map' in extras:
+        record('map', ['map'])
+    if 'classify' in extras:
+        for tool in _classifier_tools(tools):
+            record(f'classify/{tool}', ['classify', tool, '--repeat', str(args.repeat)])
+
+    results = {
+        'meta': {
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'repeat': args.repeat,
+        },
+        'cases': cases,
+    }
+    targets = [args.output] + ([BASELINE] if args.save_baseline else [])
+    for target in targets:
+        os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+        with open(target, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"[SUCCESS] Results written to {target}", file=sys.stderr)
+    return 1 if any('error' in case for case in cases.values()) else 0
+
+
+def cmd_case(args):
+    if args.tool == 'startup':
+        result = measure_startup()
+    elif args.tool == 'edits':
+        result = measure_edits(args.profile)
+    elif args.tool == 'api':
+        result = measure_api()
+    elif args.tool == 'diff':
+        result = measure_diff(repeat=args.repeat)
+    elif args.tool == 'map':
+        result = measure_map()
+    elif args.tool == 'classify':
+        result = measure_classify(args.profile, repeat=args.repeat)
+    else:
+        result = measure_case(args.tool, args.profile, args.lines, args.repeat, args.tracemalloc)
+    json.dump(result, sys.stdout)
+    return 0
+
+
+def compare(baseline, results, threshold):
+    """Return (regressions, improvements) as lists of printable lines"""
+    regressions, improvements = [], []
+    limit = threshold / 100
+    for key, case in sorted(results['cases'].items()):
+        base = baseline['cases'].get(key)
+        if not base or 'error' in base or 'error' in case:
+            continue
+        for stage, metrics in case.get('stages', {}).items():
+            for metric, new in metrics.items():
+                old = base.get('stages', {}).get(stage, {}).get(metric)
+                if old is None or new is None:
+                    continue
+                floor = MIN_SECONDS if metric == 'seconds' else MIN_KIB
+                if abs(new - old) < floor:
+                    continue
+                change = (new - old) / old if old else float('inf')
+                line = f"{key} {stage} {metric}: {old:.4g} -> {new:.4g} ({change:+.0%})"
+                if change > limit:
+                    regressions.append(line)
+                elif change < -limit:
+                    improvements.append(line)
+    return regressions, improvements
+
+
+def cmd_compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.results) as f:
+        results = json.load(f)
+    regressions, improvements = compare(baseline, results, args.threshold)
+    for line in improvements:
+        print(f"[IMPROVED] {line}")
+    for line in regressions:
+        print(f"[REGRESSION] {line}")
+    print(f"{len(regressions)} regressions, {len(improvements)} improvements beyond {args.threshold:g}% "
+          f"(baseline {baseline['meta'].get('commit')}, results {results['meta'].get('commit')})")
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CodeCRISPR benchmark suite")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run = sub.add_parser('run', help='Run the benchmarks and write the results as JSON')
+    run.add_argument('--tools', help='Comma-separated tool modules (default: every tool in LANGUAGE_MAP)')
+    run.add_argument('--sizes', default='1000,10000,100000', help='Comma-separated corpus sizes in lines')
+    run.add_argument('--profiles', default='typical,nested',
+                     help=f"Comma-separated corpus profiles ({', '.join(PROFILES)})")
+    run.add_argument('--repeat', type=int, default=3, help='Runs per case; the best time is kept')
+    run.add_argument('--extras', default='startup,edits,api,diff,map,classify',
+                     help='Comma-separated extra benchmarks (startup, edits, api, diff, map, classify)')
+    run.add_argument('--no-tracemalloc', dest='tracemalloc', action='store_false', help='Skip the tracemalloc pass')
+    run.add_argument('-o', '--output', default=LATEST, help='Results file')
+    run.add_argument('--save-baseline', action='store_true', help=f'Also store the results as {os.path.relpath(BASELINE, ROOT)}')
+    run.set_defaults(func=cmd_run)
+
+    case = sub.add_parser('case', help='Measure one case and print it as JSON')
+    case.add_argument('tool', help="Tool module, or 'startup' / 'edits' / 'api' / 'diff' / 'map' / 'classify'")
+    case.add_argument('profile', nargs='?', default='typical', help="Corpus profile (for 'edits' and 'classify': the tool)")
+    case.add_argument('lines', nargs='?', type=int, default=1000)
+    case.add_argument('--repeat', type=int, default=3)
+    case.add_argument('--no-tracemalloc', dest='tracemalloc', action='store_false')
+    case.set_defaults(func=cmd_case)
+
+    cmp = sub.add_parser('compare', help='Flag regressions against a baseline')
+    cmp.add_argument('baseline', nargs='?', default=BASELINE)
+    cmp.add_argument('results', nargs='?', default=LATEST)
+    cmp.add_argument('--threshold', type=float, default=10, help='Percentage change reported (default: 10)')
+    cmp.set_defaults(func=cmd_compare)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Shell completion latency check for CodeCRISPR
+
+    python3 benchmarks/completion_latency.py [--lines 20000] [--tool python_tool]
+                                             [--profile flat] [--budget-ms 50] [--repeat 20]
+
+Generates a synthetic file of --lines lines (see corpora.py; the flat
+profile gives the most blocks, and so the most names to print) and times
+`codecrispr.py FILE --complete`, the command the bash and zsh completion
+scripts run on every TAB press, from process start to exit. The first run
+parses the file and fills a private map cache; the others answer from it.
+For comparison it also times the pipeline the scripts used before:
+`--inspect --json` piped into a second interpreter that decodes the JSON.
+
+The names printed must be exactly the blocks `--inspect --json` lists.
+Prints a JSON summary and exits with status 1 if they differ or the median
+cached run takes longer than --budget-ms.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+SCRIPT = os.path.join(ROOT, 'codecrispr.py')
+
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+import codecrispr  # noqa: E402
+from corpora import PROFILES, generate  # noqa: E402
+
+# The decoder the completion scripts piped --inspect --json into
+LEGACY_DECODER = "import sys, json; data = json.load(sys.stdin); print('\\n'.join(data['blocks'].keys()))"
+
+
+def _extension(tool):
+    return next(ext for ext, name in codecrispr.LANGUAGE_MAP.items() if name == tool)
+
+
+def _timed(args, env):
+    """Run codecrispr.py with args; return (seconds, stdout)"""
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, SCRIPT] + args, capture_output=True, text=True, env=env)
+    seconds = time.perf_counter() - start
+    if proc.returncode:
+        raise RuntimeError(f"codecrispr.py {' '.join(args)} exited with status {proc.returncode}: {proc.stderr.strip()}")
+    return seconds, proc.stdout
+
+
+def _timed_legacy(path, env):
+    start = time.perf_counter()
+    inspect = subprocess.Popen([sys.executable, SCRIPT, path, '--inspect', '--json'],
+                               stdout=subprocess.PIPE, env=env)
+    decode = subprocess.run([sys.executable, '-c', LEGACY_DECODER], stdin=inspect.stdout,
+                            capture_output=True, text=True, env=env)
+    inspect.stdout.close()
+    inspect.wait()
+    return time.perf_counter() - start, decode.stdout
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 1)
+
+
+def run(tool, profile, lines, budget_ms, repeat):
+    workdir = tempfile.mkdtemp(prefix='codecrispr-complete-')
+    path = os.path.join(workdir, f'target{_extension(tool)}')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(generate(tool, lines, profile))
+    env = dict(os.environ, CODECRISPR_CONFIG=os.devnull, CODECRISPR_CACHE_ENABLED='true',
+               CODECRISPR_CACHE_DIRECTORY=os.path.join(workdir, 'cache'))
+
+    first, names = _timed([path, '--complete'], env)
+    cached = [_timed([path, '--complete'], env)[0] for _ in range(repeat)]
+    config = [_timed(['--complete', '--config'], env)[0] for _ in range(repeat)]
+    legacy = [_timed_legacy(path, env)[0] for _ in range(max(repeat // 4, 1))]
+
+    _, listing = _timed([path, '--inspect', '--json'], env)
+    expected = list(json.loads(listing)['blocks'])
+    median = statistics.median(cached)
+    return {
+        'tool': tool, 'profile': profile, 'lines': lines, 'blocks': len(expected), 'repeat': repeat,
+        'names_match': names.splitlines() == expected,
+        'first_ms': _ms(first),
+        'cached_median_ms': _ms(median), 'cached_max_ms': _ms(max(cached)),
+        'config_median_ms': _ms(statistics.median(config)),
+        'legacy_median_ms': _ms(statistics.median(legacy)),
+        'budget_ms': budget_ms, 'within_budget': median * 1000 <= budget_ms,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the --complete fast path against a budget")
+    parser.add_argument('--tool', default='python_tool', help='Tool whose language the file is written in')
+    parser.add_argument('--profile', default='flat', choices=sorted(PROFILES), help='Corpus profile')
+    parser.add_argument('--lines', type=int, default=20000, help='Lines in the generated file')
+    parser.add_argument('--budget-ms', type=float, default=50, help='Largest median time allowed for a cached run')
+    parser.add_argument('--repeat', type=int, default=20, help='Cached runs timed')
+    args = parser.parse_args()
+    summary = run(args.tool, args.profile, args.lines, args.budget_ms, args.repeat)
+    print(json.dumps(summary, indent=2))
+    return 0 if summary['names_match'] and summary['within_budget'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
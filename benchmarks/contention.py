@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Concurrent-writer stress test for CodeCRISPR
+
+    python3 benchmarks/contention.py [--writers 16] [--edits 20] [--blocks 4]
+                                     [--mode optimistic|strict|off] [--shared]
+
+Starts --writers threads that each run the CLI --edits times in a row
+against one Python file, so that many codecrispr.py processes read, edit and
+write it at the same time. Each writer owns --blocks functions and sets them
+to numbered bodies of varying length, so every write moves the blocks after
+it. At the end every function must hold the last body its writer was told
+was written: any other body is a lost update.
+
+With --shared all writers edit the same functions instead. Edits then
+collide, and a colliding edit must be refused with [CONFLICT] rather than
+overwrite a change it never saw; the file must still hold every function.
+
+Prints a JSON summary (runs, updates, merges, conflicts, lost updates,
+runs per second) and exits with status 1 if an update was lost or the file
+was damaged. `--mode off` disables locking to show the updates it loses.
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+
+sys.path.insert(0, ROOT)
+
+import codecrispr  # noqa: E402
+
+
+def _body(name, value):
+    # Between one and three lines, so edits change the line count
+    comments = ''.join(f'\n    # revision {value}' for _ in range(value % 3))
+    return f'def {name}():{comments}\n    return {value}'
+
+
+def _names(writers, blocks, shared):
+    if shared:
+        return [[f'f_{b}' for b in range(blocks)] for _ in range(writers)]
+    return [[f'f_{w}_{b}' for b in range(blocks)] for w in range(writers)]
+
+
+def _writer(path, names, edits, env, offset, tally, lock):
+    """Run the CLI edits times; return {name: last value written}"""
+    last = {}
+    for i in range(edits):
+        name = names[i % len(names)]
+        value = offset + i + 1
+        proc = subprocess.run([sys.executable, os.path.join(ROOT, 'codecrispr.py'), path, name,
+                               _body(name, value), '--timings'],
+                              capture_output=True, text=True, env=env)
+        report = next((json.loads(l) for l in proc.stderr.splitlines() if l.startswith('{')), {})
+        with lock:
+            tally['runs'] += 1
+            tally['merges'] += 1 if report.get('counters', {}).get('merged') else 0
+            if '[UPDATED]' in proc.stdout:
+                tally['updates'] += 1
+                last[name] = value
+            elif '[CONFLICT]' in proc.stdout:
+                tally['conflicts'] += 1
+            else:
+                tally['errors'].append((proc.stdout + proc.stderr).strip().splitlines()[-1:])
+    return last
+
+
+def run(writers, edits, blocks, mode, shared):
+    workdir = tempfile.mkdtemp(prefix='codecrispr-contention-')
+    path = os.path.join(workdir, 'target.py')
+    names = _names(writers, blocks, shared)
+    everything = sorted({name for group in names for name in group})
+    with open(path, 'w') as f:
+        f.write('\n\n'.join(_body(name, 0) for name in everything) + '\n')
+
+    env = dict(os.environ, CODECRISPR_CONFIG=os.devnull, CODECRISPR_CACHE_ENABLED='false',
+               CODECRISPR_LOCKING_MODE=mode, CODECRISPR_LOCKING_DIR=os.path.join(workdir, 'locks'))
+    tally = {'runs': 0, 'updates': 0, 'merges': 0, 'conflicts': 0, 'errors': []}
+    lock = threading.Lock()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(writers) as pool:
+        # Writers number their values apart so every body is unique
+        futures = [pool.submit(_writer, path, names[w], edits, env, w * 100_000, tally, lock)
+                   for w in range(writers)]
+        results = [future.result() for future in futures]
+    seconds = time.perf_counter() - start
+
+    editor = codecrispr.load_tool_module('python_tool').CodeCRISPR(path)
+    found = {}
+    for name in everything:
+        if name in editor.reference_map:
+            block = editor.reference_map[name]
+            text = '\n'.join(editor.lines[block['start']:block['end'] + 1])
+            found[name] = int(re.search(r'return (\d+)', text).group(1))
+    missing = [name for name in everything if name not in found]
+    if shared:
+        # Some writer must have been told its value for a block was written
+        written = {name: {0} for name in everything}
+        for last in results:
+            for name, value in last.items():
+                written[name].add(value)
+        # Only a writer's last value for a block can survive
+        lost = [name for name in found if found[name] not in written[name]]
+    else:
+        expected = {name: 0 for name in everything}
+        for last in results:
+            expected.update(last)
+        lost = [name for name in found if found[name] != expected[name]]
+
+    return {
+        'mode': mode, 'shared': shared, 'writers': writers, 'edits': edits, 'blocks': len(everything),
+        'runs': tally['runs'], 'updates': tally['updates'], 'merges': tally['merges'],
+        'conflicts': tally['conflicts'], 'errors': tally['errors'][:5],
+        'lost_updates': len(lost) + len(missing), 'missing_blocks': missing,
+        'seconds': round(seconds, 3), 'runs_per_sec': round(tally['runs'] / seconds, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Many CodeCRISPR processes editing one file at once")
+    parser.add_argument('--writers', type=int, default=16, help='Concurrent writers')
+    parser.add_argument('--edits', type=int, default=20, help='CLI runs per writer')
+    parser.add_argument('--blocks', type=int, default=4, help='Functions per writer (shared with --shared)')
+    parser.add_argument('--mode', default='optimistic', choices=('optimistic', 'strict', 'off'),
+                        help='locking.mode for the writers')
+    parser.add_argument('--shared', action='store_true', help='Have every writer edit the same functions')
+    args = parser.parse_args()
+    summary = run(args.writers, args.edits, args.blocks, args.mode, args.shared)
+    print(json.dumps(summary, indent=2))
+    return 1 if summary['lost_updates'] or summary['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
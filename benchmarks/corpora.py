@@ -0,0 +1,353 @@
+"""
+Synthetic source files for the CodeCRISPR benchmarks
+
+generate(tool, lines, profile) returns a deterministic file of about `lines`
+lines in the tool's language, built from blocks of that language's usual
+shapes (functions, methods in classes, rules, statements, sections,
+elements). A profile sets how deeply block bodies nest and how many lines a
+block has on average, and so how many blocks the file holds. Every block
+body contains the literal 42, which the benchmarks change to 43 to make a
+same-shape edit.
+"""
+import json
+import random
+
+# name: (nesting depth, average lines per block)
+PROFILES = {
+    'flat': (1, 6),
+    'typical': (3, 16),
+    'nested': (8, 60),
+}
+
+
+def _nest(rng, n, depth, indent, unit, stmt, opener, closer):
+    """n body lines that open a nested construct every few lines, up to depth levels"""
+    lines = []
+    level = 0
+    for k in range(n):
+        pad = indent + unit * level
+        if level < depth - 1 and k < n - 1 and rng.random() < 0.34:
+            lines.append(pad + opener.format(k=k))
+            level += 1
+        elif closer and level and rng.random() < 0.15:
+            level -= 1
+            lines.append(indent + unit * level + closer)
+        else:
+            lines.append(pad + stmt.format(k=k))
+    while level and closer:
+        level -= 1
+        lines.append(indent + unit * level + closer)
+    return lines
+
+
+def _sizes(rng, lines, block_lines):
+    """Body sizes of consecutive blocks until they add up to about lines"""
+    total = 0
+    while total < lines:
+        n = max(1, int(rng.expovariate(1 / block_lines)))
+        total += n + 3
+        yield n
+
+
+def _python(rng, lines, depth, block_lines):
+    out = ['"""Generated module"""', 'import os', '']
+    for i, n in enumerate(_sizes(rng, lines, block_lines)):
+        if i % 4 == 0:
+            out += [f'class Model{i}:', f'    """Model {i}"""', '', f'    def item{i}(self, x):']
+            indent = '        '
+        else:
+            if i % 7 == 1:
+                out.append('@staticmethod')
+            out.append(f'def item{i}(x, y=None):')
+            indent = '    '
+        out.append(indent + 'total = 42')
+        out += _nest(rng, n, depth, indent, '    ', 'total += x * {k} + 42', 'if total > {k}:', None)
+        out += [indent + 'return total', '']
+    return out
+
+
+def _javascript(rng, lines, depth, block_lines, typed=False):
+    arg = 'a: number, b: string' if typed else 'a, b'
+    out = ["'use strict';", '']
+    stmt = 'total += a * {k} + 42;'
+    # Deep profiles nest callbacks, as event and promise code does
+    opener, closer = ('items.forEach((item) => {{', '});') if depth > 4 else ('if (total > {k}) {{', '}')
+    for i, n in enumerate(_sizes(rng, lines, block_lines)):
+        kind = i % 5
+        if kind == 0:
+            out += [f'class Service{i} {{', f'  handle{i}({arg}) {{', '    let total = 0;']
+            out += _nest(rng, n, depth, '    ', '  ', stmt, opener, closer)
+            out += ['    return total;', '  }', '}', '']
+        elif kind == 1:
+            out += [f'const item{i} = ({arg}) => {{', '  let total = 0;']
+            out += _nest(rng, n, depth, '  ', '  ', stmt, opener, closer)
+            out += ['  return total;', '};', '']
+        else:
+            out += [f'export function item{i}({arg}) {{', '  let total = 0;']
+            out += _nest(rng, n, depth, '  ', '  ', stmt, opener, closer)
+            out += ['  return total;', '}', '']
+    return out
+
+
+def _typescript(rng, lines, depth, block_lines):
+    return _javascript(rng, lines, depth, block_lines, typed=True)
+
+
+def _java(rng, lines, depth, block_lines):
+    out = ['package bench;', '', 'public class Generated {']
+    for i, n in enumerate(_sizes(rng, lines, block_lines)):
+        out += [f'    public int item{i}(int a, String b) {{', '        int total = 0;']
+        out += _nest(rng, n, depth, '        ', '    ', 'total += a * {k} + 42;', 'if (total > {k}) {{', '}')
+        out += ['        return total;', '    }', '']
+    out.append('}')
+    return out
+
+
+def _cpp(rng, lines, depth, block_lines):
+    out = ['#include <vector>', '']
+    for i, n in enumerate(_sizes(rng, lines, block_lines)):
+        head = f'int Widget::item{i}(int a) const {{' if i % 2 else f'static int item{i}(int a, const std::vector<int>& v) {{'
+        out += [head, '    int total = 0;']
+        out += _nest(rng, n, depth, '    ', '    ', 'total += a * {k} + 42;', 'for (int x : v{k}) {{', '}')
+        out += ['    return total;', '}', '']
+    return out
+
+
+def _rust(rng, lines, depth, block_lines):
+    out = ['use std::collections::HashMap;', '']
+    for i, n in enumerate(_sizes(rng, lines, block_lines)):
+        if i % 3 == 0:
+            out += [f'impl Widget{i} {{', f'    pub fn item{i}(&self, a: i64) -> i64 {{']
+            indent, close = '        ', ['    }', '}']
+        else:
+            out.append(f'pub fn item{i}(a: i64) -> i64 {{')
+            indent, close = '    ', ['}']
+        out.append(indent + 'let mut total = 0;')
+        out += _nest(rng, n, depth, indent, '    ', 'total += a * {k} + 42;', 'if total > {k} {{', '}')
+        out += [indent + 'total'] + close + ['']
+    return out
+
+
+def _php(rng, lines, depth, block_lines):
+    out = ['<?php', '', 'class Generated', '{']
+    for i, n in enumerate(_sizes(rng, lines, block_lines)):
+        out += [f'    public function item{i}($a, $b): int {{', '        $total = 0;']
+        out += _nest(rng, n, depth, '        ', '    ', '$total += $a * {k} + 42;', 'if ($total > {k}) {{', '}')
+        out += ['        return $total;', '    }', '']
+    out.append('}')
+    return out
+
+
+def _go(rng, lines, depth, block_lines):
+    out = ['package bench', '']
+    for i, n in enumerate(_sizes(rng, lines, block_lines)):
+        head = f'func (w *Widget) Item{i}(a int) int {{' if i % 2 else f'func item{i}(a int, b string) int {{'
+        out += [head, '\ttotal := 0']
+        out += _nest(rng, n, depth, '\t', '\t', 'total += a*{k} + 42', 'if total > {k} {{', '}')
+        out += ['\treturn total', '}', '']
+    return out
+
+
+def _swift(rng, lines, depth, block_lines):
+    out = ['import Foundation', '']
+    for i, n in enumerate(_sizes(rng, lines, block_lines)):
+        out += [f'func item{i}(a: Int) -> Int {{', '    var total = 0']
+        out += _nest(rng, n, depth, '    ', '    ', 'total += a * {k} + 42', 'if total > {k} {{', '}')
+        out += ['    return total', '}', '']
+    return out
+
+
+def _r(rng, lines, depth, block_lines):
+    out = ['library(stats)', '']
+    for i, n in enumerate(_sizes(rng, lines, block_lines)):
+        out += [f'item{i} <- function(a, b = NULL) {{', '  total <- 0']
+        out += _nest(rng, n, depth, '  ', '  ', 'total <- total + a * {k} + 42', 'if (total > {k}) {{', '}')
+        out += ['  total', '}', '']
+    return out
+
+
+def _css(rng, lines, depth, block_lines):
+    out = ['/* Generated stylesheet */', '']
+    for i, n in enumerate(_sizes(rng, lines, block_lines)):
+        out.append(f'.item{i} {{' if i % 3 else f'#panel{i} {{')
+        out += _nest(rng, n, depth, '  ', '  ', 'margin-{k}: 42px;', '.child{k} {{', '}')
+        out += ['}', '']
+    return out
+
+
+def _shell(rng, lines, depth, block_lines):
+    out = ['#!/bin/sh', 'set -e', '']
+    for i, n in enumerate(_sizes(rng, lines, block_lines)):
+        out += [f'item{i}() {{', '  total=0']
+        out += _nest(rng, n, depth, '  ', '  ', 'total=$((total + {k} + 42))', 'if [ "$total" -gt {k} ]; then', 'fi')
+        out += ['  echo "$total"', '}', '']
+    return out
+
+
+def _julia(rng, lines, depth, block_lines):
+    out = ['module Generated', '']
+    for i, n in enumerate(_sizes(rng, lines, block_lines)):
+        out += [f'function item{i}(a, b)', '    total = 0']
+        out += _nest(rng, n, depth, '    ', '    ', 'total += a * {k} + 42', 'for x in {k}:b', 'end')
+        out += ['    return total', 'end', '']
+    out.append('end')
+    return out
+
+
+def _matlab(rng, lines, depth, block_lines):
+    out = ['% Generated functions', '']
+    for i, n in enumerate(_sizes(rng, lines, block_lines)):
+        out += [f'function [total] = item{i}(a, b)', '    total = 0;']
+        out += _nest(rng, n, depth, '    ', '    ', 'total = total + a * {k} + 42;', 'if total > {k}', 'end')
+        out += ['end', '']
+    return out
+
+
+def _markdown(rng, lines, depth, block_lines):
+    out = ['# Generated document', '']
+    for i, n in enumerate(_sizes(rng, lines, block_lines)):
+        level = 2 + i % max(1, min(depth, 5))
+        out += ['#' * level + f' Section {i}', '']
+        out += [f'Paragraph line {k} of section {i}, about 42 widgets.' if k % 6 else '' for k in range(n)]
+        out.append('')
+    return out
+
+
+def _latex(rng, lines, depth, block_lines):
+    # A chapter file, as included from the main document
+    out = [r'\chapter{Generated}', '']
+    envs = ('itemize', 'enumerate', 'description')
+    for i, n in enumerate(_sizes(rng, lines, block_lines)):
+        env = 'equation' if i % 4 == 0 else envs[i % 3]
+        out += [f'\\section{{Part {i}}}', f'\\begin{{{env}}}']
+        if env == 'equation':
+            out += [f'  x_{{{k}}} = 42 + {k} \\\\' for k in range(n)]
+        else:
+            out += _nest(rng, n, depth, '  ', '  ', '\\item Entry {k} of 42', '\\item \\begin{{itemize}}', '\\end{itemize}')
+        out += [f'\\end{{{env}}}', '']
+    return out
+
+
+def _sql(rng, lines, depth, block_lines):
+    out = ['-- Generated schema and data', '']
+    for i, n in enumerate(_sizes(rng, lines, block_lines)):
+        if i % 3 == 0:
+            out.append(f'CREATE TABLE item{i} (')
+            out += [f'  col{k} INTEGER DEFAULT 42,' for k in range(n)]
+            out += ['  id INTEGER PRIMARY KEY', ');']
+        elif i % 3 == 1:
+            out.append(f'INSERT INTO item{i - 1} (id, col0) VALUES')
+            out += [f'  ({k}, 42),' for k in range(n)]
+            out.append(f'  ({n}, 42);')
+        else:
+            out += [f'SELECT col0, COUNT(*)', f'FROM item{i - 2}']
+            out += [f'  WHERE col0 > 42 AND id <> {k}' for k in range(n)]
+            out.append('GROUP BY col0;')
+        out.append('')
+    return out
+
+
+def _spss(rng, lines, depth, block_lines):
+    # Blocks are commands that end on their first line
+    out = ['* Generated syntax.', '']
+    for i, n in enumerate(_sizes(rng, lines, block_lines)):
+        out.append(f'* Step {i}.')
+        out += [f"{('COMPUTE', 'FREQUENCIES', 'RECODE')[k % 3]} item{i}_{k} = var{k} + 42." for k in range(n)]
+        out.append('')
+    return out
+
+
+def _html(rng, lines, depth, block_lines):
+    out = ['<!DOCTYPE html>', '<html>', '<body>']
+    for i, n in enumerate(_sizes(rng, lines, block_lines)):
+        out.append(f'<div id="item{i}" class="card">')
+        out += _nest(rng, n, depth, '  ', '  ', '<p>Entry {k} of 42</p>', '<div class="row">', '</div>')
+        out.append('</div>')
+    out += ['</body>', '</html>']
+    return out
+
+
+def _json_value(rng, depth, budget):
+    """A value nested depth levels deep spanning about budget lines when indented"""
+    if depth <= 1 or budget < 3:
+        return rng.choice([42, 'value 42', 42.5, True, None])
+    count = min(budget - 2, rng.randint(2, 8))
+    children = [_json_value(rng, depth - 1, (budget - 2) // count) for _ in range(count)]
+    if rng.random() < 0.3:
+        return children
+    return {f'field{k}': child for k, child in enumerate(children)}
+
+
+def _json(rng, lines, depth, block_lines):
+    doc = {}
+    for i, n in enumerate(_sizes(rng, lines, block_lines)):
+        doc[f'item{i}'] = {'id': i, 'count': 42, 'data': _json_value(rng, depth + 1, n)}
+    return json.dumps(doc, indent=2).splitlines()
+
+
+def _xml_element(rng, depth, budget, pad, out, svg):
+    """Append an element nested depth levels deep spanning about budget lines"""
+    if depth <= 1 or budget < 3:
+        if svg:
+            out.append(f'{pad}<rect x="{budget}" y="42" width="10" height="10"/>')
+        else:
+            out.append(f'{pad}<field value="42">text {budget}</field>')
+        return
+    out.append(f'{pad}<g>' if svg else f'{pad}<record>')
+    count = min(budget - 2, rng.randint(2, 8))
+    for _ in range(count):
+        _xml_element(rng, depth - 1, (budget - 2) // count, pad + '  ', out, svg)
+    out.append(f'{pad}</g>' if svg else f'{pad}</record>')
+
+
+def _xml(rng, lines, depth, block_lines):
+    out = ['<?xml version="1.0" encoding="UTF-8"?>', '<catalog>']
+    for i, n in enumerate(_sizes(rng, lines, block_lines)):
+        out.append(f'  <item id="item{i}" count="42">')
+        _xml_element(rng, depth + 1, n, '    ', out, svg=False)
+        out.append('  </item>')
+    out.append('</catalog>')
+    return out
+
+
+def _svg(rng, lines, depth, block_lines):
+    out = ['<?xml version="1.0" encoding="UTF-8"?>', '<svg xmlns="http://www.w3.org/2000/svg" width="420" height="420">']
+    for i, n in enumerate(_sizes(rng, lines, block_lines)):
+        out.append(f'  <g id="layer{i}" opacity="0.42">')
+        _xml_element(rng, depth + 1, n, '    ', out, svg=True)
+        out.append('  </g>')
+    out.append('</svg>')
+    return out
+
+
+GENERATORS = {
+    'python_tool': _python,
+    'javascript_tool': _javascript,
+    'typescript_tool': _typescript,
+    'java_tool': _java,
+    'cpp_tool': _cpp,
+    'rust_tool': _rust,
+    'php_tool': _php,
+    'go_tool': _go,
+    'swift_tool': _swift,
+    'r_tool': _r,
+    'css_tool': _css,
+    'shell_tool': _shell,
+    'julia_tool': _julia,
+    'matlab_tool': _matlab,
+    'markdown_tool': _markdown,
+    'latex_tool': _latex,
+    'sql_tool': _sql,
+    'spss_tool': _spss,
+    'html_tool': _html,
+    'json_tool': _json,
+    'xml_tool': _xml,
+    'svg_tool': _svg,
+}
+
+
+def generate(tool, lines, profile='typical', seed=0):
+    """Text of a synthetic file of about lines lines for tool"""
+    depth, block_lines = PROFILES[profile]
+    rng = random.Random(f'{tool}/{profile}/{lines}/{seed}')
+    return '\n'.join(GENERATORS[tool](rng, lines, depth, block_lines)) + '\n'
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Randomized check of incremental reference maps for CodeCRISPR
+
+    python3 benchmarks/incremental_check.py [--seed 1] [--files 8] [--steps 25]
+                                            [--tools python_tool,go_tool] [--show 3]
+
+For every line-based tool (see line_tools()), writes --files small random
+files of nested classes, functions and other statements, then applies
+--steps random edits to each.
+Half of them go through replace_method(), which re-parses only a window
+around the block: a block is replaced by new random blocks, grown, changed
+in place or cut to its first line. The other half rewrite a few lines
+directly on disk and call reload(), which re-parses only the lines that
+differ. After every edit the editor's reference map and lines must equal
+those of a fresh editor, which parses the whole file with _parse_methods().
+
+Prints a JSON summary (edits and mismatches per tool) and exits with status
+1 if any map differed. Mismatches are printed (up to --show) to stderr.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+
+sys.path.insert(0, ROOT)
+
+import codecrispr  # noqa: E402
+
+
+class Blocks:
+    """Random source lines for each tool; names repeat on purpose, to exercise collisions"""
+
+    def __init__(self, rng):
+        self.rng = rng
+
+    def _name(self):
+        return self.rng.choice(['a', 'b', 'parse', 'run', 'get'])
+
+    def _type(self):
+        return self.rng.choice(['A', 'B', 'Parser', 'Inner'])
+
+    def _many(self, make, depth, most):
+        return sum((make(depth) for _ in range(self.rng.randint(0, most))), [])
+
+    def python_tool(self, depth=0):
+        ind = '    ' * depth
+        r = self.rng.random()
+        if r < .25 and depth < 3:
+            return [f'{ind}class {self._type()}:'] + self._many(self.python_tool, depth + 1, 3) + [f'{ind}    x = 1']
+        if r < .35:
+            return [f'{ind}@deco', f'{ind}def {self._name()}(self):', f'{ind}    return 1']
+        if r < .45:
+            return ['', '# c', f'{ind}y = 2']
+        return [f'{ind}def {self._name()}(x):', f'{ind}    if x:', f'{ind}        return 42', '']
+
+    def javascript_tool(self, depth=0):
+        ind = '  ' * depth
+        r = self.rng.random()
+        if r < .2 and depth < 2:
+            return [f'{ind}class {self._type()} {{'] + self._many(self.javascript_tool, depth + 1, 3) + [f'{ind}}}']
+        if r < .3 and depth < 3:
+            return [f'{ind}function {self._name()}(x) {{'] + self._many(self.javascript_tool, depth + 1, 2) + [f'{ind}}}']
+        if r < .4:
+            return [f'{ind}const {self._name()} = (x) => {{', f'{ind}  return 42;', f'{ind}}};']
+        if r < .5:
+            return [f'{ind}if (x) {{', f'{ind}}}']
+        return [f'{ind}{self._name()}(x) {{', f'{ind}  return 42;', f'{ind}}}']
+
+    typescript_tool = javascript_tool
+
+    def java_tool(self, depth=0):
+        ind = '    ' * depth
+        if depth == 0 or (self.rng.random() < .3 and depth < 3):
+            header = 'public class' if depth == 0 else 'static class'
+            return [f'{ind}{header} {self._type()} {{'] + self._many(self.java_tool, depth + 1, 3) + [f'{ind}}}']
+        return [f'{ind}public int {self._name()}(int a) {{', f'{ind}    return 42;', f'{ind}}}']
+
+    def php_tool(self, depth=0):
+        ind = '    ' * depth
+        if depth == 0 and self.rng.random() < .3:
+            return [f'class {self._type()}', '{'] + self._many(self.php_tool, 1, 3) + ['}']
+        return [f'{ind}public function {self._name()}($a) {{', f'{ind}    return 42;', f'{ind}}}']
+
+    def swift_tool(self, depth=0):
+        ind = '    ' * depth
+        if self.rng.random() < .3 and depth < 2:
+            kind = self.rng.choice(['class', 'struct', 'extension'])
+            return [f'{ind}{kind} {self._type()} {{'] + self._many(self.swift_tool, depth + 1, 3) + [f'{ind}}}']
+        return [f'{ind}func {self._name()}(a: Int) -> Int {{', f'{ind}    return 42', f'{ind}}}']
+
+    def cpp_tool(self, depth=0):
+        ind = '    ' * depth
+        r = self.rng.random()
+        if r < .15 and depth < 2:
+            namespace = self.rng.choice(['ns', '', 'app'])
+            return [f'{ind}namespace {namespace} {{'] + self._many(self.cpp_tool, depth + 1, 3) + [f'{ind}}}']
+        if r < .3 and depth < 2:
+            return [f'{ind}class {self._type()}', f'{ind}{{'] + self._many(self.cpp_tool, depth + 1, 3) + [f'{ind}}};']
+        if r < .4:
+            return [f'{ind}int {self._type()}::{self._name()}() const {{', f'{ind}    return 42;', f'{ind}}}']
+        return [f'{ind}int {self._name()}(int a) {{', f'{ind}    return 42;', f'{ind}}}']
+
+    def rust_tool(self, depth=0):
+        ind = '    ' * depth
+        r = self.rng.random()
+        if r < .15 and depth < 2:
+            module = self.rng.choice(['m', 'tests'])
+            return [f'{ind}mod {module} {{'] + self._many(self.rust_tool, depth + 1, 3) + [f'{ind}}}']
+        if r < .3 and depth < 2:
+            return [f'{ind}impl {self._type()} {{'] + self._many(self.rust_tool, depth + 1, 3) + [f'{ind}}}']
+        return [f'{ind}fn {self._name()}(a: i64) -> i64 {{', f'{ind}    42', f'{ind}}}']
+
+    def go_tool(self, depth=0):
+        if self.rng.random() < .5:
+            receiver = self.rng.choice(['s *', '', 'c '])
+            return [f'func ({receiver}{self._type()}) {self._name()}() {{', '\treturn', '}']
+        return [f'func {self._name()}() {{', '}']
+
+    def markdown_tool(self, depth=0):
+        if self.rng.random() < .1:
+            return ['```', '# not a heading', '```']
+        heading = '#' * self.rng.randint(1, 4)
+        return [f"{heading} {self.rng.choice(['Intro', 'Usage', 'Linux', 'Notes'])}", 'text']
+
+    def css_tool(self, depth=0):
+        ind = '  ' * depth
+        r = self.rng.random()
+        if r < .15 and depth < 1:
+            return ['@media print {'] + self._many(self.css_tool, depth + 1, 3) + ['}']
+        if r < .25:
+            return [f'{ind}/* .old {{', f'{ind}}} */']
+        selector = self.rng.choice(['.a', '#main', 'body', '.nav-item'])
+        return [f'{ind}{selector} {{', f'{ind}  width: 42px;', f'{ind}}}']
+
+    def r_tool(self, depth=0):
+        ind = '  ' * depth
+        r = self.rng.random()
+        if r < .2 and depth < 2:
+            return [f'{ind}{self._name()} <- function(x) {{'] + self._many(self.r_tool, depth + 1, 2) + [f'{ind}}}']
+        if r < .3:
+            return [f'{ind}s <- "a {{', f'{ind}b"']
+        if r < .4:
+            return [f'{ind}# {self._name()} <- function(x) {{']
+        return [f'{ind}{self._name()} = function(x) {{', f'{ind}  if (x) {{', f'{ind}    42', f'{ind}  }}', f'{ind}}}']
+
+    def sql_tool(self, depth=0):
+        r = self.rng.random()
+        if r < .2:
+            return ['CREATE TABLE t (', '  id INT', ');']
+        if r < .3:
+            return ['-- note']
+        if r < .5:
+            return ['insert into t values (42);']
+        return ['SELECT a', 'FROM t', 'WHERE x = 42;']
+
+    def shell_tool(self, depth=0):
+        r = self.rng.random()
+        if r < .2:
+            return ['echo "${HOME}"']
+        if r < .3:
+            return [f'{self._name()}() {{', '  if [ -n "$1" ]; then', '    echo 42', '  fi', '}']
+        return [f'{self._name()}() {{', '  echo "${1:-42}"', '}']
+
+    def latex_tool(self, depth=0):
+        if self.rng.random() < .3 and depth < 2:
+            env = self.rng.choice(['itemize', 'figure', 'proof'])
+            return [f'\\begin{{{env}}}'] + self._many(self.latex_tool, depth + 1, 3) + [f'\\end{{{env}}}']
+        if self.rng.random() < .5:
+            return ['\\item 42']
+        return ['\\begin{equation}', 'x = 42', '\\end{equation}']
+
+    def julia_tool(self, depth=0):
+        r = self.rng.random()
+        if r < .2:
+            return [f'struct {self._type()}', '    x::Int', 'end']
+        if r < .3:
+            return ['x = 1']
+        if r < .5:
+            return [f'function {self._name()}(x)', '    if x', '        42', '    end', 'end']
+        return [f'function {self._name()}(x)', '    42', 'end']
+
+    def matlab_tool(self, depth=0):
+        r = self.rng.random()
+        if r < .2:
+            return ['% comment', 'x = 1;']
+        if r < .5:
+            return [f'function [y] = {self._name()}(x)', '  y = 42;', 'end']
+        return [f'function {self._name()}(x)', '  disp(42);', 'end']
+
+    def spss_tool(self, depth=0):
+        r = self.rng.random()
+        if r < .2:
+            return ['* comment.']
+        if r < .4:
+            return ['FREQUENCIES VARIABLES=a', '  /ORDER=ANALYSIS.']
+        if r < .6:
+            return ['EXECUTE.']
+        return ['DESCRIPTIVES VARIABLES=x42.']
+
+    def html_tool(self, depth=0):
+        ind = '  ' * depth
+        r = self.rng.random()
+        if r < .3 and depth < 3:
+            return [f'{ind}<div id="{self._name()}">'] + self._many(self.html_tool, depth + 1, 3) + [f'{ind}</div>']
+        if r < .45:
+            return [f'{ind}<div class="x">', f'{ind}</div>']
+        return [f'{ind}<p>42</p>']
+
+
+def line_tools():
+    """Every tool whose editor is a LineEditor, i.e. every tool replace_method() re-parses by window"""
+    from codecrispr_tools.line_editor import LineEditor
+    return tuple(tool for tool in sorted(set(codecrispr.LANGUAGE_MAP.values()))
+                 if issubclass(codecrispr.load_tool_module(tool).CodeCRISPR, LineEditor))
+
+
+def _extension(tool):
+    return next(ext for ext, name in codecrispr.LANGUAGE_MAP.items() if name == tool)
+
+
+def _write(path, lines):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def _replace(editor, make, rng):
+    """Replace a random block through replace_method(); False if there was none to pick"""
+    if not len(editor.reference_map):
+        return False
+    name = rng.choice(list(editor.reference_map))
+    block = editor.reference_map[name]
+    new = list(editor.lines[block['start']:block['end'] + 1])
+    r = rng.random()
+    if r < .3:
+        new = make(rng.randint(0, 2))
+    elif r < .5:
+        new = new + make(rng.randint(0, 2))
+    elif r < .6:
+        new = [line.replace('42', '7') for line in new]
+    elif r < .7:
+        new = new[:1]
+    code = '\n'.join(new)
+    if code.strip('\n'):
+        editor.replace_method(name, code)
+        _write(editor.filepath, editor.lines)
+    return True
+
+
+def _rewrite(editor, make, rng):
+    """Replace a few lines on disk and let reload() catch up"""
+    lines = list(editor.lines)
+    i = rng.randint(0, len(lines))
+    j = min(len(lines), i + rng.choice([0, 1, 2, 4]))
+    lines[i:j] = make(rng.randint(0, 2))
+    _write(editor.filepath, lines)
+    editor.reload()
+
+
+def check_tool(tool, rng, files, steps, workdir, report):
+    """Run the edits for one tool; return (edits, mismatches)"""
+    module = codecrispr.load_tool_module(tool)
+    make = getattr(Blocks(rng), tool)
+    path = os.path.join(workdir, f'sample{_extension(tool)}')
+    edits = mismatches = 0
+    for _ in range(files):
+        lines = sum((make() for _ in range(rng.randint(3, 25))), [])
+        if tool == 'php_tool':
+            lines = ['<?php'] + lines
+        _write(path, lines)
+        editor = module.CodeCRISPR(path)
+        for step in range(steps):
+            if rng.random() >= .5 or not _replace(editor, make, rng):
+                _rewrite(editor, make, rng)
+            edits += 1
+            fresh = module.CodeCRISPR(path)
+            if (list(editor.reference_map.items()) != list(fresh.reference_map.items())
+                    or list(editor.lines) != list(fresh.lines)):
+                mismatches += 1
+                report(tool, step, editor, fresh)
+                # Carry on from the correct map
+                editor = fresh
+    return edits, mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare incremental reference maps with full parses")
+    parser.add_argument('--seed', type=int, default=1, help='Random seed')
+    parser.add_argument('--files', type=int, default=8, help='Files generated per tool')
+    parser.add_argument('--steps', type=int, default=25, help='Edits per file')
+    parser.add_argument('--tools', help='Comma-separated tools (default: every line-based tool)')
+    parser.add_argument('--show', type=int, default=3, help='Mismatches printed to stderr')
+    args = parser.parse_args()
+
+    tools = args.tools.split(',') if args.tools else line_tools()
+    missing = [tool for tool in tools if not hasattr(Blocks, tool)]
+    if missing:
+        parser.error(f"no random blocks for {', '.join(missing)}; add them to Blocks")
+    rng = random.Random(args.seed)
+    shown = 0
+
+    def report(tool, step, editor, fresh):
+        nonlocal shown
+        if shown < args.show:
+            shown += 1
+            print(f"[MISMATCH] {tool} step {step}:\n  incremental {dict(editor.reference_map.items())}\n"
+                  f"  full        {dict(fresh.reference_map.items())}", file=sys.stderr)
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='codecrispr-incremental-') as workdir:
+        for tool in tools:
+            edits, mismatches = check_tool(tool, rng, args.files, args.steps, workdir, report)
+            results[tool] = {'edits': edits, 'mismatches': mismatches}
+    total = sum(r['mismatches'] for r in results.values())
+    print(json.dumps({'seed': args.seed, 'tools': results,
+                      'edits': sum(r['edits'] for r in results.values()), 'mismatches': total}, indent=2))
+    return 1 if total else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
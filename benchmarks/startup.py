@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Startup time check for CodeCRISPR
+
+    python3 benchmarks/startup.py [--lines 200] [--tool python_tool] [--budget-ms 100]
+                                  [--repeat 20] [--zipapp zip/codecrispr.pyz] [--top 10]
+
+Times short commands from process start to exit on a small generated file
+(see corpora.py), where interpreter start-up and imports rather than
+parsing decide the time: `--inspect` with the map cache off, `--inspect`
+answered from the cache, and `--complete`. With --zipapp the archive that
+tools/build_zipapp.py builds is timed the same way. Python compiles a
+script it runs directly on every start, while the archive holds bytecode;
+the summary reports that compile time as script_compile_ms.
+
+Each command also runs once under `python -X importtime`. The summary lists
+the --top modules imported at the top level by cumulative time, and the
+modules the command loaded although it should not need them (see DEFERRED).
+Prints a JSON summary and exits with status 1 if any command loaded one of
+those or any median run takes longer than --budget-ms.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+SCRIPT = os.path.join(ROOT, 'codecrispr.py')
+
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+import codecrispr  # noqa: E402
+from corpora import PROFILES, generate  # noqa: E402
+
+# Modules each command is expected to leave unimported
+DEFERRED = {
+    'inspect': ('difflib', 'mimetypes', 'asyncio', 'sqlite3', 'hashlib', 'tempfile'),
+    'inspect_cached': ('difflib', 'mimetypes', 'asyncio', 'sqlite3', 'hashlib', 'tempfile'),
+    'complete': ('argparse', 'difflib', 'mimetypes', 'shutil', 'asyncio', 'sqlite3', 'hashlib', 'tempfile'),
+}
+
+
+def _extension(tool):
+    return next(ext for ext, name in codecrispr.LANGUAGE_MAP.items() if name == tool)
+
+
+def _run(command, env, importtime=False):
+    """Run command; return (seconds, stderr)"""
+    argv = [sys.executable] + (['-X', 'importtime'] if importtime else []) + command
+    start = time.perf_counter()
+    proc = subprocess.run(argv, capture_output=True, text=True, env=env)
+    seconds = time.perf_counter() - start
+    if proc.returncode:
+        raise RuntimeError(f"{' '.join(command)} exited with status {proc.returncode}: {proc.stderr.strip()}")
+    return seconds, proc.stderr
+
+
+def import_breakdown(stderr):
+    """[(module, self_us, cumulative_us, depth)] from -X importtime output"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(own), int(cumulative), depth))
+    return rows
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 1)
+
+
+def measure(label, command, env, repeat, top):
+    _, stderr = _run(command, env, importtime=True)
+    rows = import_breakdown(stderr)
+    imported = {name for name, _, _, _ in rows}
+    # A depth-0 row's cumulative time covers everything it imported
+    toplevel = sorted((row for row in rows if row[3] == 0), key=lambda row: -row[2])
+    times = [_run(command, env)[0] for _ in range(repeat)]
+    return {
+        'median_ms': _ms(statistics.median(times)), 'max_ms': _ms(max(times)),
+        'imports_ms': round(sum(row[2] for row in toplevel) / 1000, 1),
+        'modules': len(rows),
+        'top': [{'module': name, 'cumulative_ms': round(cumulative / 1000, 2)}
+                for name, _, cumulative, _ in toplevel[:top]],
+        'unexpected': sorted(imported.intersection(DEFERRED.get(label, ()))),
+    }
+
+
+def _compile_seconds(path, repeat):
+    with open(path, encoding='utf-8') as f:
+        source = f.read()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        compile(source, path, 'exec')
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def run(tool, profile, lines, budget_ms, repeat, zipapp=None, top=10):
+    workdir = tempfile.mkdtemp(prefix='codecrispr-startup-')
+    path = os.path.join(workdir, f'target{_extension(tool)}')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(generate(tool, lines, profile))
+    cached = dict(os.environ, CODECRISPR_CONFIG=os.devnull, CODECRISPR_CACHE_ENABLED='true',
+                  CODECRISPR_CACHE_DIRECTORY=os.path.join(workdir, 'cache'))
+    uncached = dict(cached, CODECRISPR_CACHE_ENABLED='false')
+
+    entries = [('script', SCRIPT)]
+    if zipapp:
+        entries.append(('zipapp', os.path.abspath(zipapp)))
+    results = {}
+    for entry, program in entries:
+        # Fill the map cache for the cached commands
+        _run([program, path, '--inspect'], cached)
+        results[entry] = {
+            'inspect': measure('inspect', [program, path, '--inspect'], uncached, repeat, top),
+            'inspect_cached': measure('inspect_cached', [program, path, '--inspect'], cached, repeat, top),
+            'complete': measure('complete', [program, path, '--complete'], cached, repeat, top),
+        }
+    baseline = [_run(['-c', 'pass'], uncached)[0] for _ in range(repeat)]
+
+    medians = [m['median_ms'] for commands in results.values() for m in commands.values()]
+    unexpected = [m['unexpected'] for commands in results.values() for m in commands.values()]
+    return {
+        'tool': tool, 'profile': profile, 'lines': lines, 'repeat': repeat,
+        'python_ms': _ms(statistics.median(baseline)),
+        'script_compile_ms': _ms(_compile_seconds(SCRIPT, repeat)),
+        'results': results,
+        'budget_ms': budget_ms,
+        'within_budget': max(medians) <= budget_ms,
+        'deferred_ok': not any(unexpected),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time CLI start-up against a budget")
+    parser.add_argument('--tool', default='python_tool', help='Tool whose language the file is written in')
+    parser.add_argument('--profile', default='flat', choices=sorted(PROFILES), help='Corpus profile')
+    parser.add_argument('--lines', type=int, default=200, help='Lines in the generated file')
+    parser.add_argument('--budget-ms', type=float, default=100, help='Largest median time allowed for any command')
+    parser.add_argument('--repeat', type=int, default=20, help='Timed runs per command')
+    parser.add_argument('--zipapp', help='Also time this archive built by tools/build_zipapp.py')
+    parser.add_argument('--top', type=int, default=10, help='Top-level imports listed per command')
+    args = parser.parse_args()
+    summary = run(args.tool, args.profile, args.lines, args.budget_ms, args.repeat, args.zipapp, args.top)
+    print(json.dumps(summary, indent=2))
+    return 0 if summary['within_budget'] and summary['deferred_ok'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
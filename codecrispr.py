@@ -2,17 +2,25 @@
 """
 CodeCRISPR: Precise Code Editing Framework
 """
-import argparse
 import os
 import sys
-import importlib.util
-import re
-import json
-import shutil
-import difflib
-import mimetypes
-import configparser
-from pathlib import Path
+
+# Heavier modules (argparse, json, difflib, shutil, mimetypes, configparser)
+# are imported inside the functions that need them to keep startup fast.
+
+# tools/ is imported as this package rather than as a top-level `tools`,
+# which any other project on sys.path may also have
+TOOLS_PACKAGE = 'codecrispr_tools'
+
+def register_tools():
+    """Make tools/ importable as TOOLS_PACKAGE; also the initializer of worker processes"""
+    if TOOLS_PACKAGE not in sys.modules:
+        package = type(sys)(TOOLS_PACKAGE)
+        package.__path__ = [os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tools')]
+        package.__package__ = TOOLS_PACKAGE
+        sys.modules[TOOLS_PACKAGE] = package
+
+register_tools()
 
 # Extended language mappings with additional file extensions
 LANGUAGE_MAP = {
@@ -106,8 +114,10 @@ LANGUAGE_MAP = {
 
 DEFAULT_CONFIG = {
     'general': {
-        'backup_enabled': 'true',
+        'backup_enabled': 'false',
+        'keep_snapshot': 'false',
         'backup_extension': '.bak',
+        'durability': 'file',
         'default_language': 'python_tool',
         'auto_format': 'false'
     },
@@ -119,85 +129,179 @@ DEFAULT_CONFIG = {
     'editor': {
         'tab_size': '4',
         'use_spaces': 'true',
-        'trim_trailing_whitespace': 'true'
+        'trim_trailing_whitespace': 'true',
+        'mmap_threshold_mb': '64'
+    },
+    'cache': {
+        'enabled': 'true',
+        'directory': '~/.codecrispr/cache',
+        'max_size_mb': '64'
+    },
+    'batch': {
+        'workers': '0'
+    },
+    'index': {
+        'database': '~/.codecrispr/index.db',
+        'exclude_dirs': 'node_modules,__pycache__,venv,build,dist'
+    },
+    'server': {
+        'max_editors': '32',
+        'socket_path': '~/.codecrispr/codecrispr.sock'
+    },
+    'json': {
+        'streaming': 'true',
+        'index_depth': '0'
+    },
+    'xml': {
+        'index_depth': '0'
+    },
+    'watch': {
+        'interval': '0.5',
+        'backend': 'auto'
+    },
+    'timings': {
+        'log': ''
+    },
+    'locking': {
+        'mode': 'optimistic',
+        'timeout': '10',
+        'dir': '~/.codecrispr/locks'
+    },
+    'api': {
+        'workers': '0',
+        'max_editors': '32'
+    },
+    'diff': {
+        'algorithm': 'histogram'
     }
 }
 
-def validate_file_access(filepath):
-    """Validate file exists and is readable"""
+class CodeCRISPRError(Exception):
+    """Base class of the errors raised by the library functions"""
+
+class LoadError(CodeCRISPRError):
+    """A file could not be parsed by its tool"""
+
+class ConflictError(CodeCRISPRError, ValueError):
+    """A block changed underneath an edit, so the edit was not made"""
+
+def check_file_access(filepath):
+    """Raise FileNotFoundError, IsADirectoryError or PermissionError unless filepath is a readable file"""
     if not os.path.exists(filepath):
-        print(f"[ERROR] File not found: {filepath}")
-        sys.exit(1)
+        raise FileNotFoundError(f"File not found: {filepath}")
     if not os.path.isfile(filepath):
-        print(f"[ERROR] Not a file: {filepath}")
-        sys.exit(1)
+        raise IsADirectoryError(f"Not a file: {filepath}")
     if not os.access(filepath, os.R_OK):
-        print(f"[ERROR] File not readable: {filepath}")
+        raise PermissionError(f"File not readable: {filepath}")
+
+def validate_file_access(filepath):
+    """Validate file exists and is readable"""
+    try:
+        check_file_access(filepath)
+    except OSError as e:
+        print(f"[ERROR] {e}")
         sys.exit(1)
     return True
 
-def safe_write_file(filepath, content, config=None):
-    """Safely write file with backup"""
+def _write_content(f, content):
+    """Write a string, or stream a line buffer chunk by chunk"""
+    if hasattr(content, 'write_to'):
+        content.write_to(f)
+    else:
+        f.write(content)
+
+def write_file(filepath, content, config=None):
+    """Atomically replace a file, optionally keeping a snapshot of the old one
+    
+    content is a string or an object with a write_to(file) method, such as
+    an editor's line buffer, which is streamed instead of joined in memory;
+    objects with a true `binary` attribute are given a binary file.
+    """
+    from codecrispr_tools import timings
+    from codecrispr_tools.atomic_write import atomic_write
+    
     if config is None:
         config = load_config()
     
-    backup_enabled = config.getboolean('general', 'backup_enabled', fallback=True)
-    backup_extension = config.get('general', 'backup_extension', fallback='.bak')
+    # backup_enabled asked for a backup that lasted only while the file was
+    # rewritten; the atomic rename gives that guarantee, so it leaves nothing
+    backup_path = None
+    if config.getboolean('general', 'keep_snapshot', fallback=False):
+        backup_path = f"{filepath}{config.get('general', 'backup_extension', fallback='.bak')}"
+    durability = config.get('general', 'durability', fallback='file')
     
-    if backup_enabled:
-        backup_path = f"{filepath}{backup_extension}"
-        try:
-            # Create backup if file exists
-            if os.path.exists(filepath):
-                shutil.copy2(filepath, backup_path)
-            
-            # Write new content
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(content)
-            
-            # Remove backup on success
-            if os.path.exists(backup_path):
-                os.remove(backup_path)
-            
-            return True
-        except Exception as e:
-            # Restore from backup on failure
-            if os.path.exists(backup_path):
-                shutil.move(backup_path, filepath)
-            print(f"[ERROR] Failed to write file: {e}")
-            return False
-    else:
-        try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(content)
-            return True
-        except Exception as e:
-            print(f"[ERROR] Failed to write file: {e}")
-            return False
+    with timings.phase('write'):
+        atomic_write(filepath, lambda f: _write_content(f, content),
+                     binary=getattr(content, 'binary', False),
+                     durability=durability, backup_path=backup_path)
+    timings.note('bytes_written', os.path.getsize(filepath), add=True)
+
+def safe_write_file(filepath, content, config=None):
+    """write_file(), printing any error; returns whether the file was written"""
+    try:
+        write_file(filepath, content, config)
+        return True
+    except Exception as e:
+        print(f"[ERROR] Failed to write file: {e}")
+        return False
+
+CONFIG_FILE = '~/.codecrispr/config.ini'
 
-def load_config():
-    """Load configuration from ~/.codecrispr/config.ini"""
+_config = None
+
+def config_file_path():
+    """Path of the user config file (overridable with CODECRISPR_CONFIG)"""
+    return os.path.expanduser(os.environ.get('CODECRISPR_CONFIG', CONFIG_FILE))
+
+def load_config(reload=False):
+    """Load configuration from ~/.codecrispr/config.ini
+    
+    The result is cached for the life of the process. Values can be overridden
+    with CODECRISPR_<SECTION>_<OPTION> environment variables, e.g.
+    CODECRISPR_GENERAL_BACKUP_ENABLED=false. Nothing is written to disk.
+    """
+    global _config
+    if _config is not None and not reload:
+        return _config
+    
+    import configparser
     config = configparser.ConfigParser()
     config.read_dict(DEFAULT_CONFIG)  # Load defaults first
+    config.read(config_file_path())  # Missing file is simply skipped
     
-    config_dir = os.path.expanduser('~/.codecrispr')
-    config_file = os.path.join(config_dir, 'config.ini')
-    
-    if os.path.exists(config_file):
-        config.read(config_file)
-    else:
-        # Create default config if it doesn't exist
-        os.makedirs(config_dir, exist_ok=True)
-        try:
-            with open(config_file, 'w') as f:
-                config.write(f)
-        except Exception as e:
-            print(f"[WARNING] Could not create config file: {e}")
+    for key, value in os.environ.items():
+        if not key.startswith('CODECRISPR_') or key == 'CODECRISPR_CONFIG':
+            continue
+        for section in config.sections():
+            prefix = f'CODECRISPR_{section.upper()}_'
+            if key.startswith(prefix):
+                config.set(section, key[len(prefix):].lower(), value)
+                break
     
+    _config = config
     return config
 
-def detect_language(file_path):
-    """Enhanced language detection with fallback mechanisms"""
+def save_config_value(section, option, value):
+    """Persist a single value to the user config file"""
+    import configparser
+    config_file = config_file_path()
+    stored = configparser.ConfigParser()
+    stored.read_dict(DEFAULT_CONFIG)
+    stored.read(config_file)
+    if not stored.has_section(section):
+        stored.add_section(section)
+    stored.set(section, option, value)
+    os.makedirs(os.path.dirname(config_file), exist_ok=True)
+    with open(config_file, 'w') as f:
+        stored.write(f)
+    load_config(reload=True)
+
+def detect_language(file_path, warnings=None):
+    """Enhanced language detection with fallback mechanisms
+    
+    Never prints: when the file type is unknown and the configured default
+    is used, the reason is appended to warnings (if given).
+    """
     ext = os.path.splitext(file_path)[1].lower()
     
     # Check our mapping first
@@ -205,6 +309,7 @@ def detect_language(file_path):
         return LANGUAGE_MAP[ext]
     
     # Fallback to mimetypes
+    import mimetypes
     mime_type, _ = mimetypes.guess_type(file_path)
     if mime_type:
         if 'javascript' in mime_type:
@@ -232,51 +337,332 @@ def detect_language(file_path):
     # Load default from config
     config = load_config()
     default_tool = config.get('general', 'default_language', fallback='python_tool')
-    print(f"[WARNING] Unknown file type for '{file_path}', defaulting to {default_tool}")
+    if warnings is not None:
+        warnings.append(f"Unknown file type for '{file_path}', defaulting to {default_tool}")
     return default_tool
 
-def load_editor(file_path):
-    """Load the appropriate language-specific editor"""
-    validate_file_access(file_path)
-    tool_name = detect_language(file_path)
+def load_tool_module(tool_name):
+    """Import tools/<tool_name>.py (works from a checkout or a zipapp)"""
+    import importlib
+    return importlib.import_module(f'{TOOLS_PACKAGE}.{tool_name}')
+
+def __getattr__(name):
+    # `from codecrispr import api` loads the library API on first use
+    if name == 'api':
+        return load_tool_module('api')
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def open_editor(file_path, config=None, lazy=False, warnings=None):
+    """Load the appropriate language-specific editor
+    
+    The reference map is taken from the persistent map cache when the file is
+    unchanged since it was last parsed. With lazy=True a cached editor skips
+    reading the file content too, which is enough for listing blocks.
+    detect_language() warnings are appended to warnings.
+    
+    Raises OSError if the file cannot be read and LoadError if its tool fails.
+    """
+    from codecrispr_tools import timings
+    
+    check_file_access(file_path)
+    with timings.phase('detect'):
+        tool_name = detect_language(file_path, warnings)
+    timings.note('tool', tool_name)
+    
+    if config is None:
+        config = load_config()
     
     try:
-        # Get the directory where this script is located
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        tool_path = os.path.join(script_dir, 'tools', f'{tool_name}.py')
+        # Taken before the file is read, so a write racing the read is
+        # noticed when the editor is saved
+        disk_state = None
+        if not lazy:
+            from codecrispr_tools.file_lock import FileLock
+            lock = FileLock.from_config(file_path, config)
+            disk_state = lock.state() if lock is not None else None
         
-        spec = importlib.util.spec_from_file_location(tool_name, tool_path)
-        module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(module)
-        editor = module.CodeCRISPR(file_path)
+        with timings.phase('import'):
+            module = load_tool_module(tool_name)
+        
+        from codecrispr_tools.line_editor import mmap_threshold
+        from codecrispr_tools.map_cache import MapCache
+        cache = MapCache.from_config(config)
+        if cache is not None:
+            with timings.phase('cache'):
+                reference_map = cache.lookup(file_path, tool_name)
+            if reference_map is not None:
+                editor = module.CodeCRISPR.__new__(module.CodeCRISPR)
+                editor.filepath = file_path
+                editor.mmap_threshold = mmap_threshold(config)
+                if not lazy:
+                    with timings.phase('read'):
+                        editor.lines = editor._read_file()
+                    timings.note('bytes_read', os.path.getsize(file_path), add=True)
+                else:
+                    # Stored hashes stand in for the content that was not read
+                    editor.cached_hashes = {name: pos.get('hash') for name, pos in reference_map.items()}
+                editor.reference_map = reference_map
+                editor.disk_state = disk_state
+                timings.note('cached', True)
+                if timings.recording():
+                    timings.note('blocks', len(editor.reference_map))
+                return editor
+        
+        # Stamped before the parse reads the file, for cache.store()
+        before = os.stat(file_path) if cache is not None else None
+        # Tools with settings of their own read them from the configuration
+        with timings.phase('load'):
+            if hasattr(module.CodeCRISPR, 'from_config'):
+                editor = module.CodeCRISPR.from_config(file_path, config)
+            else:
+                editor = module.CodeCRISPR(file_path)
+        editor.disk_state = disk_state
+        timings.note('bytes_read', os.path.getsize(file_path), add=True)
+        # Only line-based tools have a plain, serializable reference map
+        if cache is not None and hasattr(editor, 'lines'):
+            with timings.phase('cache'):
+                cache.store(file_path, tool_name, editor.reference_map, block_hashes(editor), before)
+        if timings.recording():
+            timings.note('blocks', len(editor.reference_map))
         return editor
     except Exception as e:
-        print(f"[ERROR] Failed to load editor for {tool_name}: {e}")
+        raise LoadError(f"Failed to load editor for {tool_name}: {e}") from e
+
+def load_editor(file_path, config=None, lazy=False):
+    """open_editor() for the command line: prints warnings and any error, and exits on errors"""
+    warnings = []
+    try:
+        editor = open_editor(file_path, config, lazy, warnings)
+    except (OSError, LoadError) as e:
+        editor = None
+        error = e
+    for warning in warnings:
+        print(f"[WARNING] {warning}")
+    if editor is None:
+        print(f"[ERROR] {error}")
         sys.exit(1)
+    return editor
+
+def save_editor(editor, filepath, config=None, edits=None):
+    """Write an editor's current content back to disk, holding the file's lock
+    
+    If another writer replaced the file since the editor read it, edits (the
+    (name, code, base hash) replacements made to the editor) are redone on
+    the file as it is now, provided none of their blocks changed, and the
+    editor takes on the merged content. Otherwise ConflictError is raised
+    and nothing is written. Write failures raise OSError.
+    """
+    from codecrispr_tools import timings
+    from codecrispr_tools.file_lock import FileLock
+    
+    if config is None:
+        config = load_config()
+    lock = FileLock.from_config(filepath, config)
+    if lock is None:
+        _save_content(editor, filepath, config)
+        return
+    with timings.phase('lock'):
+        lock.acquire()
+    try:
+        state = getattr(editor, 'disk_state', None)
+        if state is not None:
+            try:
+                current = lock.state()
+            except OSError:
+                current = None
+            if current != state:
+                with timings.phase('merge'):
+                    merge_concurrent(editor, filepath, edits, config)
+        _save_content(editor, filepath, config)
+        lock.bump()
+        editor.disk_state = lock.state()
+    finally:
+        lock.release()
+
+def write_editor(editor, filepath, config=None, edits=None):
+    """save_editor(), printing any write error; returns whether the file was written
+    
+    ConflictError is still raised, so callers can report conflicts apart.
+    """
+    try:
+        save_editor(editor, filepath, config, edits)
+        return True
+    except ConflictError:
+        raise
+    except Exception as e:
+        print(f"[ERROR] Failed to write file: {e}")
+        return False
+
+def merge_concurrent(editor, filepath, edits, config):
+    """Redo edits on a fresh parse of filepath and give editor the result
+    
+    Raises ConflictError if locking.mode is strict, if the edits are not
+    known, or if any edited block is missing or no longer has its base hash.
+    """
+    from codecrispr_tools import timings
+    changed = f"'{filepath}' was changed by another writer since it was read"
+    if config.get('locking', 'mode', fallback='optimistic') == 'strict' or edits is None:
+        raise ConflictError(f"{changed}; nothing written.")
+    try:
+        fresh = open_editor(filepath, config)
+    except (OSError, LoadError):
+        raise ConflictError(f"{changed} and can no longer be read; nothing written.")
+    for name, _, base in edits:
+        if base is None or name not in fresh.reference_map or block_hash(fresh, name) != base:
+            raise ConflictError(f"Block '{name}' was changed by another writer since it was read; inspect it again before editing.")
+    for name, code, _ in sorted(edits, key=lambda edit: fresh.reference_map[edit[0]]['start'], reverse=True):
+        fresh.replace_method(name, code)
+    # Callers keep their reference to editor, so it takes the merged state
+    editor.__dict__.update(vars(fresh))
+    timings.note('merged', len(edits))
+
+def _save_content(editor, filepath, config):
+    """Write an editor's content with whatever its kind of tool supports"""
+    if hasattr(editor, 'lines'):
+        lines = editor.lines
+        if not hasattr(lines, 'write_to'):
+            lines = '\n'.join(lines) + '\n'
+        write_file(filepath, lines, config)
+    # Byte-span documents (JSON, XML, SVG) stream their spliced bytes
+    elif hasattr(editor.reference_map, 'write_to'):
+        write_file(filepath, editor.reference_map, config)
+    # Tree-based tools serialize themselves
+    else:
+        editor.save(filepath)
+
+def block_spans(reference_map):
+    """(name, start, end) for every block; start and end are None for blocks without a span
+    
+    Block tables are read column by column, without a dictionary per block.
+    """
+    if hasattr(reference_map, 'spans'):
+        return reference_map.spans()
+    return ((name, pos['start'], pos['end']) if isinstance(pos, dict) else (name, None, None)
+            for name, pos in reference_map.items())
+
+def block_names(file_path, config=None):
+    """Names of a file's blocks, in file order, for shell completion
+    
+    A fresh map cache entry answers without importing the file's tool;
+    otherwise the file is parsed, which refreshes the entry for next time.
+    
+    Raises OSError if the file cannot be read and LoadError if its tool fails.
+    """
+    check_file_access(file_path)
+    if config is None:
+        config = load_config()
+    from codecrispr_tools.map_cache import MapCache
+    cache = MapCache.from_config(config)
+    reference_map = cache.lookup(file_path, detect_language(file_path)) if cache is not None else None
+    if reference_map is None:
+        reference_map = open_editor(file_path, config, lazy=True).reference_map
+    return [name for name, _, _ in block_spans(reference_map)]
+
+def find_blocks(reference_map, pattern):
+    """Names of the blocks matching a prefix or glob pattern, in file order
+    
+    Short names count too, so `pars*` finds `Parser.parse`. Block tables
+    answer from their name trie; other maps are scanned.
+    """
+    if hasattr(reference_map, 'find'):
+        return reference_map.find(pattern)
+    from fnmatch import fnmatchcase
+    if not any(c in '*?[' for c in pattern):
+        pattern += '*'
+    return [name for name in reference_map
+            if fnmatchcase(name, pattern) or fnmatchcase(name.rsplit('::', 1)[-1], pattern)]
+
+def _digest(data):
+    # map_cache's blake2b skips loading OpenSSL
+    from codecrispr_tools.map_cache import blake2b
+    return blake2b(data, digest_size=8).hexdigest()
+
+def block_hash(editor, name):
+    """Content hash of a block: 16 hex digits of BLAKE2b over its text
+    
+    Line-based blocks hash their lines joined with newlines, byte-span
+    blocks their bytes. The symbol index stores the same digest. Returns
+    None for tools whose blocks have no span.
+    """
+    pos = editor.reference_map[name]
+    if not isinstance(pos, dict):
+        return None
+    if hasattr(editor, 'lines'):
+        return _digest('\n'.join(editor.lines[pos['start']:pos['end'] + 1]).encode('utf-8', 'surrogateescape'))
+    if hasattr(editor.reference_map, 'read'):
+        return _digest(editor.reference_map.read(name))
+    return None
+
+def block_hashes(editor):
+    """block_hash() of every block, by name"""
+    if not hasattr(editor, 'lines'):
+        if getattr(editor, 'cached_hashes', None) is not None:
+            return editor.cached_hashes
+        return {name: block_hash(editor, name) for name in editor.reference_map}
+    lines = editor.lines
+    return {name: _digest('\n'.join(lines[start:end + 1]).encode('utf-8', 'surrogateescape'))
+            if start is not None else None
+            for name, start, end in block_spans(editor.reference_map)}
 
-def generate_diff(original_lines, new_lines, context_lines=3):
-    """Generate a unified diff between original and new content"""
-    diff = difflib.unified_diff(
+def missing_block_message(reference_map, name, what='Block'):
+    """Why name is not in reference_map: not found, or a short name several blocks share"""
+    try:
+        reference_map[name]
+    except KeyError as e:
+        if getattr(e, 'candidates', None):
+            return f"{what} {e}; use the qualified name."
+    return f"{what} '{name}' not found."
+
+def check_block_hash(editor, name, expected):
+    """Raise ConflictError if block name no longer has the content hash expected"""
+    if name not in editor.reference_map:
+        return
+    actual = block_hash(editor, name)
+    if actual != expected:
+        raise ConflictError(f"Block '{name}' has changed (hash {actual}, expected {expected}); inspect it again before editing.")
+
+def generate_diff(original_lines, new_lines, context_lines=3, config=None):
+    """Generate a unified diff between original and new content
+    
+    The algorithm is diff.algorithm: histogram (default), myers or difflib.
+    """
+    from codecrispr_tools.diff_engine import unified_diff
+    if config is None:
+        config = load_config()
+    diff = unified_diff(
         original_lines,
         new_lines,
         fromfile='original',
         tofile='modified',
-        lineterm='',
-        n=context_lines
+        n=context_lines,
+        algorithm=config.get('diff', 'algorithm', fallback='histogram')
     )
     return '\n'.join(diff)
 
-def show_changes_preview(editor, method_name, new_code):
+def block_lines(editor, name):
+    """The current lines of a block, for line-based and byte-span tools alike"""
+    block = editor.reference_map[name]
+    if hasattr(editor, 'lines'):
+        return editor.lines[block['start']:block['end'] + 1]
+    return editor.reference_map.read(name).decode('utf-8', 'surrogateescape').splitlines()
+
+def show_changes_preview(editor, method_name, new_code, config=None):
     """Show a preview of changes before applying them"""
     if method_name not in editor.reference_map:
-        print(f"[ERROR] Method '{method_name}' not found.")
+        print(f"[ERROR] {missing_block_message(editor.reference_map, method_name, 'Method')}")
         return False
     
-    block = editor.reference_map[method_name]
-    original_lines = editor.lines[block['start']:block['end'] + 1]
+    original_lines = block_lines(editor, method_name)
     new_lines = new_code.splitlines()
     
-    diff_output = generate_diff(original_lines, new_lines)
+    from codecrispr_tools.line_editor import without_blank_tail
+    if without_blank_tail(original_lines) == without_blank_tail(new_lines):
+        print(f"[UNCHANGED] Block '{method_name}' already has this content")
+        return True
+    
+    from codecrispr_tools import timings
+    with timings.phase('diff'):
+        diff_output = generate_diff(original_lines, new_lines, config=config)
     
     print(f"[PREVIEW] Changes to '{method_name}':")
     print(diff_output)
@@ -284,30 +670,199 @@ def show_changes_preview(editor, method_name, new_code):
     
     return True
 
-def batch_replace_methods(editor, updates):
+def batch_patch(editor, updates, filepath, config=None, context_lines=3):
+    """One unified patch with every change a batch would make, without writing
+    
+    updates are batch_replace_methods() tuples. Each block is diffed on its
+    own against the parsed file and laid out at its real line numbers, with
+    a/ and b/ headers so that `git apply` takes the patch. Line-based editors
+    are left untouched; byte-span editors hold the replacements afterwards
+    and should be discarded. Returns (patch lines, report) where report lists
+    the 'changed', 'unchanged' and 'skipped' (not found) names, 'failed'
+    (name, error) pairs and 'superseded' (name, enclosing name) pairs.
+    """
+    from codecrispr_tools import diff_engine
+    report = {'changed': [], 'unchanged': [], 'skipped': [], 'failed': [], 'superseded': []}
+    entries = []
+    for index, (method_name, new_code, *expected) in enumerate(updates):
+        if method_name not in editor.reference_map:
+            report['skipped'].append(method_name)
+            continue
+        if expected and expected[0] is not None:
+            try:
+                check_block_hash(editor, method_name, expected[0])
+            except ConflictError as e:
+                report['failed'].append((method_name, str(e)))
+                continue
+        block = editor.reference_map[method_name]
+        entries.append((block['start'], block['end'] + 1, index, method_name, new_code))
+    
+    if hasattr(editor, 'lines'):
+        from codecrispr_tools.line_editor import without_blank_tail
+        lines = editor.lines
+        a_newline = _ends_with_newline(filepath)
+        b_newline = True
+        edits = []
+        # batch_replace_methods() replaces enclosing blocks last, so they win
+        # over blocks inside them, and a later update of a block over an earlier one
+        entries.sort(key=lambda entry: (entry[0], -entry[1], -entry[2]))
+        outer_end, outer = -1, None
+        for start, stop, _, method_name, new_code in entries:
+            if start < outer_end:
+                report['superseded'].append((method_name, outer))
+                continue
+            outer_end, outer = stop, method_name
+            old = lines[start:stop]
+            new = new_code.strip('\n').splitlines()
+            if without_blank_tail(old) == without_blank_tail(new):
+                report['unchanged'].append(method_name)
+                continue
+            edits.append((start, old, new))
+            report['changed'].append(method_name)
+    else:
+        from codecrispr_tools.mapped_lines import MappedLines
+        entries.sort(key=lambda entry: entry[2])
+        unchanged = []
+        successful, failed = batch_replace_methods(editor, [entry[3:] for entry in entries], unchanged)
+        report['changed'] = successful
+        report['unchanged'] = unchanged
+        report['failed'] += failed
+        lines = MappedLines(filepath, 'utf-8')
+        a_newline = _ends_with_newline(filepath)
+        edits, b_newline = lines.line_edits(editor.reference_map.splices())
+    
+    try:
+        name = os.path.relpath(filepath).replace(os.sep, '/')
+    except ValueError:
+        name = filepath
+    algorithm = (config or load_config()).get('diff', 'algorithm', fallback='histogram')
+    patch = list(diff_engine.unified_patch(lines, edits, f'a/{name}', f'b/{name}', context_lines,
+                                           algorithm, a_newline, b_newline))
+    return patch, report
+
+def _ends_with_newline(filepath):
+    """Whether a file is empty or ends with a line break"""
+    with open(filepath, 'rb') as f:
+        if f.seek(0, os.SEEK_END) == 0:
+            return True
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b'\n'
+
+def show_batch_preview(editor, updates, filepath, config=None, output=None):
+    """Print the patch a batch would apply, or write it to output
+    
+    The patch alone goes to stdout, so it can be piped to `git apply`;
+    notes about the batch go to stderr in that case. Returns the number of
+    blocks that would change.
+    """
+    from codecrispr_tools import timings
+    with timings.phase('diff'):
+        patch, report = batch_patch(editor, updates, filepath, config)
+    notes = sys.stdout if output else sys.stderr
+    _batch_notes(editor, report, notes)
+    _emit_patch(patch, len(report['changed']), len(updates), output, notes)
+    return len(report['changed'])
+
+def show_manifest_preview(grouped, config=None, output=None):
+    """show_batch_preview() for a multi-file manifest: one patch covering every file
+    
+    grouped is batch_runner.group_updates() output. Nothing is written but
+    the exported patch. Returns (blocks that would change, files that could
+    not be loaded).
+    """
+    from codecrispr_tools import timings
+    notes = sys.stdout if output else sys.stderr
+    patch, changed, total, errors = [], 0, 0, 0
+    for path, updates in grouped.items():
+        total += len(updates)
+        warnings = []
+        try:
+            editor = open_editor(path, config, warnings=warnings)
+        except (OSError, LoadError) as e:
+            print(f"[ERROR] {e}", file=notes)
+            errors += 1
+            continue
+        for warning in warnings:
+            print(f"[WARNING] {warning}", file=notes)
+        with timings.phase('diff'):
+            file_patch, report = batch_patch(editor, updates, path, config)
+        _batch_notes(editor, report, notes)
+        patch += file_patch
+        changed += len(report['changed'])
+    _emit_patch(patch, changed, total, output, notes)
+    return changed, errors
+
+def _batch_notes(editor, report, notes):
+    for method_name in report['skipped']:
+        print(f"[WARNING] {missing_block_message(editor.reference_map, method_name, 'Method')[:-1]}, skipping.", file=notes)
+    for method_name, outer in report['superseded']:
+        if method_name == outer:
+            print(f"[WARNING] '{method_name}' is updated more than once; only its last update has an effect.", file=notes)
+        else:
+            print(f"[WARNING] '{method_name}' lies inside '{outer}', which this batch also replaces; "
+                  f"its update has no effect.", file=notes)
+    if report['unchanged']:
+        print(f"[UNCHANGED] {len(report['unchanged'])} methods already have this content: "
+              f"{', '.join(report['unchanged'])}", file=notes)
+    if report['failed']:
+        print(f"[WARNING] {len(report['failed'])} methods would fail to update:", file=notes)
+        for method_name, error in report['failed']:
+            print(f"  - {method_name}: {error}", file=notes)
+
+def _emit_patch(patch, changed, total, output, notes):
+    text = ''.join(line + '\n' for line in patch)
+    if output:
+        with open(output, 'w') as f:
+            f.write(text)
+        print(f"[SUCCESS] Patch for {changed} blocks exported to {output}")
+    else:
+        sys.stdout.write(text)
+        sys.stdout.flush()
+    print(f"[INFO] {changed} of {total} blocks would change. "
+          f"Use --apply to apply these changes", file=notes)
+
+def batch_replace_methods(editor, updates, unchanged=None, applied=None):
     """
     Replace multiple methods in a single operation
-    updates: list of (method_name, new_code) tuples
+    updates: list of (method_name, new_code) or (method_name, new_code, if_hash) tuples
+    
+    An update with an if_hash fails unless the block's content hash matched
+    before the batch started. Updates that leave their block as it was are
+    appended to `unchanged` when it is given, and count as successful otherwise.
+    Updates that changed their block are appended to `applied`, when it is
+    given, as (method_name, new_code, hash before the batch) for write_editor().
     """
     # Sort updates by start position (descending) to avoid offset issues
     sorted_updates = []
-    for method_name, new_code in updates:
+    failed_updates = []
+    for method_name, new_code, *expected in updates:
         if method_name not in editor.reference_map:
-            print(f"[WARNING] Method '{method_name}' not found, skipping.")
+            print(f"[WARNING] {missing_block_message(editor.reference_map, method_name, 'Method')[:-1]}, skipping.")
             continue
+        if expected and expected[0] is not None:
+            try:
+                check_block_hash(editor, method_name, expected[0])
+            except ValueError as e:
+                failed_updates.append((method_name, str(e)))
+                continue
         start = editor.reference_map[method_name]['start']
-        sorted_updates.append((start, method_name, new_code))
+        base = block_hash(editor, method_name) if applied is not None else None
+        sorted_updates.append((start, method_name, new_code, base))
     
     # Sort by start position in descending order
     sorted_updates.sort(reverse=True, key=lambda x: x[0])
     
     # Apply updates from bottom to top to preserve line numbers
     successful_updates = []
-    failed_updates = []
     
-    for _, method_name, new_code in sorted_updates:
+    for _, method_name, new_code, base in sorted_updates:
         try:
-            editor.replace_method(method_name, new_code)
+            if editor.replace_method(method_name, new_code) is False:
+                if unchanged is not None:
+                    unchanged.append(method_name)
+                    continue
+            elif applied is not None:
+                applied.append((method_name, new_code, base))
             successful_updates.append(method_name)
         except Exception as e:
             failed_updates.append((method_name, str(e)))
@@ -316,13 +871,60 @@ def batch_replace_methods(editor, updates):
 
 def output_as_json(data, config):
     """Output data as JSON for better integration with other tools"""
+    import json
     pretty = config.getboolean('output', 'json_pretty', fallback=True)
     if pretty:
         return json.dumps(data, indent=2)
     return json.dumps(data)
 
+# Functions listed by --profile when no output file is given
+PROFILE_LIMIT = 40
+
+def report_profile(profiler, destination='-'):
+    """Print cProfile stats by cumulative time to stderr ('-') or save them to a file"""
+    if destination != '-':
+        profiler.dump_stats(destination)
+        print(f"[PROFILE] Stats written to {destination}", file=sys.stderr)
+        return
+    import pstats
+    pstats.Stats(profiler, stream=sys.stderr).sort_stats('cumulative').print_stats(PROFILE_LIMIT)
+
+def complete(argv):
+    """--complete: print FILE's block names, or with --config the config keys, one per line
+    
+    The shell completion scripts run this on every TAB press, so it is
+    answered before argparse and the timings recorder are loaded. Errors go
+    to stderr and leave stdout empty; returns the exit status.
+    """
+    args = [a for a in argv if a != '--complete']
+    if '--config' in args:
+        config = load_config()
+        names = [f"{section}.{option}" for section in config.sections() for option in config.options(section)]
+    else:
+        files = [a for a in args if not a.startswith('-')]
+        if not files:
+            print("[ERROR] --complete needs a file or --config", file=sys.stderr)
+            return 2
+        try:
+            names = block_names(files[0])
+        except (OSError, LoadError) as e:
+            print(f"[ERROR] {e}", file=sys.stderr)
+            return 1
+    if names:
+        sys.stdout.write('\n'.join(names) + '\n')
+    return 0
+
 def main():
-    config = load_config()
+    if '--complete' in sys.argv[1:]:
+        sys.exit(complete(sys.argv[1:]))
+    
+    import argparse
+    from codecrispr_tools import timings
+    
+    # Recording is cheap; the report is dropped unless it was asked for
+    timings.start()
+    with timings.phase('config'):
+        config = load_config()
     
     parser = argparse.ArgumentParser(description="CodeCRISPR: Precise Code Editing Framework")
     parser.add_argument('file', nargs='?', help='Path to the source file')
@@ -332,6 +934,8 @@ def main():
     # Inspection options
     parser.add_argument('--inspect', action='store_true', help='Inspect available blocks')
     parser.add_argument('--preview', help='Preview a named block')
+    parser.add_argument('--complete', action='store_true', help='Print the block names of the file (or with --config the configuration keys) one per line, for shell completion')
+    parser.add_argument('--find', metavar='PATTERN', help="List blocks whose full or short name starts with PATTERN or matches it as a glob (e.g. 'pars*')")
     parser.add_argument('--with-lines', action='store_true', help='Include line numbers in preview')
     parser.add_argument('--as-comment', action='store_true', help='Add comment delimiters to each line')
     parser.add_argument('--preview-only', action='store_true', help='Only show the preview, no metadata')
@@ -342,14 +946,55 @@ def main():
     parser.add_argument('--pretty', action='store_true', help='Pretty print JSON output')
     
     # Advanced operations
-    parser.add_argument('--batch', help='Batch update from JSON file')
+    parser.add_argument('--batch', help='Batch update from JSON file (without a file argument: multi-file manifest)')
+    parser.add_argument('--workers', type=int, help='Worker processes for multi-file batches (default: batch.workers, 0 = all cores)')
     parser.add_argument('--preview-changes', action='store_true', help='Preview changes before applying')
     parser.add_argument('--apply', action='store_true', help='Apply changes after preview')
+    parser.add_argument('--if-hash', metavar='HASH', help='Only replace the block if its content hash (from --inspect --json) still matches')
+    
+    # Symbol index
+    parser.add_argument('--index', metavar='DIR', help='Build or refresh the symbol index for a directory tree')
+    parser.add_argument('--where', metavar='NAME', help='Find which files define NAME using the symbol index')
+    parser.add_argument('--index-db', help='Symbol index database (default: index.database)')
+    
+    # Server mode
+    parser.add_argument('--serve', action='store_true', help='Run a persistent JSON-RPC server that keeps parsed files in memory')
+    parser.add_argument('--socket', nargs='?', const='default', help='Listen on a Unix socket instead of stdio (default path from server.socket_path)')
+    
+    # Watch mode
+    parser.add_argument('--watch', nargs='+', metavar='PATH', help='Watch files or directory trees and print block changes as NDJSON')
     
     # Config options
     parser.add_argument('--config', nargs='?', const='show_all', help='Show or set configuration values (e.g., --config general.backup_enabled=false)')
     
-    args = parser.parse_args()
+    # Diagnostics
+    parser.add_argument('--timings', nargs='?', const='-', metavar='FILE', help='Report phase timings, counters and peak memory as JSON on stderr, or append them to FILE (default: timings.log)')
+    parser.add_argument('--profile', nargs='?', const='-', metavar='FILE', help='Run under cProfile and print the stats by cumulative time to stderr, or save them to FILE')
+    
+    with timings.phase('args'):
+        args = parser.parse_args()
+    
+    destination = args.timings or config.get('timings', 'log', fallback='')
+    if not destination:
+        timings.stop()
+    profiler = None
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        run_command(args, parser, config)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            report_profile(profiler, args.profile)
+        recorder = timings.stop()
+        if destination and recorder is not None:
+            recorder.emit(destination)
+
+def run_command(args, parser, config):
+    """Carry out the command line parsed by main()"""
+    from codecrispr_tools import timings
     
     # Handle configuration commands
     if args.config is not None:
@@ -366,12 +1011,7 @@ def main():
                 print(f"[ERROR] Configuration key must be in format: section.option")
                 sys.exit(1)
             section, option = key.split('.', 1)
-            if not config.has_section(section):
-                config.add_section(section)
-            config.set(section, option, value)
-            config_file = os.path.expanduser('~/.codecrispr/config.ini')
-            with open(config_file, 'w') as f:
-                config.write(f)
+            save_config_value(section, option, value)
             print(f"[CONFIG] Set {section}.{option} = {value}")
         else:
             # Show configuration value
@@ -387,49 +1027,173 @@ def main():
                 sys.exit(1)
         return
     
+    # Handle server mode
+    if args.serve:
+        # Requests may run on several threads, which one recorder cannot follow
+        timings.stop()
+        from codecrispr_tools.server import serve
+        socket_path = args.socket
+        if socket_path == 'default':
+            socket_path = config.get('server', 'socket_path', fallback='~/.codecrispr/codecrispr.sock')
+        try:
+            serve(config, socket_path=socket_path)
+        except OSError as e:
+            print(f"[ERROR] Server failed: {e}", file=sys.stderr)
+            sys.exit(1)
+        return
+    
+    # Handle watch mode
+    if args.watch:
+        timings.stop()
+        from codecrispr_tools.watcher import watch
+        missing = [p for p in args.watch if not os.path.exists(p)]
+        if missing:
+            print(f"[ERROR] File not found: {missing[0]}")
+            sys.exit(1)
+        try:
+            watch(args.watch, config)
+        except (OSError, ValueError) as e:
+            print(f"[ERROR] Watch failed: {e}")
+            sys.exit(1)
+        return
+    
+    # Handle symbol index commands
+    if args.index or args.where:
+        from codecrispr_tools.symbol_index import build_index, where
+        db_path = args.index_db or config.get('index', 'database', fallback='~/.codecrispr/index.db')
+        if args.index:
+            if not os.path.isdir(args.index):
+                print(f"[ERROR] Not a directory: {args.index}")
+                sys.exit(1)
+            workers = args.workers if args.workers is not None else config.getint('batch', 'workers', fallback=0)
+            exclude = [d.strip() for d in config.get('index', 'exclude_dirs', fallback='').split(',') if d.strip()]
+            summary = build_index(args.index, db_path, workers or None, exclude)
+            if args.json:
+                print(output_as_json(summary, config))
+            else:
+                print(f"[INDEX] {summary['root']}: {summary['scanned']} files scanned, "
+                      f"{summary['reparsed']} parsed, {summary['removed']} removed, "
+                      f"{summary['blocks']} blocks in {summary['seconds']}s")
+                for error in summary['errors']:
+                    print(f"[WARNING] Could not index {error['file']}: {error['error']}")
+        if args.where:
+            matches = where(db_path, args.where)
+            if args.json:
+                print(output_as_json({'name': args.where, 'matches': matches}, config))
+            elif not matches:
+                print(f"[ERROR] No indexed block matches '{args.where}'.")
+                sys.exit(1)
+            else:
+                for m in matches:
+                    if m['start'] is None:
+                        print(f"{m['file']}: {m['name']} [{m['language']}]")
+                    else:
+                        print(f"{m['file']}:{m['start']}–{m['end']}: {m['name']} [{m['language']}]")
+        return
+    
+    # Handle multi-file batch manifests
+    if args.batch and not args.file:
+        import json
+        from codecrispr_tools.batch_runner import group_updates, run_manifest
+        try:
+            with open(args.batch, 'r') as f:
+                manifest = json.load(f)
+            grouped = group_updates(manifest, os.path.dirname(os.path.abspath(args.batch)))
+        except Exception as e:
+            print(f"[ERROR] Batch update failed: {e}")
+            sys.exit(1)
+        if args.preview_changes and not args.apply:
+            _, errors = show_manifest_preview(grouped, config, args.export)
+            if errors:
+                sys.exit(1)
+            return
+        workers = args.workers if args.workers is not None else config.getint('batch', 'workers', fallback=0)
+        summary = run_manifest(grouped, workers or None)
+        if summary['failures']:
+            sys.exit(1)
+        return
+    
     # Require file argument for non-config operations
     if not args.file:
         parser.error("the following arguments are required: file")
     
-    # Load the editor
+    # Load the editor; listing blocks needs only the (possibly cached) map
+    list_only = (args.inspect or args.find) and not args.preview and not args.batch
     try:
-        editor = load_editor(args.file)
+        editor = load_editor(args.file, config, lazy=list_only)
     except SystemExit:
         return
     
     # Handle batch operations
     if args.batch:
+        import json
         try:
             with open(args.batch, 'r') as f:
                 batch_data = json.load(f)
             
-            updates = [(item['method'], item['code']) for item in batch_data['updates']]
-            successful, failed = batch_replace_methods(editor, updates)
+            updates = [(item['method'], item['code'], item.get('if_hash')) for item in batch_data['updates']]
+            if args.preview_changes and not args.apply:
+                show_batch_preview(editor, updates, args.file, config, args.export)
+                return
+            unchanged, applied = [], []
+            with timings.phase('edit'):
+                successful, failed = batch_replace_methods(editor, updates, unchanged, applied)
             
             if successful:
-                if safe_write_file(args.file, '\n'.join(editor.lines) + '\n', config):
+                if write_editor(editor, args.file, config, applied):
                     print(f"[SUCCESS] Updated {len(successful)} methods: {', '.join(successful)}")
+            if unchanged:
+                print(f"[UNCHANGED] {len(unchanged)} methods already had this content: {', '.join(unchanged)}")
             
             if failed:
                 print(f"[WARNING] Failed to update {len(failed)} methods:")
                 for method, error in failed:
                     print(f"  - {method}: {error}")
+        except ConflictError as e:
+            print(f"[CONFLICT] {e}")
+            sys.exit(1)
         except Exception as e:
             print(f"[ERROR] Batch update failed: {e}")
         return
     
+    # Handle name lookup
+    if args.find is not None and not args.inspect and not args.batch:
+        spans = editor.reference_map
+        matches = []
+        for name in find_blocks(spans, args.find):
+            pos = spans[name]
+            start, end = (pos['start'], pos['end']) if isinstance(pos, dict) else (None, None)
+            matches.append({'name': name, 'start': start, 'end': end})
+        if args.json:
+            print(output_as_json({'file': args.file, 'pattern': args.find, 'matches': matches}, config))
+        elif not matches:
+            print(f"[ERROR] No block matches '{args.find}'.")
+            sys.exit(1)
+        else:
+            unit = getattr(editor, 'span_unit', 'lines')
+            for m in matches:
+                if m['start'] is None:
+                    print(f"  {m['name']}")
+                else:
+                    print(f"  {m['name']}: {unit} {m['start']}–{m['end']}")
+        return
+    
     # Handle inspection
     if args.inspect:
         if args.preview:
             if args.preview not in editor.reference_map:
-                print(f"[ERROR] Block '{args.preview}' not found.")
+                print(f"[ERROR] {missing_block_message(editor.reference_map, args.preview)}")
                 return
             
             block = editor.reference_map[args.preview]
-            lines = editor.lines[block['start']:block['end'] + 1]
+            lines = block_lines(editor, args.preview)
             
             if args.with_lines:
-                lines = [f'{i+block["start"]+1}: {line}' for i, line in enumerate(lines)]
+                if hasattr(editor, 'lines'):
+                    first = block['start'] + 1
+                else:
+                    first = editor.reference_map.line(args.preview)
+                lines = [f'{i+first}: {line}' for i, line in enumerate(lines)]
             
             if args.as_comment:
                 ext = os.path.splitext(args.file)[1]
@@ -443,12 +1207,15 @@ def main():
                     f.write(preview_text)
                 print(f"[SUCCESS] Preview exported to {args.export}")
             elif not args.preview_only:
-                print(f"[PREVIEW] Block '{args.preview}' ({block['start']}–{block['end']})")
+                unit = getattr(editor, 'span_unit', 'lines')
+                span = f"{block['start']}–{block['end']}" if unit == 'lines' else f"{unit} {block['start']}–{block['end']}"
+                print(f"[PREVIEW] Block '{args.preview}' ({span})")
                 print(preview_text)
             else:
                 print(preview_text)
         else:
-            # Full file inspection
+            # Full file inspection; spans are lines unless the tool says otherwise
+            unit = getattr(editor, 'span_unit', 'lines')
             if args.json:
                 result = {
                     'file': args.file,
@@ -456,32 +1223,48 @@ def main():
                     'blocks': {}
                 }
                 
-                for name, pos in editor.reference_map.items():
-                    result['blocks'][name] = {
-                        'start': pos['start'],
-                        'end': pos['end'],
-                        'lines': pos['end'] - pos['start'] + 1
+                hashes = block_hashes(editor)
+                blocks = result['blocks']
+                for name, start, end in block_spans(editor.reference_map):
+                    blocks[name] = {
+                        'start': start,
+                        'end': end,
+                        unit: end - start + 1,
+                        'hash': hashes.get(name)
                     }
                 
                 print(output_as_json(result, config))
             else:
                 print(f"Inspecting '{args.file}' [{detect_language(args.file)}]:")
-                for name, pos in editor.reference_map.items():
-                    print(f"  {name}: lines {pos['start']}–{pos['end']}")
+                for name, start, end in block_spans(editor.reference_map):
+                    print(f"  {name}: {unit} {start}–{end}")
     
     # Handle code replacement
     elif args.method and args.code:
         code = args.code.strip('`')
         
         if args.preview_changes and not args.apply:
-            show_changes_preview(editor, args.method, code)
+            show_changes_preview(editor, args.method, code, config)
         else:
+            if args.if_hash:
+                try:
+                    check_block_hash(editor, args.method, args.if_hash)
+                except ConflictError as e:
+                    print(f"[CONFLICT] {e}")
+                    sys.exit(1)
             try:
-                editor.replace_method(args.method, code)
-                if safe_write_file(args.file, '\n'.join(editor.lines) + '\n', config):
+                base = block_hash(editor, args.method) if args.method in editor.reference_map else None
+                with timings.phase('edit'):
+                    changed = editor.replace_method(args.method, code)
+                if changed is False:
+                    print(f"[UNCHANGED] Block '{args.method}' already has this content; file not written.")
+                elif write_editor(editor, args.file, config, [(args.method, code, base)]):
                     print(f"[UPDATED] Block '{args.method}' replaced successfully.")
                 else:
                     print(f"[ERROR] Failed to save changes to file.")
+            except ConflictError as e:
+                print(f"[CONFLICT] {e}")
+                sys.exit(1)
             except Exception as e:
                 print(f"[ERROR] Failed to replace method: {e}")
     
@@ -490,4 +1273,6 @@ def main():
         parser.print_help()
 
 if __name__ == "__main__":
+    # Let helper modules in tools/ import this script as `codecrispr`
+    sys.modules.setdefault('codecrispr', sys.modules[__name__])
     main()
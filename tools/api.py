@@ -0,0 +1,254 @@
+"""
+Library API for CodeCRISPR
+
+Importable as `from codecrispr import api`. Nothing here prints or exits:
+unreadable files raise OSError, parser failures LoadError, unknown blocks
+BlockNotFoundError and stale or concurrently changed blocks ConflictError
+(all but OSError are CodeCRISPRError subclasses).
+
+The coroutines run parsing and I/O on a bounded thread pool, so an asyncio
+program can issue many requests at once:
+
+    from codecrispr import api
+
+    listing = await api.inspect('app.py')
+    await api.replace('app.py', 'main', new_code, if_hash=listing['blocks']['main']['hash'])
+
+    async with api.Session(workers=8) as session:
+        results = await asyncio.gather(*(session.inspect(path) for path in paths))
+
+Results have the same shape as the JSON-RPC server's. The synchronous
+building blocks are codecrispr.open_editor() and codecrispr.save_editor().
+"""
+import asyncio
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+import codecrispr
+from codecrispr import CodeCRISPRError, ConflictError, LoadError, open_editor, save_editor  # noqa: F401
+
+
+class BlockNotFoundError(CodeCRISPRError, KeyError):
+    """The named block is not in the file"""
+
+    def __str__(self):
+        return str(self.args[0]) if self.args else ''
+
+
+def _stamp(path):
+    st = os.stat(path)
+    return (st.st_ino, st.st_size, st.st_mtime_ns, st.st_ctime_ns)
+
+
+def _block(editor, name):
+    if name not in editor.reference_map:
+        raise BlockNotFoundError(codecrispr.missing_block_message(editor.reference_map, name))
+    return editor.reference_map[name]
+
+
+class Session:
+    """Serves requests for an asyncio program from a pool of worker threads
+
+    Parsed editors are kept for up to max_editors files, least recently used
+    first out, and re-read when a file changes on disk. Requests for one file
+    run one at a time in arrival order, so any number of concurrent requests
+    for a file share a single parse; requests for different files run in
+    parallel on up to `workers` threads. Threads rather than processes keep
+    parsed editors shared between requests.
+    """
+
+    def __init__(self, config=None, workers=None, max_editors=None):
+        self.config = config if config is not None else codecrispr.load_config()
+        if workers is None:
+            workers = self.config.getint('api', 'workers', fallback=0)
+        if max_editors is None:
+            max_editors = self.config.getint('api', 'max_editors', fallback=32)
+        self.max_editors = max_editors
+        self.executor = ThreadPoolExecutor(max_workers=workers or None, thread_name_prefix='codecrispr')
+        self.editors = OrderedDict()
+        # Guards self.editors, which worker threads update
+        self._editors_lock = threading.Lock()
+        # path -> [asyncio.Lock, requests holding or awaiting it]
+        self._files = {}
+        self.requests = 0
+        self.parses = 0
+        self.hits = 0
+
+    # Worker-thread side
+
+    def _editor(self, path):
+        stamp = _stamp(path)
+        with self._editors_lock:
+            entry = self.editors.get(path)
+            if entry is not None and entry[0] == stamp:
+                self.editors.move_to_end(path)
+                self.hits += 1
+                return entry[1]
+        editor = open_editor(path, self.config)
+        with self._editors_lock:
+            self.parses += 1
+            self.editors[path] = (stamp, editor)
+            self.editors.move_to_end(path)
+            while len(self.editors) > self.max_editors:
+                self.editors.popitem(last=False)
+        return editor
+
+    def _forget(self, path):
+        with self._editors_lock:
+            self.editors.pop(path, None)
+
+    def _save(self, path, editor, edits):
+        try:
+            save_editor(editor, path, self.config, edits)
+        except BaseException:
+            # The editor holds edits the file does not
+            self._forget(path)
+            raise
+        with self._editors_lock:
+            if path in self.editors:
+                self.editors[path] = (_stamp(path), editor)
+
+    def _inspect(self, path):
+        editor = self._editor(path)
+        unit = getattr(editor, 'span_unit', 'lines')
+        blocks = {}
+        hashes = codecrispr.block_hashes(editor)
+        for name, start, end in codecrispr.block_spans(editor.reference_map):
+            if start is not None:
+                blocks[name] = {'start': start, 'end': end, unit: end - start + 1, 'hash': hashes.get(name)}
+            else:
+                blocks[name] = {}
+        return {'file': path, 'language': codecrispr.detect_language(path), 'blocks': blocks}
+
+    def _preview(self, path, name):
+        editor = self._editor(path)
+        block = _block(editor, name)
+        if hasattr(editor, 'lines'):
+            code = '\n'.join(editor.lines[block['start']:block['end'] + 1])
+        elif hasattr(editor.reference_map, 'read'):
+            code = editor.reference_map.read(name).decode('utf-8', 'surrogateescape')
+        else:
+            raise CodeCRISPRError(f"Preview is not available for {type(editor).__module__}")
+        return {'name': name, 'start': block['start'], 'end': block['end'], 'code': code}
+
+    def _replace(self, path, name, code, if_hash):
+        editor = self._editor(path)
+        _block(editor, name)
+        if if_hash is not None:
+            codecrispr.check_block_hash(editor, name, if_hash)
+        base = codecrispr.block_hash(editor, name)
+        try:
+            changed = editor.replace_method(name, code)
+        except BaseException:
+            self._forget(path)
+            raise
+        if changed is False:
+            return {'unchanged': name}
+        self._save(path, editor, [(name, code, base)])
+        return {'updated': name}
+
+    def _batch(self, path, updates):
+        editor = self._editor(path)
+        triples = [(item['method'], item['code'], item.get('if_hash')) for item in updates]
+        skipped = [method for method, _, _ in triples if method not in editor.reference_map]
+        unchanged, applied = [], []
+        try:
+            successful, failed = codecrispr.batch_replace_methods(
+                editor, [t for t in triples if t[0] in editor.reference_map], unchanged, applied)
+        except BaseException:
+            self._forget(path)
+            raise
+        if successful:
+            self._save(path, editor, applied)
+        return {'updated': successful, 'unchanged': unchanged,
+                'failed': [{'method': m, 'error': e} for m, e in failed], 'skipped': skipped}
+
+    # Event-loop side
+
+    @asynccontextmanager
+    async def _exclusive(self, path):
+        entry = self._files.get(path)
+        if entry is None:
+            entry = self._files[path] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._files[path]
+
+    async def _run(self, func, path, *args):
+        path = os.path.abspath(path)
+        self.requests += 1
+        async with self._exclusive(path):
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, path, *args)
+
+    async def inspect(self, path):
+        """{'file', 'language', 'blocks': {name: {start, end, lines or bytes, hash}}}"""
+        return await self._run(self._inspect, path)
+
+    async def preview(self, path, name):
+        """{'name', 'start', 'end', 'code'} for one block"""
+        return await self._run(self._preview, path, name)
+
+    async def replace(self, path, name, code, if_hash=None):
+        """Replace a block and save the file: {'updated': name} or {'unchanged': name}"""
+        return await self._run(self._replace, path, name, code, if_hash)
+
+    async def batch(self, path, updates):
+        """Apply [{'method', 'code', 'if_hash'?}, ...] to one file and save it once"""
+        return await self._run(self._batch, path, updates)
+
+    def invalidate(self, path=None):
+        """Drop the parsed editor of path, or of every file"""
+        with self._editors_lock:
+            if path is None:
+                self.editors.clear()
+            else:
+                self.editors.pop(os.path.abspath(path), None)
+
+    def stats(self):
+        return {'requests': self.requests, 'parses': self.parses, 'hits': self.hits,
+                'cached': len(self.editors)}
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.invalidate()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+
+_default = None
+
+
+def default_session():
+    """The Session behind the module-level coroutines, created on first use"""
+    global _default
+    if _default is None:
+        _default = Session()
+    return _default
+
+
+async def inspect(path):
+    return await default_session().inspect(path)
+
+
+async def preview(path, name):
+    return await default_session().preview(path, name)
+
+
+async def replace(path, name, code, if_hash=None):
+    return await default_session().replace(path, name, code, if_hash)
+
+
+async def batch(path, updates):
+    return await default_session().batch(path, updates)
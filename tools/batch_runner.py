@@ -0,0 +1,110 @@
+"""
+Multi-file batch execution for CodeCRISPR
+
+A batch manifest lists updates that each name their own file:
+
+    {"updates": [{"file": "a.py", "method": "foo", "code": "...", "if_hash": "..."}, ...]}
+
+`if_hash` is optional; an update carrying one fails if the block's content
+hash no longer matches.
+
+Updates are grouped per file and every file is parsed, edited and written
+in a worker process. One NDJSON result line is streamed per file as it
+finishes, followed by a summary line with aggregate throughput.
+"""
+import io
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+from contextlib import redirect_stdout
+
+import codecrispr
+
+
+def group_updates(manifest, base_dir):
+    """Group manifest entries into an ordered {path: [(method, code, if_hash), ...]} mapping"""
+    grouped = OrderedDict()
+    for i, item in enumerate(manifest.get('updates', [])):
+        if 'file' not in item:
+            raise ValueError(f"Update #{i} does not name a file")
+        path = item['file']
+        if not os.path.isabs(path):
+            path = os.path.join(base_dir, path)
+        grouped.setdefault(os.path.normpath(path), []).append((item['method'], item['code'], item.get('if_hash')))
+    return grouped
+
+
+def apply_file_updates(path, updates):
+    """Parse one file, apply its updates and write it back; runs in a worker"""
+    started = time.perf_counter()
+    result = {'file': path, 'updated': [], 'unchanged': [], 'failed': [], 'skipped': [], 'written': False}
+    buf = io.StringIO()
+    try:
+        with redirect_stdout(buf):
+            editor = codecrispr.load_editor(path)
+            result['skipped'] = [update[0] for update in updates if update[0] not in editor.reference_map]
+            applied = []
+            successful, failed = codecrispr.batch_replace_methods(editor, updates, result['unchanged'], applied)
+            result['updated'] = successful
+            result['failed'] = [{'method': m, 'error': e} for m, e in failed]
+            if successful:
+                result['written'] = codecrispr.write_editor(editor, path, edits=applied)
+    except SystemExit:
+        pass
+    except Exception as e:
+        print(f"[ERROR] {e}", file=buf)
+
+    errors = [l[len('[ERROR] '):] for l in buf.getvalue().splitlines() if l.startswith('[ERROR]')]
+    if errors:
+        result['error'] = errors[-1]
+    result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 3)
+    return result
+
+
+def run_manifest(grouped, workers=None, out=None):
+    """Apply grouped updates on a process pool, streaming NDJSON to out
+
+    Returns the summary dictionary that is also written as the last line.
+    """
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    out = out or sys.stdout
+    workers = workers or os.cpu_count() or 1
+    workers = max(1, min(workers, len(grouped) or 1))
+    started = time.perf_counter()
+    files = blocks = failures = 0
+
+    def emit(result):
+        nonlocal files, blocks, failures
+        files += 1
+        blocks += len(result['updated'])
+        failures += len(result['failed']) + len(result['skipped']) + ('error' in result)
+        out.write(json.dumps(result) + '\n')
+        out.flush()
+
+    if workers == 1:
+        # Not worth the pool start-up cost
+        for path, updates in grouped.items():
+            emit(apply_file_updates(path, updates))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=codecrispr.register_tools) as pool:
+            futures = [pool.submit(apply_file_updates, path, updates)
+                       for path, updates in grouped.items()]
+            for future in as_completed(futures):
+                emit(future.result())
+
+    seconds = time.perf_counter() - started
+    summary = {
+        'files': files,
+        'blocks': blocks,
+        'failures': failures,
+        'workers': workers,
+        'seconds': round(seconds, 4),
+        'files_per_sec': round(files / seconds, 1) if seconds else 0.0,
+        'blocks_per_sec': round(blocks / seconds, 1) if seconds else 0.0
+    }
+    out.write(json.dumps({'summary': summary}) + '\n')
+    out.flush()
+    return summary
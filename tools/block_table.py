@@ -0,0 +1,309 @@
+"""
+Ordered block table for line-based reference maps
+
+Blocks are kept sorted by start line. Moving every block after an edit is a
+single point update in a Fenwick tree of line deltas, so it costs O(log m)
+for m blocks instead of rewriting each entry; absolute positions are
+resolved when a block is read. The table is a read-only Mapping of
+name -> {'start': .., 'end': ..}, so existing callers keep working.
+
+Positions are held in array('i') columns and names in one list, so a block
+costs a few bytes of positions plus its name and index entry, rather than a
+dictionary of its own; spans() reads blocks without building any.
+
+Tools that nest blocks inside classes, impls or sections give them qualified
+names (`Parser.parse`, `Lexer::next`, `Install > Linux`) joined by the tool's
+qualifier. A block can also be looked up by any shorter tail of its name
+(`parse`) as long as no other block shares it; find() answers prefix and
+glob queries from a NameTrie of both forms.
+"""
+import sys
+from array import array
+from collections.abc import Mapping
+from fnmatch import fnmatchcase
+from itertools import accumulate
+from operator import add
+
+from .name_trie import WILDCARDS, NameTrie
+
+# Alias shared by several blocks
+_AMBIGUOUS = -1
+
+
+class AmbiguousNameError(KeyError):
+    """A short name that several qualified block names end with"""
+
+    def __init__(self, name, candidates):
+        super().__init__(name)
+        self.name = name
+        self.candidates = candidates
+
+    def __str__(self):
+        return f"'{self.name}' is ambiguous: {', '.join(self.candidates)}"
+
+
+class BlockTable(Mapping):
+    """Reference map of (start, end, name) blocks ordered by start line
+
+    With keys_by_line=True, names have the form `<kind>_<start line>` and are
+    derived from the current start, so moved blocks are renamed for free.
+    With a qualifier, names are scoped (`Outer.Inner.method` for '.') and
+    each tail after a qualifier is an alias for the block.
+    """
+
+    def __init__(self, blocks=(), keys_by_line=False, qualifier=None):
+        self.keys_by_line = keys_by_line
+        self.qualifier = None if keys_by_line else qualifier
+        self._build(sorted(blocks))
+
+    @classmethod
+    def from_map(cls, reference_map, keys_by_line=False, qualifier=None):
+        """Build a table from a plain {name: {'start': .., 'end': ..}} dictionary"""
+        return cls(((pos['start'], pos['end'], name) for name, pos in reference_map.items()),
+                   keys_by_line, qualifier)
+
+    def _build(self, blocks):
+        self._starts = array('i', [s for s, _, _ in blocks])
+        self._ends = array('i', [e for _, e, _ in blocks])
+        self._names = [self._kind(n) for _, _, n in blocks]
+        self._reset_offsets()
+        max_ends = accumulate(self._ends, max)
+        self.nested = any(s <= e for s, e in zip(self._starts[1:], max_ends))
+
+    def _kind(self, name):
+        # Kinds repeat across many blocks; interning stores each once
+        return sys.intern(name.rsplit('_', 1)[0]) if self.keys_by_line else name
+
+    def _reset_offsets(self):
+        """Clear all pending shifts; positions must already be absolute"""
+        # Point deltas and their Fenwick tree; block i is moved by sum(deltas[:i+1])
+        self._deltas = array('i', [0]) * len(self._starts)
+        self._tree = array('i', [0]) * (len(self._starts) + 1)
+        # name -> position, built on the first lookup by name
+        self._index = None
+        # short name -> position (or _AMBIGUOUS), and the NameTrie behind
+        # find(); both are built on first use and dropped when names change
+        self._aliases = None
+        self._trie = None
+
+    # Fenwick tree over the point deltas
+
+    def _add(self, i, delta):
+        self._deltas[i] += delta
+        i += 1
+        tree = self._tree
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+    def _offset(self, i):
+        total = 0
+        i += 1
+        tree = self._tree
+        while i:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    # Positional access
+
+    def __len__(self):
+        return len(self._starts)
+
+    def span(self, i):
+        """Absolute (start, end) of block i"""
+        offset = self._offset(i)
+        return self._starts[i] + offset, self._ends[i] + offset
+
+    def name_at(self, i, start=None):
+        if self.keys_by_line:
+            if start is None:
+                start = self.span(i)[0]
+            return f"{self._names[i]}_{start}"
+        return self._names[i]
+
+    def block(self, i):
+        start, end = self.span(i)
+        return start, end, self.name_at(i, start)
+
+    def blocks(self, lo=0, hi=None):
+        """Yield (start, end, name) for blocks lo..hi-1 in order"""
+        hi = len(self) if hi is None else hi
+        offset = self._offset(lo - 1) if lo else 0
+        for i in range(lo, hi):
+            offset += self._deltas[i]
+            start = self._starts[i] + offset
+            yield start, self._ends[i] + offset, self.name_at(i, start)
+
+    def bisect_left(self, line, lo=0, hi=None):
+        """First index in lo..hi whose start is >= line"""
+        hi = len(self) if hi is None else hi
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._starts[mid] + self._offset(mid) < line:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def bisect_right(self, line, lo=0, hi=None):
+        """First index in lo..hi whose start is > line"""
+        hi = len(self) if hi is None else hi
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._starts[mid] + self._offset(mid) <= line:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def index(self, name, aliases=True):
+        """Position of the block called name; raises KeyError if there is none
+
+        A name that is not a block's full name may be the tail of exactly one
+        qualified name; AmbiguousNameError (a KeyError) lists them when there
+        are several. aliases=False accepts full names only.
+        """
+        if not self.keys_by_line:
+            if self._index is None:
+                self._index = dict(zip(self._names, range(len(self._names))))
+            i = self._index.get(name)
+            if i is not None:
+                return i
+            if aliases and self.qualifier:
+                i = self._alias_index().get(name)
+                if i == _AMBIGUOUS:
+                    tail = self.qualifier + name
+                    raise AmbiguousNameError(name, [n for n in self._names if n.endswith(tail)])
+                if i is not None:
+                    return i
+            raise KeyError(name)
+        kind, _, line = name.rpartition('_')
+        try:
+            line = int(line)
+        except ValueError:
+            raise KeyError(name) from None
+        i = self.bisect_left(line)
+        while i < len(self) and self._starts[i] + self._offset(i) == line:
+            if self._names[i] == kind:
+                return i
+            i += 1
+        raise KeyError(name)
+
+    # Qualified names
+
+    def short_names(self, name):
+        """Tails of a qualified name, longest first: `A.B.f` -> `B.f`, `f`"""
+        q = self.qualifier
+        pos = name.find(q) if q else -1
+        while pos >= 0:
+            yield name[pos + len(q):]
+            pos = name.find(q, pos + len(q))
+
+    def _alias_index(self):
+        if self._aliases is None:
+            aliases = {}
+            for i, name in enumerate(self._names):
+                for alias in self.short_names(name):
+                    aliases[alias] = _AMBIGUOUS if alias in aliases else i
+            self._aliases = aliases
+        return self._aliases
+
+    def find(self, pattern):
+        """Names of the blocks matching a prefix or glob pattern, in file order
+
+        Both full names and their tails are matched, so `pars*` finds
+        `Parser.parse` as well as `parse_args`. A pattern without wildcards
+        is a prefix.
+        """
+        if self.keys_by_line:
+            # Names change as blocks move, so they are matched as they are
+            if not any(c in WILDCARDS for c in pattern):
+                pattern += '*'
+            return [name for name in self if fnmatchcase(name, pattern)]
+        if self._trie is None:
+            trie = NameTrie()
+            for i, name in enumerate(self._names):
+                trie.add(name, i)
+                for alias in self.short_names(name):
+                    trie.add(alias, i)
+            self._trie = trie
+        if any(c in WILDCARDS for c in pattern):
+            found = self._trie.glob(pattern)
+        else:
+            found = self._trie.prefix(pattern)
+        return [self.name_at(i) for i in sorted(found)]
+
+    # Edits
+
+    def shift_from(self, i, delta):
+        """Move blocks i.. by delta lines"""
+        if delta and i < len(self):
+            self._add(i, delta)
+
+    def replace(self, lo, hi, blocks):
+        """Replace blocks lo..hi-1 with absolute (start, end, name) blocks, in order"""
+        if len(blocks) == hi - lo:
+            for i, (start, end, name) in enumerate(blocks, lo):
+                offset = self._offset(i)
+                self._starts[i] = start - offset
+                self._ends[i] = end - offset
+                name = self._kind(name)
+                if name == self._names[i]:
+                    continue
+                if self._index is not None and self._index.get(self._names[i]) == i:
+                    del self._index[self._names[i]]
+                self._names[i] = name
+                self._aliases = self._trie = None
+            if self._index is not None:
+                for i in range(lo, hi):
+                    self._index[self._names[i]] = i
+        else:
+            # The block count changed, so later indices move: make every
+            # position absolute and splice the columns
+            offsets = list(accumulate(self._deltas))
+            self._starts = array('i', map(add, self._starts, offsets))
+            self._ends = array('i', map(add, self._ends, offsets))
+            self._starts[lo:hi] = array('i', [s for s, _, _ in blocks])
+            self._ends[lo:hi] = array('i', [e for _, e, _ in blocks])
+            self._names[lo:hi] = [self._kind(n) for _, _, n in blocks]
+            self._reset_offsets()
+            hi = lo + len(blocks)
+
+        if not self.nested and hi > lo:
+            prev_end = self.span(lo - 1)[1] if lo else -1
+            for i in range(lo, hi):
+                start, end = self.span(i)
+                if start <= prev_end:
+                    self.nested = True
+                prev_end = max(prev_end, end)
+            if hi < len(self) and self.span(hi)[0] <= prev_end:
+                self.nested = True
+
+    # Mapping interface
+
+    def __getitem__(self, name):
+        start, end = self.span(self.index(name))
+        return {'start': start, 'end': end}
+
+    def __contains__(self, name):
+        try:
+            self.index(name)
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self):
+        for _, _, name in self.blocks():
+            yield name
+
+    def items(self):
+        return [(name, {'start': start, 'end': end}) for start, end, name in self.blocks()]
+
+    def spans(self):
+        """Yield (name, start, end) for every block in order"""
+        for start, end, name in self.blocks():
+            yield name, start, end
+
+    def __repr__(self):
+        return f"BlockTable({len(self)} blocks)"
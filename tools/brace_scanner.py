@@ -0,0 +1,168 @@
+"""
+Single-pass block scanner for brace-delimited languages
+
+Walks a file once, skipping strings, character literals, template literals
+and comments, and pairs every `{` with its `}` on a stack. Tools match their
+signature regexes line by line as before and look up where the block that
+opens on a header line ends, instead of counting braces forward from every
+header (which re-scanned nested blocks and re-stripped strings per line).
+"""
+import re
+from collections import namedtuple
+
+# ends[i]: line holding the `}` that closes the first code `{` on line i,
+# len(lines) if it is never closed, or -1 when line i opens no block. in_code[i]: line i starts outside any
+# comment or multi-line string, so a signature match on it is real code.
+# unmatched: `}` with no `{` before them; unclosed: `{` (and template
+# holes) left open; mode: inside a comment or string at the end when not 0.
+BraceScan = namedtuple('BraceScan', ['ends', 'in_code', 'unmatched', 'unclosed', 'mode'])
+
+_CODE, _BLOCK_COMMENT, _MULTILINE, _TEMPLATE = range(4)
+
+
+class BraceScanner:
+    """Brace matcher configured with one language's lexical rules
+
+    quotes            single-line string delimiters
+    multiline_quotes  delimiters of strings that may span lines, without escapes
+                      unless listed in escaped_multiline (Go raw strings, R strings)
+    template_quote    JavaScript-style template literal with `${ ... }` holes
+    char_quote        quote that only opens a character literal when one
+                      closes it right away (Rust `'a'` vs lifetime `'a`)
+    """
+
+    def __init__(self, line_comments=('//',), block_comment=('/*', '*/'), quotes=('"', "'"),
+                 multiline_quotes=(), escaped_multiline=(), template_quote=None, char_quote=None):
+        self.line_comments = tuple(line_comments)
+        self.block_comment = block_comment
+        self.multiline_quotes = tuple(multiline_quotes)
+        self.escaped_multiline = tuple(escaped_multiline)
+        self.template_quote = template_quote
+        self.char_quote = char_quote
+
+        tokens = ['{', '}'] + list(self.line_comments)
+        if block_comment:
+            tokens.append(block_comment[0])
+        tokens += list(quotes) + list(self.multiline_quotes)
+        if template_quote:
+            tokens.append(template_quote)
+        if char_quote:
+            tokens.append(char_quote)
+        # Longest first so `/*` wins over `/` style prefixes
+        tokens = sorted(set(tokens), key=len, reverse=True)
+        self._token = re.compile('|'.join(re.escape(t) for t in tokens))
+        self._string = {q: re.compile(re.escape(q) + r'(?:[^' + re.escape(q) + r'\\]|\\.)*' + re.escape(q))
+                        for q in quotes}
+        if char_quote:
+            q = re.escape(char_quote)
+            self._char = re.compile(q + r'(?:\\u\{[0-9a-fA-F]+\}|\\.|[^' + q + r'\\])' + q)
+        if template_quote:
+            q = re.escape(template_quote)
+            self._template_token = re.compile(r'\\.|\$\{|' + q)
+        self._closers = {q: re.compile(r'\\.|' + re.escape(q) if q in self.escaped_multiline else re.escape(q))
+                         for q in self.multiline_quotes}
+
+    def scan(self, lines):
+        """Return a BraceScan for lines in one linear pass"""
+        n = len(lines)
+        ends = [-1] * n
+        in_code = [True] * n
+        # Open braces: line of a block-opening `{`, -1 for other `{`,
+        # None for a template `${` whose `}` resumes the template string
+        stack = []
+        unmatched = 0
+        mode = _CODE
+        quote = None
+        token = self._token
+        block_end = self.block_comment[1] if self.block_comment else None
+
+        for i, line in enumerate(lines):
+            if mode != _CODE:
+                in_code[i] = False
+            pos = 0
+            opened = False
+            length = len(line)
+            while pos < length:
+                if mode == _BLOCK_COMMENT:
+                    close = line.find(block_end, pos)
+                    if close < 0:
+                        break
+                    pos = close + len(block_end)
+                    mode = _CODE
+                    continue
+                if mode == _MULTILINE:
+                    m = self._closers[quote].search(line, pos)
+                    while m and m.group() != quote:
+                        m = self._closers[quote].search(line, m.end())
+                    if not m:
+                        break
+                    pos = m.end()
+                    mode = _CODE
+                    continue
+                if mode == _TEMPLATE:
+                    m = self._template_token.search(line, pos)
+                    while m and m.group()[0] == '\\':
+                        m = self._template_token.search(line, m.end())
+                    if not m:
+                        break
+                    pos = m.end()
+                    if m.group() == '${':
+                        stack.append(None)
+                    mode = _CODE
+                    continue
+
+                m = token.search(line, pos)
+                if not m:
+                    break
+                tok = m.group()
+                pos = m.end()
+                if tok == '{':
+                    stack.append(-1 if opened else i)
+                    opened = True
+                elif tok == '}':
+                    if stack:
+                        top = stack.pop()
+                        if top is None:
+                            mode = _TEMPLATE
+                        elif top >= 0:
+                            ends[top] = i
+                    else:
+                        unmatched += 1
+                elif tok in self.line_comments:
+                    break
+                elif block_end and tok == self.block_comment[0]:
+                    mode = _BLOCK_COMMENT
+                elif tok == self.template_quote:
+                    mode = _TEMPLATE
+                elif tok in self.multiline_quotes:
+                    mode, quote = _MULTILINE, tok
+                elif tok == self.char_quote:
+                    c = self._char.match(line, m.start())
+                    if c:
+                        pos = c.end()
+                else:
+                    s = self._string[tok].match(line, m.start())
+                    # An unterminated string runs to the end of its line
+                    pos = s.end() if s else length
+
+        # Blocks left open run past the last line, as brace counting always did
+        for top in stack:
+            if top is not None and top >= 0:
+                ends[top] = n
+        return BraceScan(ends, in_code, unmatched, len(stack), mode)
+
+
+def nesting(scan):
+    """How scanned lines affect the blocks around them
+
+    Two versions of a stretch of code with the same nesting close the same
+    enclosing blocks and leave the same ones open, so the code after them
+    pairs its braces exactly as before.
+    """
+    return scan.unmatched, scan.unclosed, scan.mode
+
+
+def block_end(scan, i):
+    """End line of a block whose header is line i; a header without `{` is one line"""
+    end = scan.ends[i]
+    return end if end >= 0 else i
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Build a single-file, precompiled zipapp of CodeCRISPR
+
+    python3 tools/build_zipapp.py [-o zip/codecrispr.pyz] [--source]
+
+The archive contains codecrispr.py and the tools/ modules as bytecode for the
+running interpreter, so nothing is compiled on a cold start. Use --source to
+ship plain .py files instead when the archive must run on other Python versions.
+"""
+import argparse
+import importlib.util
+import marshal
+import os
+import stat
+import sys
+import zipfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MAIN = """import codecrispr
+codecrispr.main()
+"""
+
+
+def _pyc_bytes(source, filename):
+    code = compile(source, filename, 'exec', dont_inherit=True, optimize=0)
+    # Timestamp-based header; sourceless entries in a zip are never revalidated
+    header = importlib.util.MAGIC_NUMBER + (0).to_bytes(4, 'little') * 3
+    return header + marshal.dumps(code)
+
+
+def _sources():
+    yield 'codecrispr.py', os.path.join(ROOT, 'codecrispr.py')
+    tools_dir = os.path.join(ROOT, 'tools')
+    for name in sorted(os.listdir(tools_dir)):
+        if name.endswith('.py') and name != 'build_zipapp.py':
+            yield f'tools/{name}', os.path.join(tools_dir, name)
+
+
+def build(output, compiled=True):
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'wb') as f:
+        f.write(b'#!/usr/bin/env python3\n')
+        with zipfile.ZipFile(f, 'w', compression=zipfile.ZIP_STORED) as zf:
+            zf.writestr('__main__.py', MAIN)
+            # Explicit directory entry so tools/ imports as a namespace package
+            zf.writestr('tools/', b'')
+            for arcname, path in _sources():
+                with open(path, 'rb') as src:
+                    source = src.read()
+                if compiled:
+                    zf.writestr(arcname + 'c', _pyc_bytes(source, arcname))
+                else:
+                    zf.writestr(arcname, source)
+    mode = os.stat(output).st_mode
+    os.chmod(output, mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return output
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a CodeCRISPR zipapp")
+    parser.add_argument('-o', '--output', default=os.path.join(ROOT, 'zip', 'codecrispr.pyz'),
+                        help='Output archive (default: zip/codecrispr.pyz)')
+    parser.add_argument('--source', action='store_true',
+                        help='Store .py sources instead of precompiled bytecode')
+    args = parser.parse_args()
+
+    output = build(args.output, compiled=not args.source)
+    kind = 'source' if args.source else f'bytecode for Python {sys.version_info[0]}.{sys.version_info[1]}'
+    print(f"[SUCCESS] Built {output} ({kind})")
+
+
+if __name__ == '__main__':
+    main()
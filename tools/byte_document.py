@@ -0,0 +1,259 @@
+"""
+Byte-span documents for structured-data tools
+
+Keeps the original file memory-mapped and records, for every addressable
+path, the byte span of its value. Replacing a value queues a splice of just
+those bytes on top of the original file; save() copies untouched ranges
+straight from the mapping, so they come out byte-identical, and the document
+itself is never loaded into Python objects.
+"""
+import mmap
+import os
+from bisect import bisect_left, bisect_right
+from collections.abc import Mapping
+
+from . import timings
+
+
+class _Edit:
+    """Replacement data for original bytes start..end-1 and the paths inside it"""
+
+    __slots__ = ('start', 'end', 'data', 'root', 'spans')
+
+    def __init__(self, start, end, data, root, spans):
+        self.start = start
+        self.end = end
+        self.data = data
+        self.root = root
+        # name -> (start, end) relative to data, in document order
+        self.spans = spans
+
+
+class ByteDocument(Mapping):
+    """Mapping of path -> {'start': .., 'end': ..} byte offsets (end inclusive)
+
+    `scan(buf, start, end, name, depth, limit)` indexes the single value in
+    buf[start:end] called name (None for the document root) at depth and
+    returns parallel (names, starts, ends) in document order, with exclusive
+    ends and no paths deeper than limit (0: no limit). Paths deeper than
+    `depth` are left out of the index and resolved when first looked up.
+    """
+
+    # write_to() takes a binary file
+    binary = True
+
+    def __init__(self, filepath, scan, depth=0, sep='::'):
+        self.filepath = filepath
+        self.depth = depth
+        self.sep = sep
+        self._scan = scan
+        with open(filepath, 'rb') as f:
+            if os.fstat(f.fileno()).st_size:
+                self._buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self._buf = b''
+        with timings.phase('parse'):
+            self._names, self._starts, self._ends = scan(self._buf, 0, len(self._buf), None, 0, depth)
+        # A repeated path resolves to its last occurrence
+        self._paths = dict(zip(self._names, range(len(self._names))))
+        self._lazy = {}
+        # Disjoint edits sorted by start, in original offsets; _shifts[j] is
+        # the growth of the document caused by edits[:j]
+        self._edits = []
+        self._edit_starts = []
+        self._shifts = [0]
+        self._overlay = {}
+
+    def _covering(self, start, end):
+        """The edit whose original span contains start..end, or None"""
+        j = bisect_right(self._edit_starts, start) - 1
+        if j >= 0 and end <= self._edits[j].end:
+            return self._edits[j]
+        return None
+
+    def _resolve(self, name):
+        """Scan the deepest known ancestor of a path past the depth limit for it
+
+        Only the path and its ancestors are kept, so repeated lookups stay
+        cheap without the index growing by whole subtrees.
+        """
+        parts = name.split(self.sep)
+        if not self.depth or len(parts) <= self.depth:
+            return None
+        for level in range(len(parts) - 1, self.depth - 1, -1):
+            base = self.sep.join(parts[:level])
+            span = self._lazy.get(base)
+            if span is None and level == self.depth and base in self._paths:
+                i = self._paths[base]
+                span = self._starts[i], self._ends[i]
+            if span is not None:
+                break
+        else:
+            return None
+        names, starts, ends = self._scan(self._buf, span[0], span[1], base, level, len(parts))
+        for path, start, end in zip(names, starts, ends):
+            if name == path or name.startswith(path + self.sep):
+                self._lazy[path] = start, end
+        return self._lazy.get(name)
+
+    def _locate(self, name):
+        """Return (edit, start, end): offsets into edit.data, or original offsets when edit is None"""
+        edit = self._overlay.get(name)
+        if edit is not None:
+            start, end = edit.spans[name]
+            return edit, start, end
+        i = self._paths.get(name)
+        if i is not None:
+            span = self._starts[i], self._ends[i]
+        else:
+            span = self._lazy.get(name) or self._resolve(name)
+            if span is None:
+                raise KeyError(name)
+        # Paths inside a replaced value that the replacement no longer has
+        if self._covering(*span) is not None:
+            raise KeyError(name)
+        return None, span[0], span[1]
+
+    def _position(self, offset):
+        """Current offset of an original offset that lies outside every edit"""
+        return offset + self._shifts[bisect_left(self._edit_starts, offset)]
+
+    # Edits
+
+    def read(self, name):
+        """Current bytes of the value at name"""
+        edit, start, end = self._locate(name)
+        if edit is not None:
+            return edit.data[start:end]
+        parts = []
+        for j in range(bisect_left(self._edit_starts, start), bisect_left(self._edit_starts, end)):
+            inner = self._edits[j]
+            parts += [self._buf[start:inner.start], inner.data]
+            start = inner.end
+        parts.append(self._buf[start:end])
+        return b''.join(parts)
+
+    def line(self, name):
+        """1-based line of the file as read on which the value at name starts
+
+        A value inside a replacement counts from where the replacement starts.
+        """
+        edit, start, _ = self._locate(name)
+        if edit is not None:
+            start = edit.start
+        return self._buf[:start].count(b'\n') + 1
+
+    def replace(self, name, data, scope=None, rename=None):
+        """Replace the bytes of the value at name with data
+
+        With scope, the enclosing value at scope is re-indexed as a whole,
+        for edits that change the names of the value's siblings. rename gives
+        the value a new name. Returns False, queuing nothing, if the value
+        already holds data.
+        """
+        if self.read(name) == data:
+            return False
+        if scope is not None:
+            target, outer = self[name], self[scope]
+            whole = self.read(scope)
+            data = (whole[:target['start'] - outer['start']] + data
+                    + whole[target['end'] + 1 - outer['start']:])
+            name = scope
+        edit, start, end = self._locate(name)
+        if edit is not None:
+            # A path inside an earlier replacement: rewrite that replacement
+            data = edit.data[:start] + data + edit.data[end:]
+            start, end = edit.start, edit.end
+            if name != edit.root:
+                name, rename = edit.root, None
+        name = rename or name
+        names, starts, ends = self._scan(data, 0, len(data), name, len(name.split(self.sep)), 0)
+        new = _Edit(start, end, data, name, dict(zip(names, zip(starts, ends))))
+
+        # Earlier edits inside the replaced span are superseded
+        lo = bisect_left(self._edit_starts, start)
+        hi = bisect_left(self._edit_starts, end)
+        for old in self._edits[lo:hi]:
+            for path in old.spans:
+                if self._overlay.get(path) is old:
+                    del self._overlay[path]
+        self._edits[lo:hi] = [new]
+        self._edit_starts[lo:hi] = [start]
+        self._overlay.update(dict.fromkeys(new.spans, new))
+        shifts = [0]
+        for e in self._edits:
+            shifts.append(shifts[-1] + len(e.data) - (e.end - e.start))
+        self._shifts = shifts
+        return True
+
+    def splices(self):
+        """(start, end, data) of every queued edit: original bytes start..end-1 become data"""
+        return [(edit.start, edit.end, edit.data) for edit in self._edits]
+
+    def write_to(self, f):
+        """Write the current document to the binary file f"""
+        pos = 0
+        with memoryview(self._buf) as view:
+            for edit in self._edits:
+                f.write(view[pos:edit.start])
+                f.write(edit.data)
+                pos = edit.end
+            f.write(view[pos:])
+
+    def save(self, path=None):
+        """Write the document to path through a temporary file that replaces it
+
+        The original file stays mapped, so it must never be truncated while
+        it is still being read; the mapping keeps the old content alive after
+        the new file replaces it.
+        """
+        from .atomic_write import atomic_write
+        atomic_write(path or self.filepath, self.write_to, binary=True)
+
+    # Mapping interface
+
+    def __getitem__(self, name):
+        edit, start, end = self._locate(name)
+        if edit is None:
+            start, end = self._position(start), self._position(end)
+        else:
+            base = self._position(edit.start)
+            start, end = base + start, base + end
+        return {'start': start, 'end': end - 1}
+
+    def __contains__(self, name):
+        try:
+            self._locate(name)
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self):
+        """Indexed paths in document order, with replacements in place of what they replaced"""
+        edits = iter(self._edits)
+        pending = next(edits, None)
+        last = None
+        paths = self._paths
+        for i, name in enumerate(self._names):
+            start = self._starts[i]
+            while pending is not None and pending.start <= start:
+                yield from self._edit_paths(pending)
+                last, pending = pending, next(edits, None)
+            if paths[name] != i or (last is not None and start < last.end):
+                continue
+            yield name
+        while pending is not None:
+            yield from self._edit_paths(pending)
+            pending = next(edits, None)
+
+    def _edit_paths(self, edit):
+        # Replacements are indexed in full; list them to the same depth as the rest
+        if not self.depth:
+            return edit.spans
+        return (name for name in edit.spans if name.count(self.sep) < self.depth)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"ByteDocument({len(self._names)} paths, {len(self._edits)} edits)"
@@ -11,23 +11,29 @@ _codecrispr_completion() {
     COMPREPLY=()
     cur="${COMP_WORDS[COMP_CWORD]}"
     prev="${COMP_WORDS[COMP_CWORD-1]}"
-    opts="--inspect --preview --with-lines --as-comment --preview-only --export --json --pretty --batch --preview-changes --apply --config --help"
+    opts="--inspect --find --preview --with-lines --as-comment --preview-only --export --json --pretty --batch --workers --preview-changes --apply --if-hash --index --where --index-db --serve --socket --watch --config --timings --profile --help"
 
     case "${prev}" in
         --preview|--export)
-            # Complete with available methods from the file
+            # Complete with available methods from the file, one per line
             if [[ -f "${COMP_WORDS[1]}" ]]; then
-                local methods=$(python3 "$(dirname "$1")/codecrispr.py" "${COMP_WORDS[1]}" --inspect --json | python3 -c "import sys, json; data = json.load(sys.stdin); print(' '.join(data['blocks'].keys()))" 2>/dev/null)
-                COMPREPLY=( $(compgen -W "${methods}" -- ${cur}) )
+                local IFS=$'\\n'
+                local methods=$(python3 "$(dirname "$1")/codecrispr.py" "${COMP_WORDS[1]}" --complete 2>/dev/null)
+                COMPREPLY=( $(compgen -W "${methods}" -- "${cur}") )
             fi
             return 0
             ;;
         --config)
             # Complete with configuration keys
-            local config_keys="general.backup_enabled general.backup_extension general.default_language output.use_colors output.json_pretty output.show_line_numbers editor.tab_size editor.use_spaces editor.trim_trailing_whitespace"
+            local config_keys=$(python3 "$(dirname "$1")/codecrispr.py" --complete --config 2>/dev/null)
             COMPREPLY=( $(compgen -W "${config_keys}" -- ${cur}) )
             return 0
             ;;
+        --index)
+            # Complete with directories
+            COMPREPLY=( $(compgen -d -- ${cur}) )
+            return 0
+            ;;
         --batch)
             # Complete with JSON files
             COMPREPLY=( $(compgen -f -X '!*.json' -- ${cur}) )
@@ -54,6 +60,7 @@ _codecrispr() {
     local -a opts
     opts=(
         '--inspect[Inspect available blocks]'
+        '--find[List blocks matching a name prefix or glob]:pattern:'
         '--preview[Preview a named block]:method name:->methods'
         '--with-lines[Include line numbers in preview]'
         '--as-comment[Add comment delimiters to each line]'
@@ -62,9 +69,19 @@ _codecrispr() {
         '--json[Output in JSON format]'
         '--pretty[Pretty print JSON output]'
         '--batch[Batch update from JSON file]:json file:_files -g "*.json"'
+        '--workers[Worker processes for multi-file batches]:count:'
         '--preview-changes[Preview changes before applying]'
         '--apply[Apply changes after preview]'
+        '--if-hash[Only replace if the block hash still matches]:hash:'
+        '--index[Build or refresh the symbol index]:directory:_files -/'
+        '--where[Find which files define a block]:block name:'
+        '--index-db[Symbol index database]:database file:_files'
+        '--serve[Run a persistent JSON-RPC server]'
+        '--socket[Listen on a Unix socket]:socket path:_files'
+        '--watch[Watch files and print block changes]:*:path:_files'
         '--config[Show or set configuration values]:config key:->config'
+        '--timings[Report phase timings as JSON]::log file:_files'
+        '--profile[Run under cProfile]::stats file:_files'
         '--help[Show help message]'
     )
 
@@ -78,23 +95,14 @@ _codecrispr() {
         methods)
             if [[ -f $words[2] ]]; then
                 local methods
-                methods=(${(f)"$(python3 ${words[1]:h}/codecrispr.py $words[2] --inspect --json | python3 -c "import sys, json; data = json.load(sys.stdin); print('\\n'.join(data['blocks'].keys()))" 2>/dev/null)"})
-                _describe 'method' methods
+                methods=(${(f)"$(python3 ${words[1]:h}/codecrispr.py $words[2] --complete 2>/dev/null)"})
+                # compadd, not _describe: names such as Class::method contain colons
+                compadd -a methods
             fi
             ;;
         config)
             local config_keys
-            config_keys=(
-                'general.backup_enabled'
-                'general.backup_extension'
-                'general.default_language'
-                'output.use_colors'
-                'output.json_pretty'
-                'output.show_line_numbers'
-                'editor.tab_size'
-                'editor.use_spaces'
-                'editor.trim_trailing_whitespace'
-            )
+            config_keys=(${(f)"$(python3 ${words[1]:h}/codecrispr.py --complete --config 2>/dev/null)"})
             _describe 'config key' config_keys
             ;;
     esac
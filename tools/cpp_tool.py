@@ -1,87 +1,73 @@
-import re
+from .brace_scanner import BraceScanner, block_end, nesting
+from .line_classifier import LineClassifier
+from .line_editor import LineEditor
 
-class CodeCRISPR:
-    def __init__(self, filepath):
-        self.filepath = filepath
-        self.lines = self._read_file()
-        self.reference_map = self._parse_methods()
+# char_quote keeps digit separators (1'000'000) from opening a literal
+SCANNER = BraceScanner(quotes=('"',), char_quote="'")
 
-    def _read_file(self):
-        with open(self.filepath, 'r') as f:
-            return f.read().splitlines()
+CLASSIFIER = LineClassifier([
+    # Namespaces and class definitions (not declarations), whose functions are named Scope::name
+    ('namespace', r'^\s*(?:inline\s+)?namespace\s*(?P<scope>[\w:]*)\s*(?:\{.*)?$'),
+    ('class', r'^\s*(?:template\s*<.*?>\s*)?(?:class|struct|union)\s+(?:\w+\s+)*?(?P<scope>\w+)\s*(?:final\s*)?(?::[^;{]*)?(?:\{.*)?$'),
+    # Class methods (ClassName::methodName)
+    ('method', r'^\s*(?:[\w:*&<>]+\s+)+(?P<cls>(?:\w+::)*\w+)::(?P<name>\w+)\s*\(.*?\)(?:\s*const)?(?:\s*override)?(?:\s*final)?(?:\s*noexcept(?:\(.*?\))?)?\s*\{'),
+    # Free functions (including templates, inline, constexpr)
+    ('function', r'^\s*(?:template\s*<.*?>\s*)?(?:inline\s+)?(?:constexpr\s+)?(?:static\s+)?(?:[\w:*&<>]+\s+)+(?P<name>\w+)\s*\(.*?\)(?:\s*const)?(?:\s*noexcept(?:\(.*?\))?)?\s*\{'),
+    # Constructors and destructors
+    ('constructor', r'^\s*(?:explicit\s+)?(?P<name>\w+)\s*\(.*?\)(?:\s*:\s*.*?)?\s*\{'),
+    ('destructor', r'^\s*~(?P<name>\w+)\s*\(\s*\)(?:\s*noexcept)?\s*\{'),
+], keywords=('{', 'namespace', 'class', 'struct', 'union'))
+
+def _scope_end(scan, i):
+    """Line closing a scope whose header is line i; its `{` may open on a later line"""
+    j = i
+    while j < len(scan.ends) - 1 and scan.ends[j] < 0:
+        j += 1
+    return block_end(scan, j)
+
+class CodeCRISPR(LineEditor):
+    not_found_message = "C++ method '{name}' not found."
+    qualifier = '::'
 
     def _parse_methods(self):
-        # Enhanced patterns for C++ functions and methods
-        patterns = [
-            # Class methods (ClassName::methodName)
-            re.compile(r'^\s*(?:[\w:*&<>]+\s+)+(\w+)::(\w+)\s*\(.*?\)(?:\s*const)?(?:\s*override)?(?:\s*final)?(?:\s*noexcept(?:\(.*?\))?)?\s*\{'),
-            # Free functions (including templates, inline, constexpr)
-            re.compile(r'^\s*(?:template\s*<.*?>\s*)?(?:inline\s+)?(?:constexpr\s+)?(?:static\s+)?(?:[\w:*&<>]+\s+)+(\w+)\s*\(.*?\)(?:\s*const)?(?:\s*noexcept(?:\(.*?\))?)?\s*\{'),
-            # Constructors and destructors
-            re.compile(r'^\s*(?:explicit\s+)?(\w+)\s*\(.*?\)(?:\s*:\s*.*?)?\s*\{'),
-            re.compile(r'^\s*~(\w+)\s*\(\s*\)(?:\s*noexcept)?\s*\{'),
-        ]
-        
         reference_map = {}
+        scan = SCANNER.scan(self.lines)
         i = 0
+        # Enclosing namespaces and classes as (name, end line), innermost
+        # last; anonymous namespaces add nothing to names
+        scopes = []
         
         while i < len(self.lines):
+            while scopes and scopes[-1][1] < i:
+                scopes.pop()
             line = self.lines[i]
             
-            # Skip preprocessor directives
-            if line.strip().startswith('#'):
+            # Skip preprocessor directives, comments and string continuations
+            if line.strip().startswith('#') or not scan.in_code[i]:
                 i += 1
                 continue
             
             # Match functions and methods
-            for pattern in patterns:
-                match = pattern.match(line)
-                if match:
-                    if pattern == patterns[0]:  # Class method
-                        class_name = match.group(1)
-                        method_name = match.group(2)
-                        name = f"{class_name}::{method_name}"
-                    else:  # Free function or constructor/destructor
-                        name = match.group(1)
-                    
-                    start = i
-                    brace_count = 0
-                    j = i
-                    
-                    # Count braces to find the end
-                    while j < len(self.lines):
-                        # Skip string literals and comments
-                        clean_line = re.sub(r'".*?"|\'.*?\'|//.*$|/\*.*?\*/', '', self.lines[j])
-                        brace_count += clean_line.count('{')
-                        brace_count -= clean_line.count('}')
-                        if brace_count == 0 and j > i:
-                            break
-                        j += 1
-                    
-                    end = j
-                    reference_map[name] = {'start': start, 'end': end}
-                    i = end + 1
-                    break
+            found = CLASSIFIER.match(line)
+            if found and found[0] in ('namespace', 'class'):
+                scopes.append((found[1]['scope'], _scope_end(scan, i)))
+                i += 1
+            elif found:
+                kind, fields = found
+                if kind == 'method':
+                    name = f"{fields['cls']}::{fields['name']}"
+                else:  # Free function or constructor/destructor
+                    name = fields['name']
+                name = '::'.join([n for n, _ in scopes if n] + [name])
+                end = block_end(scan, i)
+                reference_map[name] = {'start': i, 'end': end}
+                i = end + 1
             else:
                 i += 1
         
         return reference_map
 
-    def replace_method(self, method_name, new_code):
-        if method_name not in self.reference_map:
-            raise ValueError(f"C++ method '{method_name}' not found.")
-        start = self.reference_map[method_name]["start"]
-        end = self.reference_map[method_name]["end"]
-        new_lines = new_code.strip("\n").splitlines()
-        self.lines[start:end + 1] = new_lines
-        shift = len(new_lines) - (end - start + 1)
-        for k, v in self.reference_map.items():
-            if v["start"] > end:
-                v["start"] += shift
-                v["end"] += shift
-        self.reference_map[method_name]["end"] = start + len(new_lines) - 1
+    _parse = _parse_methods
 
-    def save(self, output_path=None):
-        path = output_path or self.filepath
-        with open(path, "w") as f:
-            f.write("\n".join(self.lines) + "\n")
\ No newline at end of file
+    def _nesting(self, lines):
+        return nesting(SCANNER.scan(lines))
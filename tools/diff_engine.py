@@ -0,0 +1,405 @@
+"""
+Line diffs for CodeCRISPR previews
+
+difflib's SequenceMatcher slows down sharply on large blocks made of
+repeated lines (generated tables, long SQL, big Markdown sections), and
+its autojunk heuristic gives poor diffs for them. This module diffs lines
+as integers, interning each distinct line once. It offers two algorithms:
+
+- `myers`: Myers' O(ND) algorithm, in linear space by bisecting at the
+  middle snake. It finds a shortest edit script.
+- `histogram`: git's histogram diff. It anchors on the rarest lines common
+  to both sides and recurses around them, falling back to Myers where no
+  line is rare enough.
+
+Both first set aside lines that occur on one side only. Such lines can
+never match, and removing them keeps the edit distance that Myers explores
+small.
+
+`unified_diff()` produces the same lines as difflib.unified_diff, which
+stays available as the `difflib` algorithm. `unified_patch()` diffs only the
+replaced ranges of a file and lays them out with the file's real line
+numbers, as one patch `git apply` accepts.
+"""
+import difflib
+from array import array
+from bisect import bisect_right
+
+ALGORITHMS = ('histogram', 'myers', 'difflib')
+# Lines occurring more often than this in a region are never histogram anchors
+MAX_CHAIN = 64
+# Follows a line that does not end in a line break
+NO_NEWLINE = '\\ No newline at end of file'
+
+
+def _intern(a, b):
+    """a and b as lists of integers, equal where the lines are equal"""
+    ids = {}
+    return [ids.setdefault(line, len(ids)) for line in a], [ids.setdefault(line, len(ids)) for line in b]
+
+
+def _bisect(a, b, alo, ahi, blo, bhi):
+    """Split point (x, y) of a shortest edit path, found at the middle snake
+
+    Returns None if the regions have nothing in common. The regions must not
+    share a first or last element.
+    """
+    n, m = ahi - alo, bhi - blo
+    max_d = (n + m + 1) // 2
+    offset = max_d
+    size = 2 * max_d + 2
+    forward = [-1] * size
+    backward = [-1] * size
+    forward[offset + 1] = 0
+    backward[offset + 1] = 0
+    delta = n - m
+    # With an odd delta the paths meet during a forward step, else a backward one
+    front = delta & 1
+    k1start = k1end = k2start = k2end = 0
+    for d in range(max_d):
+        for k1 in range(-d + k1start, d + 1 - k1end, 2):
+            k1_offset = offset + k1
+            if k1 == -d or (k1 != d and forward[k1_offset - 1] < forward[k1_offset + 1]):
+                x1 = forward[k1_offset + 1]
+            else:
+                x1 = forward[k1_offset - 1] + 1
+            y1 = x1 - k1
+            while x1 < n and y1 < m and a[alo + x1] == b[blo + y1]:
+                x1 += 1
+                y1 += 1
+            forward[k1_offset] = x1
+            if x1 > n:
+                k1end += 2
+            elif y1 > m:
+                k1start += 2
+            elif front:
+                k2_offset = offset + delta - k1
+                if 0 <= k2_offset < size and backward[k2_offset] != -1 and x1 >= n - backward[k2_offset]:
+                    return alo + x1, blo + y1
+        for k2 in range(-d + k2start, d + 1 - k2end, 2):
+            k2_offset = offset + k2
+            if k2 == -d or (k2 != d and backward[k2_offset - 1] < backward[k2_offset + 1]):
+                x2 = backward[k2_offset + 1]
+            else:
+                x2 = backward[k2_offset - 1] + 1
+            y2 = x2 - k2
+            while x2 < n and y2 < m and a[ahi - 1 - x2] == b[bhi - 1 - y2]:
+                x2 += 1
+                y2 += 1
+            backward[k2_offset] = x2
+            if x2 > n:
+                k2end += 2
+            elif y2 > m:
+                k2start += 2
+            elif not front:
+                k1_offset = offset + delta - k2
+                if 0 <= k1_offset < size and forward[k1_offset] != -1:
+                    x1 = forward[k1_offset]
+                    if x1 >= n - x2:
+                        return alo + x1, blo + x1 - (k1_offset - offset)
+    return None
+
+
+def _trim(a, b, alo, ahi, blo, bhi, matches):
+    """Match the common prefix and suffix of two regions; return what is left"""
+    while alo < ahi and blo < bhi and a[alo] == b[blo]:
+        matches[alo] = blo
+        alo += 1
+        blo += 1
+    while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+        ahi -= 1
+        bhi -= 1
+        matches[ahi] = bhi
+    return alo, ahi, blo, bhi
+
+
+def _myers(a, b, alo, ahi, blo, bhi, matches):
+    """Set matches[i] = j for the lines a shortest edit script keeps"""
+    regions = [(alo, ahi, blo, bhi)]
+    while regions:
+        alo, ahi, blo, bhi = _trim(a, b, *regions.pop(), matches)
+        if alo == ahi or blo == bhi:
+            continue
+        split = _bisect(a, b, alo, ahi, blo, bhi)
+        if split is None or split in ((alo, blo), (ahi, bhi)):
+            continue
+        x, y = split
+        regions.append((alo, x, blo, y))
+        regions.append((x, ahi, y, bhi))
+
+
+def _anchor(a, b, alo, ahi, blo, bhi):
+    """The common run holding the rarest lines of a region, as (i, j, size), or None"""
+    occurrences = {}
+    for i in range(alo, ahi):
+        occurrences.setdefault(a[i], []).append(i)
+    best = None
+    best_count = MAX_CHAIN + 1
+    j = blo
+    while j < bhi:
+        positions = occurrences.get(b[j])
+        if positions is None or len(positions) > best_count:
+            j += 1
+            continue
+        next_j = j + 1
+        for i in positions:
+            count = len(positions)
+            si, sj = i, j
+            while si > alo and sj > blo and a[si - 1] == b[sj - 1]:
+                si -= 1
+                sj -= 1
+                count = min(count, len(occurrences[a[si]]))
+            ei, ej = i + 1, j + 1
+            while ei < ahi and ej < bhi and a[ei] == b[ej]:
+                count = min(count, len(occurrences[a[ei]]))
+                ei += 1
+                ej += 1
+            next_j = max(next_j, ej)
+            if best is None or count < best_count or (count == best_count and ei - si > best[2]):
+                best = (si, sj, ei - si)
+                best_count = count
+        j = next_j
+    return best
+
+
+def _histogram(a, b, alo, ahi, blo, bhi, matches):
+    """Set matches[i] = j for the lines a histogram diff keeps"""
+    regions = [(alo, ahi, blo, bhi)]
+    while regions:
+        alo, ahi, blo, bhi = _trim(a, b, *regions.pop(), matches)
+        if alo == ahi or blo == bhi:
+            continue
+        anchor = _anchor(a, b, alo, ahi, blo, bhi)
+        if anchor is None:
+            _myers(a, b, alo, ahi, blo, bhi, matches)
+            continue
+        i, j, size = anchor
+        for k in range(size):
+            matches[i + k] = j + k
+        regions.append((alo, i, blo, j))
+        regions.append((i + size, ahi, j + size, bhi))
+
+
+def matching_pairs(a, b, algorithm='histogram'):
+    """(i, j) pairs of equal lines a[i] == b[j] that the diff keeps, in order"""
+    ia, ib = _intern(a, b)
+    # Lines found on one side only can never match; leave them out
+    in_a, in_b = set(ia), set(ib)
+    keep_a = array('i', [i for i, line in enumerate(ia) if line in in_b])
+    keep_b = array('i', [j for j, line in enumerate(ib) if line in in_a])
+    fa = [ia[i] for i in keep_a]
+    fb = [ib[j] for j in keep_b]
+    del ia, ib, in_a, in_b
+    # Index into fb of the line each line of fa is matched with, or -1
+    matches = array('i', [-1]) * len(fa)
+    (_histogram if algorithm == 'histogram' else _myers)(fa, fb, 0, len(fa), 0, len(fb), matches)
+    for i, j in enumerate(matches):
+        if j >= 0:
+            yield keep_a[i], keep_b[j]
+
+
+def opcodes(a, b, algorithm='histogram'):
+    """(tag, i1, i2, j1, j2) tuples turning a into b, as SequenceMatcher.get_opcodes() gives"""
+    if algorithm == 'difflib':
+        return difflib.SequenceMatcher(None, a, b).get_opcodes()
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"diff.algorithm must be one of {', '.join(ALGORITHMS)}")
+    codes = []
+    i = j = 0
+    # Runs of consecutive matches, closed by a sentinel at the end of both sides
+    runs = []
+    for mi, mj in matching_pairs(a, b, algorithm):
+        if runs and runs[-1][0] + runs[-1][2] == mi and runs[-1][1] + runs[-1][2] == mj:
+            runs[-1][2] += 1
+        else:
+            runs.append([mi, mj, 1])
+    runs.append([len(a), len(b), 0])
+    for mi, mj, run in runs:
+        if i < mi and j < mj:
+            codes.append(('replace', i, mi, j, mj))
+        elif i < mi:
+            codes.append(('delete', i, mi, j, j))
+        elif j < mj:
+            codes.append(('insert', i, i, j, mj))
+        if run:
+            codes.append(('equal', mi, mi + run, mj, mj + run))
+        i, j = mi + run, mj + run
+    return codes
+
+
+def grouped_opcodes(codes, n=3):
+    """Hunks of opcodes with up to n lines of context, as SequenceMatcher.get_grouped_opcodes() gives"""
+    codes = list(codes)
+    if not codes:
+        codes = [('equal', 0, 1, 0, 1)]
+    if codes[0][0] == 'equal':
+        tag, i1, i2, j1, j2 = codes[0]
+        codes[0] = tag, max(i1, i2 - n), i2, max(j1, j2 - n), j2
+    if codes[-1][0] == 'equal':
+        tag, i1, i2, j1, j2 = codes[-1]
+        codes[-1] = tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)
+    group = []
+    for tag, i1, i2, j1, j2 in codes:
+        # A long stretch of equal lines ends one hunk and starts the next
+        if tag == 'equal' and i2 - i1 > 2 * n:
+            group.append((tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)))
+            yield group
+            group = []
+            i1, j1 = max(i1, i2 - n), max(j1, j2 - n)
+        group.append((tag, i1, i2, j1, j2))
+    if group and not (len(group) == 1 and group[0][0] == 'equal'):
+        yield group
+
+
+def _range(start, stop):
+    """A unified diff range, as difflib formats it"""
+    beginning = start + 1
+    length = stop - start
+    if length == 1:
+        return f'{beginning}'
+    if not length:
+        beginning -= 1
+    return f'{beginning},{length}'
+
+
+def _hunks(codes, a, b, fromfile, tofile, n, a_end=None, b_end=None):
+    """Unified diff lines for opcodes over a and b (sequences sliced as needed)
+
+    a_end / b_end are the index of the last line of a / b when that line has
+    no line break, to be flagged as git and diff(1) do.
+    """
+    started = False
+    for group in grouped_opcodes(codes, n):
+        if not started:
+            started = True
+            yield f'--- {fromfile}'
+            yield f'+++ {tofile}'
+        first, last = group[0], group[-1]
+        yield f'@@ -{_range(first[1], last[2])} +{_range(first[3], last[4])} @@'
+        for tag, i1, i2, j1, j2 in group:
+            if tag == 'equal':
+                for line in a[i1:i2]:
+                    yield ' ' + line
+                if a_end is not None and i1 <= a_end < i2:
+                    yield NO_NEWLINE
+                continue
+            if tag in ('replace', 'delete'):
+                for line in a[i1:i2]:
+                    yield '-' + line
+                if a_end is not None and i1 <= a_end < i2:
+                    yield NO_NEWLINE
+            if tag in ('replace', 'insert'):
+                for line in b[j1:j2]:
+                    yield '+' + line
+                if b_end is not None and j1 <= b_end < j2:
+                    yield NO_NEWLINE
+
+
+def unified_diff(a, b, fromfile='', tofile='', n=3, algorithm='histogram'):
+    """Lines (without line ends) of a unified diff from a to b, like difflib.unified_diff(lineterm='')"""
+    if algorithm == 'difflib':
+        yield from difflib.unified_diff(a, b, fromfile, tofile, n=n, lineterm='')
+        return
+    yield from _hunks(opcodes(a, b, algorithm), a, b, fromfile, tofile, n)
+
+
+class _Patched:
+    """The lines of a with edits applied, read through slices without copying a"""
+
+    def __init__(self, a, edits):
+        self.a = a
+        self.edits = edits
+        # Where each edit starts in the new lines, and the growth before it
+        self.starts = []
+        self.shifts = []
+        shift = 0
+        for start, old, new in edits:
+            self.starts.append(start + shift)
+            self.shifts.append(shift)
+            shift += len(new) - len(old)
+        self.length = len(a) + shift
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, key):
+        out = []
+        j, stop, _ = key.indices(self.length)
+        while j < stop:
+            k = bisect_right(self.starts, j) - 1
+            if k >= 0:
+                start, old, new = self.edits[k]
+                offset = j - self.starts[k]
+                if offset < len(new):
+                    out.extend(new[offset:stop - self.starts[k]])
+                    j = self.starts[k] + min(len(new), stop - self.starts[k])
+                    continue
+                shift = self.shifts[k] + len(new) - len(old)
+            else:
+                shift = 0
+            # Unedited lines of a, up to the next edit
+            following = self.starts[k + 1] if k + 1 < len(self.starts) else self.length
+            end = min(stop, following)
+            out.extend(self.a[j - shift:end - shift])
+            j = end
+        return out
+
+
+def _split_unterminated(codes, a_end, b_end):
+    """Move a last line without a line break out of 'equal' opcodes
+
+    A line that lacks its line break on one side only differs between the
+    two, so it cannot be context.
+    """
+    for k, (tag, i1, i2, j1, j2) in enumerate(codes):
+        if tag != 'equal':
+            continue
+        if a_end is not None and i1 <= a_end < i2 and j1 + a_end - i1 != b_end:
+            offset = a_end - i1
+        elif b_end is not None and j1 <= b_end < j2 and i1 + b_end - j1 != a_end:
+            offset = b_end - j1
+        else:
+            continue
+        split = [('equal', i1, i1 + offset, j1, j1 + offset),
+                 ('replace', i1 + offset, i1 + offset + 1, j1 + offset, j1 + offset + 1),
+                 ('equal', i1 + offset + 1, i2, j1 + offset + 1, j2)]
+        codes[k:k + 1] = [code for code in split if code[1] < code[2]]
+        # The other side's last line may be in a later opcode
+        return _split_unterminated(codes, a_end, b_end)
+
+
+def unified_patch(a, edits, fromfile='', tofile='', n=3, algorithm='histogram',
+                  a_newline=True, b_newline=True):
+    """Unified diff lines for the file lines a after a set of block replacements
+
+    edits are (start, old, new) triples, sorted and not overlapping: the
+    lines a[start:start + len(old)], given as old, become the lines new.
+    Only those ranges are diffed; the rest of a is read for context lines
+    alone. a_newline / b_newline tell whether the file ends with a line
+    break before / after the edits.
+    """
+    codes = []
+    pos = shift = 0
+    for start, old, new in edits:
+        codes.append(('equal', pos, start, pos + shift, start + shift))
+        for tag, i1, i2, j1, j2 in opcodes(old, new, algorithm):
+            codes.append((tag, start + i1, start + i2, start + shift + j1, start + shift + j2))
+        pos = start + len(old)
+        shift += len(new) - len(old)
+    codes.append(('equal', pos, len(a), pos + shift, len(a) + shift))
+    # Join neighbouring runs of equal lines so hunks break where they should
+    merged = []
+    for code in codes:
+        if code[1] == code[2] and code[3] == code[4]:
+            continue
+        if merged and code[0] == 'equal' == merged[-1][0]:
+            merged[-1] = ('equal', merged[-1][1], code[2], merged[-1][3], code[4])
+        else:
+            merged.append(code)
+    if all(code[0] == 'equal' for code in merged):
+        return
+    b = _Patched(a, edits)
+    a_end = None if a_newline or not len(a) else len(a) - 1
+    b_end = None if b_newline or not len(b) else len(b) - 1
+    _split_unterminated(merged, a_end, b_end)
+    yield from _hunks(merged, a, b, fromfile, tofile, n, a_end, b_end)
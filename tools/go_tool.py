@@ -1,51 +1,36 @@
-import re
+from .brace_scanner import BraceScanner, block_end
+from .line_classifier import LineClassifier
+from .line_editor import LineEditor
 
-class MethodEditor:
-    def __init__(self, filepath):
-        self.filepath = filepath
-        self.lines = self._read_file()
-        self.reference_map = self._parse_functions()
+SCANNER = BraceScanner(quotes=('"',), multiline_quotes=('`',), char_quote="'")
 
-    def _read_file(self):
-        with open(self.filepath, 'r') as f:
-            return f.read().splitlines()
+CLASSIFIER = LineClassifier([
+    # Functions, and methods named after their receiver's type
+    ('function', r'^\s*func\s+(?:\(\s*(?:\w+\s+)?\*?(?P<receiver>\w+)[^)]*\)\s*)?(?P<name>\w+)\s*\(.*\)[^{]*\{'),
+], keywords=('func',))
+
+class CodeCRISPR(LineEditor):
+    not_found_message = "Function '{name}' not found."
+    qualifier = '.'
 
     def _parse_functions(self):
-        pattern = re.compile(r'^\s*func\s+(?:\(.*\)\s*)?(\w+)\s*\(.*\)\s*\{')
         reference_map = {}
+        scan = SCANNER.scan(self.lines)
         i = 0
         while i < len(self.lines):
-            match = pattern.match(self.lines[i])
-            if match:
-                name = match.group(1)
+            found = scan.in_code[i] and CLASSIFIER.match(self.lines[i])
+            if found:
+                receiver, name = found[1]['receiver'], found[1]['name']
+                if receiver:
+                    name = f"{receiver}.{name}"
                 start = i
-                brace_count = 0
-                while i < len(self.lines):
-                    brace_count += self.lines[i].count('{')
-                    brace_count -= self.lines[i].count('}')
-                    if brace_count == 0:
-                        break
-                    i += 1
-                end = i
-                reference_map[name] = {'start': start, 'end': end}
+                i = block_end(scan, i)
+                reference_map[name] = {'start': start, 'end': i}
             i += 1
         return reference_map
 
-    def replace_method(self, method_name, new_code):
-        if method_name not in self.reference_map:
-            raise ValueError(f"Function '{method_name}' not found.")
-        start = self.reference_map[method_name]['start']
-        end = self.reference_map[method_name]['end']
-        new_lines = new_code.strip('\n').splitlines()
-        self.lines[start:end+1] = new_lines
-        shift = len(new_lines) - (end - start + 1)
-        for k, v in self.reference_map.items():
-            if v['start'] > end:
-                v['start'] += shift
-                v['end'] += shift
-        self.reference_map[method_name]['end'] = start + len(new_lines) - 1
+    _parse = _parse_functions
+
 
-    def save(self, output_path=None):
-        path = output_path or self.filepath
-        with open(path, 'w') as f:
-            f.write('\n'.join(self.lines) + '\n')
\ No newline at end of file
+# Alias for backwards compatibility
+MethodEditor = CodeCRISPR
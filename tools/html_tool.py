@@ -1,23 +1,20 @@
-import re
+from .line_classifier import LineClassifier
+from .line_editor import LineEditor
 
-class CodeCRISPR:
-    def __init__(self, filepath):
-        self.filepath = filepath
-        self.lines = self._read_file()
-        self.reference_map = self._parse_div_blocks()
+CLASSIFIER = LineClassifier([
+    ('div', r'^\s*<div\s+id="(?P<name>[^"]+)".*?>'),
+], keywords=('<div',))
 
-    def _read_file(self):
-        with open(self.filepath, 'r') as f:
-            return f.read().splitlines()
+class CodeCRISPR(LineEditor):
+    not_found_message = "<div id='{name}'> block not found."
 
     def _parse_div_blocks(self):
-        pattern = re.compile(r'^\s*<div\s+id="([^"]+)".*?>')
         reference_map = {}
         i = 0
         while i < len(self.lines):
-            match = pattern.match(self.lines[i])
-            if match:
-                name = match.group(1)
+            found = CLASSIFIER.match(self.lines[i])
+            if found:
+                name = found[1]['name']
                 start = i
                 depth = 1
                 i += 1
@@ -35,21 +32,4 @@ class CodeCRISPR:
                 i += 1
         return reference_map
 
-    def replace_method(self, block_id, new_code):
-        if block_id not in self.reference_map:
-            raise ValueError(f"<div id='{block_id}'> block not found.")
-        start = self.reference_map[block_id]["start"]
-        end = self.reference_map[block_id]["end"]
-        new_lines = new_code.strip("\n").splitlines()
-        self.lines[start:end+1] = new_lines
-        shift = len(new_lines) - (end - start + 1)
-        for k, v in self.reference_map.items():
-            if v["start"] > end:
-                v["start"] += shift
-                v["end"] += shift
-        self.reference_map[block_id]["end"] = start + len(new_lines) - 1
-
-    def save(self, output_path=None):
-        path = output_path or self.filepath
-        with open(path, "w") as f:
-            f.write("\n".join(self.lines) + "\n")
\ No newline at end of file
+    _parse = _parse_div_blocks
@@ -1,55 +1,49 @@
-import re
+from .brace_scanner import BraceScanner, block_end, nesting
+from .line_classifier import LineClassifier
+from .line_editor import LineEditor
 
-class CodeCRISPR:
-    def __init__(self, filepath):
-        self.filepath = filepath
-        self.lines = self._read_file()
-        self.reference_map = self._parse_methods()
+SCANNER = BraceScanner()
 
-    def _read_file(self):
-        with open(self.filepath, 'r') as f:
-            return f.read().splitlines()
+CLASSIFIER = LineClassifier([
+    # Classes and other type declarations, tried first so records are not methods
+    ('class', r'^\s*(?:(?:public|private|protected|static|final|abstract|sealed|strictfp)\s+)*(?:class|interface|enum|record|@interface)\s+(?P<type>\w+)'),
+    ('method', r'^\s*(?:public|private|protected)?\s*(?:static\s+)?(?:final\s+)?[\w<>\[\]]+\s+(?P<name>\w+)\s*\([^)]*\)\s*(?:throws\s+[\w,\s]+)?\s*\{'),
+], keywords=('{', 'class', 'interface', 'enum', 'record'))
+
+def _type_end(scan, i):
+    """Line closing a type whose header is line i; its `{` may open on a later line"""
+    j = i
+    while j < len(scan.ends) - 1 and scan.ends[j] < 0:
+        j += 1
+    return block_end(scan, j)
+
+class CodeCRISPR(LineEditor):
+    not_found_message = "Java method '{name}' not found."
+    qualifier = '.'
 
     def _parse_methods(self):
-        pattern = re.compile(r'^\s*(public|private|protected)?\s*(static\s+)?(final\s+)?[\w<>\[\]]+\s+(\w+)\s*\([^)]*\)\s*(throws\s+[\w,\s]+)?\s*\{')
         reference_map = {}
+        scan = SCANNER.scan(self.lines)
         i = 0
+        # Enclosing types as (name, end line), innermost last
+        types = []
         while i < len(self.lines):
-            match = pattern.match(self.lines[i])
-            if match:
-                name = match.group(4)
-                start = i
-                brace_count = 0
-                j = i
-                while j < len(self.lines):
-                    line = re.sub(r'"[^"]*"|//.*|/\*.*?\*/', '', self.lines[j])
-                    brace_count += line.count('{')
-                    brace_count -= line.count('}')
-                    if brace_count == 0 and j > i:
-                        break
-                    j += 1
-                end = j
-                reference_map[name] = {'start': start, 'end': end}
+            while types and types[-1][1] < i:
+                types.pop()
+            found = scan.in_code[i] and CLASSIFIER.match(self.lines[i])
+            if found and found[0] == 'class':
+                types.append((found[1]['type'], _type_end(scan, i)))
+                i += 1
+            elif found:
+                name = '.'.join([t for t, _ in types] + [found[1]['name']])
+                end = block_end(scan, i)
+                reference_map[name] = {'start': i, 'end': end}
                 i = end + 1
             else:
                 i += 1
         return reference_map
 
-    def replace_method(self, method_name, new_code):
-        if method_name not in self.reference_map:
-            raise ValueError(f"Java method '{method_name}' not found.")
-        start = self.reference_map[method_name]["start"]
-        end = self.reference_map[method_name]["end"]
-        new_lines = new_code.strip("\n").splitlines()
-        self.lines[start:end+1] = new_lines
-        shift = len(new_lines) - (end - start + 1)
-        for name, bounds in self.reference_map.items():
-            if bounds["start"] > end:
-                bounds["start"] += shift
-                bounds["end"] += shift
-        self.reference_map[method_name]["end"] = start + len(new_lines) - 1
+    _parse = _parse_methods
 
-    def save(self, output_path=None):
-        path = output_path or self.filepath
-        with open(path, "w") as f:
-            f.write("\n".join(self.lines) + "\n")
\ No newline at end of file
+    def _nesting(self, lines):
+        return nesting(SCANNER.scan(lines))
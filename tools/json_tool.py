@@ -1,10 +1,161 @@
 import json
+import re
+from array import array
+
+from .byte_document import ByteDocument
+
+_WS = re.compile(rb'[ \t\r\n]*')
+_STRING = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"')
+_SCALAR = re.compile(rb'-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?|true|false|null')
+# An object key with its colon, and the delimiter after a value, each with
+# the whitespace around them so every step is a single match
+_KEY = re.compile(rb'("[^"\\]*(?:\\.[^"\\]*)*")[ \t\r\n]*:[ \t\r\n]*')
+_DELIMITER = re.compile(rb'[ \t\r\n]*([,\]}])[ \t\r\n]*')
+_STRUCTURAL = re.compile(rb'["\[\]{}]')
+_QUOTE, _COMMA = b'",'
+_OPEN_OBJECT, _CLOSE_OBJECT, _OPEN_ARRAY, _CLOSE_ARRAY = b'{}[]'
+
+
+def _error(pos):
+    return ValueError(f"Invalid JSON at byte {pos}")
+
+
+def _skip_container(buf, pos, end):
+    """Offset just past the object or array opening at pos"""
+    level = 0
+    while True:
+        m = _STRUCTURAL.search(buf, pos, end)
+        if not m:
+            raise _error(end)
+        c = buf[m.start()]
+        if c == _QUOTE:
+            s = _STRING.match(buf, m.start(), end)
+            if not s:
+                raise _error(m.start())
+            pos = s.end()
+            continue
+        pos = m.end()
+        level += 1 if c in (_OPEN_OBJECT, _OPEN_ARRAY) else -1
+        if level == 0:
+            return pos
+
+
+def _key(buf, pos, end, prefix):
+    """Path of the object member whose key starts at pos, and the offset of its value"""
+    m = _KEY.match(buf, pos, end)
+    if not m:
+        raise _error(pos)
+    raw = m.group(1)
+    key = json.loads(raw) if b'\\' in raw else raw[1:-1].decode('utf-8')
+    return (key if prefix is None else f"{prefix}::{key}"), m.end()
+
+
+def scan_value(buf, pos, end, name=None, depth=0, limit=0):
+    """Index the JSON value in buf[pos:end] in one pass
+
+    Returns parallel (names, starts, ends) for name and every nested key and
+    array index in document order, with exclusive end offsets. Paths deeper
+    than limit (0: no limit) are skipped over without being indexed. Raises
+    ValueError on malformed JSON.
+    """
+    names, starts, ends = [], array('q'), array('q')
+    # Open containers: [closer, slot, name, depth, next array index]
+    stack = []
+    pos = _WS.match(buf, pos, end).end()
+    while True:
+        # Parse the value at pos called name
+        slot = None
+        if name is not None and (not limit or depth <= limit):
+            slot = len(names)
+            names.append(name)
+            starts.append(pos)
+            ends.append(pos)
+        c = buf[pos] if pos < end else None
+        if c == _OPEN_OBJECT or c == _OPEN_ARRAY:
+            if limit and depth >= limit:
+                pos = _skip_container(buf, pos, end)
+            else:
+                pos = _WS.match(buf, pos + 1, end).end()
+                if c == _OPEN_OBJECT:
+                    if pos < end and buf[pos] == _CLOSE_OBJECT:
+                        pos += 1
+                    else:
+                        stack.append([_CLOSE_OBJECT, slot, name, depth, None])
+                        name, pos = _key(buf, pos, end, name)
+                        depth += 1
+                        continue
+                elif pos < end and buf[pos] == _CLOSE_ARRAY:
+                    pos += 1
+                else:
+                    stack.append([_CLOSE_ARRAY, slot, name, depth, 1])
+                    name = '0' if name is None else f"{name}::0"
+                    depth += 1
+                    continue
+        else:
+            m = (_STRING if c == _QUOTE else _SCALAR).match(buf, pos, end)
+            if not m:
+                raise _error(pos)
+            pos = m.end()
+        if slot is not None:
+            ends[slot] = pos
+
+        # Close finished containers, then move on to the next member
+        while True:
+            if not stack:
+                pos = _WS.match(buf, pos, end).end()
+                if pos != end:
+                    raise _error(pos)
+                return names, starts, ends
+            m = _DELIMITER.match(buf, pos, end)
+            if not m:
+                raise _error(_WS.match(buf, pos, end).end())
+            frame = stack[-1]
+            c = buf[m.start(1)]
+            if c == _COMMA:
+                pos = m.end()
+                prefix = frame[2]
+                index = frame[4]
+                if index is None:
+                    name, pos = _key(buf, pos, end, prefix)
+                else:
+                    frame[4] = index + 1
+                    name = str(index) if prefix is None else f"{prefix}::{index}"
+                depth = frame[3] + 1
+                break
+            if c != frame[0]:
+                raise _error(m.start(1))
+            pos = m.end(1)
+            stack.pop()
+            if frame[1] is not None:
+                ends[frame[1]] = pos
+
 
 class CodeCRISPR:
-    def __init__(self, filepath):
+    # Streaming mode indexes byte spans and splices edits into the original
+    # bytes; otherwise the whole document is loaded and re-serialized on save
+    streaming = True
+    # Deepest path indexed up front (0: every path); deeper ones on demand
+    index_depth = 0
+    # reference_map spans are byte offsets
+    span_unit = 'bytes'
+
+    def __init__(self, filepath, streaming=None, index_depth=None):
         self.filepath = filepath
-        self.data = self._read_file()
-        self.reference_map = self._map_keys()
+        if streaming is not None:
+            self.streaming = streaming
+        if index_depth is not None:
+            self.index_depth = index_depth
+        if self.streaming:
+            self.reference_map = ByteDocument(filepath, scan_value, self.index_depth)
+        else:
+            self.data = self._read_file()
+            self.reference_map = self._map_keys()
+
+    @classmethod
+    def from_config(cls, filepath, config):
+        return cls(filepath,
+                   streaming=config.getboolean('json', 'streaming', fallback=True),
+                   index_depth=config.getint('json', 'index_depth', fallback=0))
 
     def _read_file(self):
         with open(self.filepath, 'r') as f:
@@ -29,6 +180,10 @@ class CodeCRISPR:
     def replace_method(self, key_path, new_value_str):
         if key_path not in self.reference_map:
             raise ValueError(f"Key path '{key_path}' not found.")
+        if self.streaming:
+            # Reject invalid JSON before anything is spliced in
+            json.loads(new_value_str)
+            return self.reference_map.replace(key_path, new_value_str.strip().encode('utf-8'))
         path = self.reference_map[key_path]
         obj = self.data
         for key in path[:-1]:
@@ -42,5 +197,8 @@ class CodeCRISPR:
 
     def save(self, output_path=None):
         path = output_path or self.filepath
+        if self.streaming:
+            self.reference_map.save(path)
+            return
         with open(path, 'w') as f:
-            json.dump(self.data, f, indent=2)
\ No newline at end of file
+            json.dump(self.data, f, indent=2)
@@ -1,26 +1,27 @@
 import re
 
-class CodeCRISPR:
-    def __init__(self, filepath):
-        self.filepath = filepath
-        self.lines = self._read_file()
-        self.reference_map = self._parse_environments()
+from .line_classifier import LineClassifier
+from .line_editor import LineEditor
 
-    def _read_file(self):
-        with open(self.filepath, 'r') as f:
-            return f.read().splitlines()
+CLASSIFIER = LineClassifier([
+    ('environment', r'^\s*\\begin\{(?P<env>\w+)\}'),
+], keywords=('\\begin',))
+
+class CodeCRISPR(LineEditor):
+    not_found_message = "LaTeX environment block '{name}' not found."
+    keys_by_line = True
 
     def _parse_environments(self):
-        pattern = re.compile(r'^\\s*\\\\begin\\{(\\w+)\\}')
         reference_map = {}
         i = 0
         while i < len(self.lines):
-            match = pattern.match(self.lines[i])
-            if match:
-                env = match.group(1)
+            found = CLASSIFIER.match(self.lines[i])
+            if found:
+                env = found[1]['env']
                 start = i
+                end_pattern = re.compile(r'^\s*\\end\{%s\}' % re.escape(env))
                 while i < len(self.lines):
-                    if re.match(r'^\\s*\\\\end\\{%s\\}' % re.escape(env), self.lines[i]):
+                    if end_pattern.match(self.lines[i]):
                         break
                     i += 1
                 end = i
@@ -29,21 +30,4 @@ class CodeCRISPR:
             i += 1
         return reference_map
 
-    def replace_method(self, name, new_code):
-        if name not in self.reference_map:
-            raise ValueError(f"LaTeX environment block '{name}' not found.")
-        start = self.reference_map[name]['start']
-        end = self.reference_map[name]['end']
-        new_lines = new_code.strip('\\n').splitlines()
-        self.lines[start:end + 1] = new_lines
-        shift = len(new_lines) - (end - start + 1)
-        for k, bounds in self.reference_map.items():
-            if bounds['start'] > end:
-                bounds['start'] += shift
-                bounds['end'] += shift
-        self.reference_map[name]['end'] = start + len(new_lines) - 1
-
-    def save(self, output_path=None):
-        path = output_path or self.filepath
-        with open(path, 'w') as f:
-            f.write('\\n'.join(self.lines) + '\\n')
\ No newline at end of file
+    _parse = _parse_environments
\ No newline at end of file
@@ -0,0 +1,57 @@
+"""
+Combined signature matching for line-based tools
+
+A tool lists the constructs it recognises as ordered (kind, regex) pairs.
+They are compiled into one alternation with a named group per kind, so
+each line is tried against a single regex instead of one per pattern, and
+lines containing none of the tool's keywords are rejected before any
+regex runs.
+"""
+import re
+
+_NAMED_GROUP = re.compile(r'\(\?P<(\w+)>')
+
+
+class LineClassifier:
+    """Match a line against several signature patterns at once
+
+    Patterns are tried in order, as a loop over them would, and the first
+    that matches decides the kind. Capture values with named groups, e.g.
+    `(?P<name>\\w+)`; other groups should be non-capturing. keywords are
+    substrings at least one of which every matching line contains.
+    """
+
+    def __init__(self, patterns, keywords=(), flags=0):
+        # Kept as given, for benchmarks that time the patterns one by one
+        self.patterns = list(patterns)
+        self.flags = flags
+        parts = []
+        for kind, regex in patterns:
+            regex = _NAMED_GROUP.sub(lambda m: f'(?P<{m.group(1)}__{kind}>', regex)
+            parts.append(f'(?P<{kind}>{regex})')
+        self._regex = re.compile('|'.join(parts), flags)
+        self.keywords = tuple(keywords)
+        self._fields = {kind: [] for kind, _ in patterns}
+        for group in self._regex.groupindex:
+            field, _, kind = group.rpartition('__')
+            if field:
+                self._fields[kind].append((group, field))
+
+    def match(self, line):
+        """Return (kind, {field: value}) for the first pattern line matches, or None"""
+        for keyword in self.keywords:
+            if keyword in line:
+                break
+        else:
+            if self.keywords:
+                return None
+        m = self._regex.match(line)
+        if m is None:
+            return None
+        kind = m.lastgroup
+        return kind, {field: m.group(group) for group, field in self._fields[kind]}
+
+    def kind(self, line):
+        """Kind of construct on line, or None"""
+        result = self.match(line)
+        return result[0] if result else None
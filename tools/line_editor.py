@@ -0,0 +1,375 @@
+"""
+Shared base for line-oriented CodeCRISPR tools
+
+Holds the file as a list of lines and keeps the reference map exact after
+every edit by re-scanning only the region around the replaced block, instead
+of shifting offsets and hoping the new code kept the same structure.
+"""
+import os
+from itertools import chain, islice
+
+from . import timings
+from .block_table import AmbiguousNameError, BlockTable
+from .text_buffer import LineBuffer
+
+
+def mmap_threshold(config):
+    """File size in bytes from which line editors map files instead of reading them"""
+    return config.getint('editor', 'mmap_threshold_mb', fallback=64) * 1024 * 1024
+
+
+# Items compared per slice when looking for the common ends of two versions
+AFFIX_CHUNK = 1024
+
+
+def common_affixes(old, new, chunk=AFFIX_CHUNK):
+    """(prefix, suffix): how many leading and trailing items old and new share
+
+    The two never overlap. Items are compared a slice at a time, halving the
+    slice around the first difference, so lists, bytes and line buffers all
+    compare at C speed.
+    """
+    limit = min(len(old), len(new))
+    prefix, step = 0, chunk
+    while prefix < limit:
+        step = min(step, limit - prefix)
+        if old[prefix:prefix + step] == new[prefix:prefix + step]:
+            prefix += step
+        elif step == 1:
+            break
+        else:
+            step //= 2
+    n_old, n_new = len(old), len(new)
+    suffix, step = 0, chunk
+    while suffix < limit - prefix:
+        step = min(step, limit - prefix - suffix)
+        if old[n_old - suffix - step:n_old - suffix] == new[n_new - suffix - step:n_new - suffix]:
+            suffix += step
+        elif step == 1:
+            break
+        else:
+            step //= 2
+    return prefix, suffix
+
+
+def without_blank_tail(lines):
+    """lines without their trailing blank lines
+
+    A block's span runs to the blank lines that separate it from the next
+    one, while a preview of it pasted back usually lacks them; the two read
+    the same.
+    """
+    end = len(lines)
+    while end and not lines[end - 1].strip():
+        end -= 1
+    return lines[:end]
+
+
+def _short(name, qualifier):
+    return name.rsplit(qualifier, 1)[-1] if qualifier else name
+
+
+def _enclosing(prefix, qualifier):
+    """The scope prefix one level out: `a.b.` -> `a.`"""
+    cut = prefix.rfind(qualifier, 0, len(prefix) - len(qualifier))
+    return prefix[:cut + len(qualifier)] if cut >= 0 else ''
+
+
+def _outside(table, name, lo, hi):
+    """Whether a block with the full name already exists outside blocks lo..hi-1"""
+    try:
+        return not lo <= table.index(name, aliases=False) < hi
+    except KeyError:
+        return False
+
+
+class LineEditor:
+    """Base class for tools whose blocks are contiguous line ranges
+
+    Subclasses implement `_parse()` over `self.lines` and may override
+    `not_found_message`, `encoding`, `keys_by_line`, `qualifier`,
+    `_nesting()`, `_closes_enclosing()` and `_resync_start()`.
+    The file is held in a LineBuffer and the map in a BlockTable; parsers
+    run over a sequence of lines (a plain list, unless the file is memory-
+    mapped) and return a plain dictionary.
+    """
+
+    not_found_message = "Function '{name}' not found."
+    encoding = None
+    # Keys of the form `<kind>_<start line>` that change when a block moves
+    keys_by_line = False
+    # Joins an enclosing class, impl or section to a block's own name
+    # (`Parser.parse`); None when names are not scoped
+    qualifier = None
+    # Files of at least this many bytes are memory-mapped (0: never)
+    mmap_threshold = 0
+
+    def __init__(self, filepath, mmap_threshold=None):
+        self.filepath = filepath
+        if mmap_threshold is not None:
+            self.mmap_threshold = mmap_threshold
+        with timings.phase('read'):
+            self.lines = self._read_file()
+        with timings.phase('parse'):
+            self.reference_map = self._parse_lines(self.lines.sequence())
+
+    @classmethod
+    def from_config(cls, filepath, config):
+        return cls(filepath, mmap_threshold=mmap_threshold(config))
+
+    @property
+    def reference_map(self):
+        return self._blocks
+
+    @reference_map.setter
+    def reference_map(self, reference_map):
+        if not isinstance(reference_map, BlockTable):
+            reference_map = BlockTable.from_map(reference_map, self.keys_by_line, self.qualifier)
+        self._blocks = reference_map
+
+    def _read_file(self):
+        if self.mmap_threshold and os.path.getsize(self.filepath) >= self.mmap_threshold:
+            from .mapped_lines import MappedLines, mappable
+            if mappable(self.encoding):
+                try:
+                    return LineBuffer.over(MappedLines(self.filepath, self.encoding))
+                except ValueError:
+                    # Unusual line breaks: split the text the usual way
+                    pass
+        with open(self.filepath, 'r', encoding=self.encoding) as f:
+            return LineBuffer(f.read().splitlines())
+
+    def _parse(self):
+        raise NotImplementedError
+
+    def _parse_lines(self, lines):
+        """Run `_parse()` over a list of lines without touching this editor"""
+        parser = object.__new__(type(self))
+        parser.__dict__.update(self.__dict__)
+        parser.lines = lines
+        return parser._parse()
+
+    def _rekey(self, name, start):
+        """Name for a block that now starts at `start`"""
+        if self.keys_by_line:
+            return f"{name.rsplit('_', 1)[0]}_{start}"
+        return name
+
+    def _nesting(self, lines):
+        """How lines close and open the scopes around them, or None if that is not tracked
+
+        An edit that changes it can move where enclosing scopes end, and so
+        rename blocks anywhere after it; the whole file is parsed again.
+        Brace tools give (scopes closed, scopes left open, ...).
+        """
+        return None
+
+    def _closes_enclosing(self, lines):
+        """Whether lines may close a scope that was already open where they start"""
+        # The first item of _nesting() counts the scopes closed
+        nesting = self._nesting(lines)
+        return nesting is None or nesting[0] > 0
+
+    def _resync_start(self, line):
+        """Earliest line at or before `line` where parsing can restart cleanly"""
+        return line
+
+    def replace_method(self, method_name, new_code):
+        """Replace a block; returns False, changing nothing, if it already reads new_code"""
+        table = self.reference_map
+        try:
+            k = table.index(method_name)
+        except AmbiguousNameError as e:
+            raise ValueError(f"Block {e}; use the qualified name.") from None
+        except KeyError:
+            raise ValueError(self.not_found_message.format(name=method_name)) from None
+        start, end = table.span(k)
+        new_lines = new_code.strip('\n').splitlines()
+        old_lines = self.lines[start:end + 1]
+        if without_blank_tail(old_lines) == without_blank_tail(new_lines):
+            return False
+        self.lines[start:end + 1] = new_lines
+        if self._nesting(old_lines) != self._nesting(new_lines):
+            self.reference_map = self._parse_lines(self.lines.sequence())
+        else:
+            self._reparse_region(k, start, end, len(new_lines) - (end - start + 1))
+        return True
+
+    def _scope_prefix(self, block):
+        """What the scopes enclosing block (start, end, name) add to its name (`Parser.`), or None
+
+        A parse of the block's lines alone names it by itself only, so the
+        rest of its full name comes from scopes opened before it.
+        """
+        start, end, name = block
+        try:
+            found = self._parse_lines(self.lines[start:end + 1])
+        except Exception:
+            return None
+        local = next((n for n, pos in found.items() if pos['start'] == 0), None)
+        if local is None or not name.endswith(local):
+            return None
+        prefix = name[:len(name) - len(local)]
+        return prefix if not prefix or prefix.endswith(self.qualifier) else None
+
+    def _region_start(self, i_lo, scan_hi, sentinel):
+        """(line, prefix): where to re-parse up to scan_hi from, for a region starting at block i_lo
+
+        A region parse sees none of the scopes open where it starts, so
+        the prefix they give the first block is added to every block found.
+        That holds only while none of those scopes closes, which the
+        sentinel confirms. Where one may (the region starts in the last
+        method of a class, or runs to the end of the file), the parse starts
+        instead at the nearest earlier block directly in the scope around
+        it, ahead of the class header, and so on outwards. Returns None when
+        the first block's prefix cannot be told.
+        """
+        table = self.reference_map
+        prefix = self._scope_prefix(table.block(i_lo))
+        if prefix is None:
+            return None
+        lo = table.span(i_lo)[0]
+        while prefix and (sentinel is None or self._closes_enclosing(self.lines[lo:scan_hi + 1])):
+            prefix = _enclosing(prefix, self.qualifier)
+            while i_lo:
+                i_lo -= 1
+                name = table.name_at(i_lo)
+                while prefix and not name.startswith(prefix):
+                    prefix = _enclosing(prefix, self.qualifier)
+                if self.qualifier not in name[len(prefix):]:
+                    break
+            else:
+                return 0, ''
+            lo = table.span(i_lo)[0]
+        return lo, prefix
+
+    def _reparse_region(self, k, start, end, shift, changed=None):
+        """Update the map after block k (lines start..end) was replaced, moving later lines by shift
+
+        The region re-scanned runs from the block before the edit to the end
+        of the block after it, widened so it never cuts through a block.
+        Falls back to a full parse when the result cannot be spliced exactly.
+        changed is the first line that differs, when a reload left block k
+        itself as it was.
+        """
+        table = self.reference_map
+        # Blocks k+1..first_after-1 lay inside the replaced lines and are
+        # stale until the region below replaces them
+        first_after = table.bisect_right(end, k + 1)
+        table.shift_from(first_after, shift)
+
+        # One neighbouring block of context on each side
+        lo = table.span(k - 1)[0] if k else 0
+        hi = end + shift
+        if first_after < len(table):
+            hi = max(hi, table.span(first_after)[1])
+        else:
+            hi = len(self.lines) - 1
+        if table.nested:
+            # Blocks may enclose each other: widen until none straddles an edge
+            outside = [b for i, b in enumerate(table.blocks()) if not k <= i < first_after]
+            changed = True
+            while changed:
+                changed = False
+                for b_start, b_end, _ in outside:
+                    if b_start < lo <= b_end:
+                        lo, changed = b_start, True
+                    if b_start <= hi < b_end:
+                        hi, changed = b_end, True
+        lo = self._resync_start(lo)
+        i_lo = table.bisect_left(lo, 0, k)
+        i_hi = table.bisect_right(hi, first_after)
+
+        # The first untouched block after the region is scanned as well and
+        # must come out unchanged, proving the parser state has resynced
+        # (indentation, enclosing impl/class) before the kept blocks resume
+        sentinel = table.block(i_hi) if i_hi < len(table) else None
+        if sentinel is None and self.qualifier:
+            # Nothing after the region proves the scopes closed where they
+            # did, and headers after the last block may now be named apart
+            hi = len(self.lines) - 1
+        scan_hi = sentinel[1] if sentinel else hi
+
+        prefix = ''
+        context = self._region_start(i_lo, scan_hi, sentinel) if lo and self.qualifier else (lo, '')
+        if context is None:
+            found = None
+        else:
+            lo, prefix = context
+            i_lo = table.bisect_left(lo, 0, k)
+            try:
+                found = self._parse_lines(self.lines[lo:scan_hi + 1])
+            except Exception:
+                found = None
+
+        spliced = []
+        if found is not None:
+            resynced = sentinel is None
+            # Blocks wholly before the edit must come out as they were, or
+            # the restart point lacked context (an enclosing scope) they need
+            changed = start if changed is None else changed
+            before = {b for b in table.blocks(i_lo, k + 1) if b[1] < changed}
+            for name, pos in found.items():
+                b_start, b_end = pos['start'] + lo, pos['end'] + lo
+                name = self._rekey(prefix + name, b_start)
+                if b_start > hi and (b_start, b_end, name) == sentinel:
+                    resynced = True
+                    continue
+                if b_end < changed and (b_start, b_end, name) not in before:
+                    found = None
+                    break
+                # A block running off the region, shadowing a name outside it
+                # or replacing the sentinel depends on text we did not re-scan
+                if b_end > hi or (not self.keys_by_line and _outside(table, name, i_lo, i_hi)):
+                    found = None
+                    break
+                spliced.append((b_start, b_end, name))
+            if found is not None and (not resynced or not before.issubset(spliced)):
+                found = None
+
+        if found is not None and not self.keys_by_line:
+            # A name that disappeared may have been hiding a duplicate
+            # definition elsewhere in the file, which must now resurface
+            spliced_names = {n for _, _, n in spliced}
+            vanished = {_short(table.name_at(i), self.qualifier) for i in range(i_lo, i_hi)
+                        if table.name_at(i) not in spliced_names}
+            if vanished:
+                for line in chain(islice(self.lines, lo), islice(self.lines, hi + 1, None)):
+                    if any(v in line for v in vanished):
+                        found = None
+                        break
+
+        if found is None:
+            self.reference_map = self._parse_lines(self.lines.sequence())
+            return
+
+        spliced.sort()
+        table.replace(i_lo, i_hi, spliced)
+
+    def reload(self):
+        """Re-read the file after it changed on disk, re-parsing only around the change
+
+        Returns (first, last, shift): the old lines first..last were replaced
+        and later lines moved by shift. Returns None if the content is the same.
+        """
+        old, new = self.lines, self._read_file()
+        prefix, suffix = common_affixes(old, new)
+        if prefix == len(old) == len(new):
+            return None
+        first, last = prefix, len(old) - suffix - 1
+        shift = len(new) - len(old)
+        self.lines = new
+        table = self.reference_map
+        if not len(table) or self._nesting(old[first:last + 1]) != self._nesting(new[first:last + shift + 1]):
+            self.reference_map = self._parse_lines(self.lines.sequence())
+            return first, last, shift
+        # Re-parse as if the block holding (or preceding) the change was replaced
+        k = max(table.bisect_right(first) - 1, 0)
+        start, end = table.span(k)
+        self._reparse_region(k, min(first, start), max(last, end), shift, first)
+        return first, last, shift
+
+    def save(self, output_path=None):
+        # Loads tempfile; read-only runs never get here
+        from .atomic_write import atomic_write
+        atomic_write(output_path or self.filepath, self.lines.write_to, encoding=self.encoding)
@@ -0,0 +1,186 @@
+"""
+Persistent reference-map cache for CodeCRISPR
+
+Stores each file's reference map under ~/.codecrispr/cache so repeated
+inspections skip reading and parsing the source. Entries are keyed by the
+file's absolute path and validated against its size, mtime_ns and a content
+hash, plus a stamp of the installed tools so parser changes invalidate them.
+"""
+import json
+import os
+
+try:
+    # hashlib loads OpenSSL (a few ms at startup) only to offer the same
+    # built-in blake2b; shell completion runs a lookup on every TAB press
+    from _blake2 import blake2b
+except ImportError:
+    from hashlib import blake2b
+
+# Bump when the on-disk entry layout changes
+CACHE_FORMAT = 2
+
+_tools_stamp = None
+
+
+def tools_stamp():
+    """Fingerprint of the parser sources; any tool change invalidates the cache"""
+    global _tools_stamp
+    if _tools_stamp is None:
+        tools_dir = os.path.dirname(os.path.abspath(__file__))
+        digest = blake2b(str(CACHE_FORMAT).encode(), digest_size=8)
+        if os.path.isdir(tools_dir):
+            for name in sorted(os.listdir(tools_dir)):
+                if name.endswith('.py'):
+                    st = os.stat(os.path.join(tools_dir, name))
+                    digest.update(f"{name}:{st.st_size}:{st.st_mtime_ns};".encode())
+        else:
+            # Running from a zipapp: the archive itself identifies the tools
+            archive = tools_dir
+            while archive and not os.path.isfile(archive):
+                archive = os.path.dirname(archive)
+            st = os.stat(archive)
+            digest.update(f"{archive}:{st.st_size}:{st.st_mtime_ns};".encode())
+        _tools_stamp = digest.hexdigest()
+    return _tools_stamp
+
+
+def _hash_open(f):
+    digest = blake2b(digest_size=16)
+    for chunk in iter(lambda: f.read(1 << 20), b''):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def content_hash(filepath):
+    with open(filepath, 'rb') as f:
+        return _hash_open(f)
+
+
+def _same_file(a, b):
+    return (a.st_ino, a.st_size, a.st_mtime_ns) == (b.st_ino, b.st_size, b.st_mtime_ns)
+
+
+class MapCache:
+    """Size-bounded LRU of reference maps stored as one JSON file per source file"""
+
+    def __init__(self, directory='~/.codecrispr/cache', max_bytes=64 * 1024 * 1024):
+        self.directory = os.path.expanduser(directory)
+        self.max_bytes = max_bytes
+
+    @classmethod
+    def from_config(cls, config):
+        """Return a MapCache for the given config, or None when caching is disabled"""
+        if not config.getboolean('cache', 'enabled', fallback=True):
+            return None
+        directory = config.get('cache', 'directory', fallback='~/.codecrispr/cache')
+        max_mb = config.getfloat('cache', 'max_size_mb', fallback=64)
+        return cls(directory, int(max_mb * 1024 * 1024))
+
+    def _entry_path(self, filepath):
+        key = blake2b(os.path.abspath(filepath).encode('utf-8'), digest_size=16).hexdigest()
+        return os.path.join(self.directory, f"{key}.json")
+
+    def lookup(self, filepath, tool_name):
+        """Return the cached reference map for filepath, or None if missing or stale"""
+        entry_path = self._entry_path(filepath)
+        try:
+            with open(entry_path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            st = os.stat(filepath)
+        except (OSError, ValueError):
+            return None
+
+        if (entry.get('path') != os.path.abspath(filepath)
+                or entry.get('tool') != tool_name
+                or entry.get('tools_stamp') != tools_stamp()
+                or entry.get('size') != st.st_size):
+            return None
+
+        if entry.get('mtime_ns') != st.st_mtime_ns:
+            # Touched but possibly unchanged (checkout, formatter no-op): compare content
+            try:
+                if content_hash(filepath) != entry.get('hash'):
+                    return None
+            except OSError:
+                return None
+            entry['mtime_ns'] = st.st_mtime_ns
+            self._write_entry(entry_path, entry)
+        else:
+            # Mark as recently used for LRU eviction
+            try:
+                os.utime(entry_path)
+            except OSError:
+                pass
+
+        return entry['reference_map']
+
+    def store(self, filepath, tool_name, reference_map, hashes=None, before=None):
+        """Record a freshly parsed reference map; failures are silently ignored
+
+        hashes (name -> block content hash) are stored in each block's entry.
+        before is the os.stat() of filepath taken before it was read for
+        parsing. The entry is only stored if the file hashed here is still
+        that one, so a write racing the parse cannot pair its content with
+        a map of the old text.
+        """
+        try:
+            with open(filepath, 'rb') as f:
+                digest = _hash_open(f)
+                st = os.fstat(f.fileno())
+            if before is not None and not _same_file(before, st):
+                return
+            entry = {
+                'path': os.path.abspath(filepath),
+                'size': st.st_size,
+                'mtime_ns': st.st_mtime_ns,
+                'hash': digest,
+                'tool': tool_name,
+                'tools_stamp': tools_stamp(),
+                'reference_map': {name: dict(pos, hash=(hashes or {}).get(name))
+                                  for name, pos in reference_map.items()}
+            }
+            os.makedirs(self.directory, exist_ok=True)
+            self._write_entry(self._entry_path(filepath), entry)
+            self.evict()
+        except (OSError, TypeError, ValueError):
+            pass
+
+    def _write_entry(self, entry_path, entry):
+        # Unique per process and per live entry, so concurrent threads never share one
+        tmp_path = f"{entry_path}.{os.getpid()}.{id(entry)}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, separators=(',', ':'))
+            os.replace(tmp_path, entry_path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes"""
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for item in it:
+                if item.name.endswith('.json'):
+                    st = item.stat()
+                    entries.append((st.st_mtime_ns, st.st_size, item.path))
+                    total += st.st_size
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def clear(self):
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                os.remove(os.path.join(self.directory, name))
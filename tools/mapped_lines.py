@@ -0,0 +1,160 @@
+"""
+Memory-mapped line access for large files
+
+Maps the file instead of reading it and records where every line starts in
+an array('Q'), built in one pass over the bytes. Lines are decoded only when
+they are read, so listing the blocks of a multi-gigabyte file never holds
+its text in memory; a line is a Python string only while something uses it.
+"""
+import codecs
+import locale
+import mmap
+import os
+from array import array
+from bisect import bisect_right
+from itertools import accumulate, repeat
+from operator import add
+
+# Bytes indexed per step; a step always ends just after a newline
+CHUNK_BYTES = 1 << 20
+# Lines decoded together when one of them is read
+WINDOW_LINES = 512
+
+# Other line breaks str.splitlines() honours, in UTF-8 (a lone \r is checked
+# separately). A file containing any of them is read normally so its lines
+# split exactly the same
+_OTHER_BREAKS = (b'\x0b', b'\x0c', b'\x1c', b'\x1d', b'\x1e', b'\xc2\x85', b'\xe2\x80\xa8', b'\xe2\x80\xa9')
+
+
+def mappable(encoding):
+    """Whether files in encoding can be split into lines at their newline bytes"""
+    name = codecs.lookup(encoding or locale.getpreferredencoding(False)).name
+    return name in ('utf-8', 'ascii')
+
+
+class MappedLines:
+    """Read-only sequence of the lines of a file, as `f.read().splitlines()` gives them
+
+    Supports len(), iteration, and integer and slice reads (slices return
+    plain lists). Raises ValueError for files with line breaks other than
+    \\n and \\r\\n.
+    """
+
+    def __init__(self, filepath, encoding=None):
+        self.filepath = filepath
+        self.encoding = encoding or locale.getpreferredencoding(False)
+        with open(filepath, 'rb') as f:
+            if os.fstat(f.fileno()).st_size:
+                self._buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self._buf = b''
+        self._starts, self._crlf = self._index(self._buf)
+        # End of the last line's text
+        self._end = len(self._buf) - (self._buf[-1:] == b'\n')
+        # (first line, decoded lines) of the window read last
+        self._window = (0, [])
+
+    @staticmethod
+    def _index(buf):
+        """Return (line starts, whether any line ends in \\r\\n) for buf"""
+        starts = array('Q', [0] if buf else [])
+        crlf = False
+        pos, size = 0, len(buf)
+        while pos < size:
+            stop = buf.find(b'\n', min(pos + CHUNK_BYTES, size) - 1)
+            stop = size if stop < 0 else stop + 1
+            chunk = buf[pos:stop]
+            # Substring tests run at memchr speed, unlike a regex search
+            if b'\r' in chunk:
+                if chunk.count(b'\r') != chunk.count(b'\r\n'):
+                    raise ValueError("File has line breaks other than \\n and \\r\\n")
+                crlf = True
+            if any(brk in chunk for brk in _OTHER_BREAKS):
+                raise ValueError("File has line breaks other than \\n and \\r\\n")
+            # Each newline starts a line one byte after it
+            parts = chunk.split(b'\n')
+            offsets = accumulate(map(add, map(len, parts[:-1]), repeat(1)), initial=pos)
+            next(offsets)
+            starts.extend(offsets)
+            pos = stop
+        if starts and starts[-1] == size:
+            starts.pop()
+        return starts, crlf
+
+    def __len__(self):
+        return len(self._starts)
+
+    def __repr__(self):
+        return f"MappedLines({len(self._starts)} lines of {len(self._buf)} bytes)"
+
+    def _decode(self, start, stop):
+        """Lines start..stop-1, decoded together"""
+        starts = self._starts
+        end = starts[stop] - 1 if stop < len(starts) else self._end
+        lines = self._buf[starts[start]:end].decode(self.encoding).split('\n')
+        if self._crlf:
+            lines = [line[:-1] if line.endswith('\r') else line for line in lines]
+        return lines
+
+    def __getitem__(self, key):
+        # Parsers read lines mostly in order, so the lines around the last
+        # one read are decoded together and kept for the reads that follow
+        first, lines = self._window
+        if isinstance(key, int) and first <= key < first + len(lines):
+            return lines[key - first]
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self._starts))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return self._decode(start, stop) if start < stop else []
+        if key < 0:
+            key += len(self._starts)
+        if not 0 <= key < len(self._starts):
+            raise IndexError("MappedLines index out of range")
+        first = key - key % WINDOW_LINES
+        lines = self._decode(first, min(first + WINDOW_LINES, len(self._starts)))
+        self._window = (first, lines)
+        return lines[key - first]
+
+    def __iter__(self):
+        n = len(self._starts)
+        for start in range(0, n, WINDOW_LINES):
+            yield from self._decode(start, min(start + WINDOW_LINES, n))
+
+    def line_of(self, offset):
+        """Index of the line holding byte offset"""
+        return bisect_right(self._starts, offset) - 1
+
+    def line_edits(self, splices):
+        """Turn byte splices of the file into whole-line edits
+
+        splices are sorted, disjoint (start, end, data) triples replacing
+        bytes start..end-1 with data. Returns ([(first line, old lines, new
+        lines), ...], whether the spliced file ends with a line break);
+        splices that touch the same line share one edit.
+        """
+        starts, buf = self._starts, self._buf
+        edits = []
+        newline = not buf or buf[-1:] == b'\n'
+        k = 0
+        while k < len(splices):
+            first = self.line_of(splices[k][0])
+            last = self.line_of(max(splices[k][0], splices[k][1] - 1))
+            group = [splices[k]]
+            k += 1
+            while k < len(splices) and self.line_of(splices[k][0]) <= last:
+                last = self.line_of(max(splices[k][0], splices[k][1] - 1))
+                group.append(splices[k])
+                k += 1
+            lo = starts[first]
+            hi = starts[last + 1] if last + 1 < len(starts) else len(buf)
+            parts, pos = [], lo
+            for start, end, data in group:
+                parts += [buf[pos:start], data]
+                pos = end
+            parts.append(buf[pos:hi])
+            data = b''.join(parts)
+            edits.append((first, self[first:last + 1], data.decode(self.encoding).splitlines()))
+            if hi == len(buf):
+                newline = not data or data.endswith(b'\n')
+        return edits, newline
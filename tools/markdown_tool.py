@@ -1,52 +1,74 @@
-import re
+from .line_classifier import LineClassifier
+from .line_editor import LineEditor
 
-class CodeCRISPR:
-    def __init__(self, filepath):
-        self.filepath = filepath
-        self.lines = self._read_file()
-        self.reference_map = self._parse_sections()
+CLASSIFIER = LineClassifier([
+    ('heading', r'^(?P<level>#+)\s+(?P<title>.*\S.*?)\s*$'),
+], keywords=('#',))
 
-    def _read_file(self):
-        with open(self.filepath, "r", encoding="utf-8") as f:
-            return f.read().splitlines()
+def _headings(lines):
+    """([(title, level, line) for each heading], fence): fence is set if lines end inside a fenced code block"""
+    headings = []
+    # `#` lines inside fenced code blocks are not headings
+    fence = None
+
+    for i, line in enumerate(lines):
+        if '`' in line or '~' in line:
+            stripped = line.lstrip()
+            if stripped.startswith(('```', '~~~')):
+                if fence is None:
+                    fence = stripped[:3]
+                elif stripped.startswith(fence):
+                    fence = None
+                continue
+        if fence is not None:
+            continue
+        found = CLASSIFIER.match(line)
+        if found:
+            level = len(found[1]['level'])
+            title = found[1]['title'].strip()
+            headings.append((title, level, i))
+    return headings, fence
+
+class CodeCRISPR(LineEditor):
+    not_found_message = "Section heading '{name}' not found."
+    encoding = 'utf-8'
+    # Nested sections are named after their parents: `Install > Linux`
+    qualifier = ' > '
 
     def _parse_sections(self):
         reference_map = {}
-        pattern = re.compile(r'^(#+)\s+(.*\S.*?)\s*$')
-        headings = []
-
-        for i, line in enumerate(self.lines):
-            match = pattern.match(line)
-            if match:
-                level = len(match.group(1))
-                title = match.group(2).strip()
-                headings.append((title, level, i))
+        headings, _ = _headings(self.lines)
 
+        # Enclosing headings as (level, title), outermost first
+        parents = []
         for idx, (title, level, start) in enumerate(headings):
             if idx + 1 < len(headings):
                 next_start = headings[idx + 1][2]
                 end = next_start - 1
             else:
                 end = len(self.lines) - 1
-            reference_map[title] = {'start': start, 'end': end}
+            while parents and parents[-1][0] >= level:
+                parents.pop()
+            name = ' > '.join([t for _, t in parents] + [title])
+            reference_map[name] = {'start': start, 'end': end}
+            parents.append((level, title))
 
         return reference_map
 
-    def replace_method(self, section_title, new_code):
-        if section_title not in self.reference_map:
-            raise ValueError(f"Section heading '{section_title}' not found.")
-        start = self.reference_map[section_title]['start']
-        end = self.reference_map[section_title]['end']
-        new_lines = new_code.strip('\n').splitlines()
-        self.lines[start:end + 1] = new_lines
-        shift = len(new_lines) - (end - start + 1)
-        for k, v in self.reference_map.items():
-            if v['start'] > end:
-                v['start'] += shift
-                v['end'] += shift
-        self.reference_map[section_title]['end'] = start + len(new_lines) - 1
-
-    def save(self, output_path=None):
-        path = output_path or self.filepath
-        with open(path, "w", encoding="utf-8") as f:
-            f.write("\n".join(self.lines) + "\n")
\ No newline at end of file
+    _parse = _parse_sections
+
+    def _nesting(self, lines):
+        # Sections after lines lose the parents at or below their shallowest
+        # heading and gain the ones they leave open
+        headings, fence = _headings(lines)
+        parents = []
+        for title, level, _ in headings:
+            while parents and parents[-1][0] >= level:
+                parents.pop()
+            parents.append((level, title))
+        return min((level for _, level, _ in headings), default=None), parents, fence
+
+    def _closes_enclosing(self, lines):
+        # A heading above the first one's level may end its parent section
+        levels = [level for _, level, _ in _headings(lines)[0]]
+        return any(level < levels[0] for level in levels[1:])
@@ -1,26 +1,27 @@
 import re
 
-class CodeCRISPR:
-    def __init__(self, filepath):
-        self.filepath = filepath
-        self.lines = self._read_file()
-        self.reference_map = self._parse_functions()
+from .line_classifier import LineClassifier
+from .line_editor import LineEditor
 
-    def _read_file(self):
-        with open(self.filepath, "r") as f:
-            return f.read().splitlines()
+CLASSIFIER = LineClassifier([
+    ('function', r'^\s*function\s+(?:\[.*?\]\s*=)?\s*(?P<name>\w+)\s*\('),
+], keywords=('function',))
+
+END = re.compile(r'^\s*end\b')
+
+class CodeCRISPR(LineEditor):
+    not_found_message = "MATLAB function '{name}' not found."
 
     def _parse_functions(self):
-        pattern = re.compile(r'^\s*function\s+(?:\[.*?\]\s*=)?\s*(\w+)\s*\(')
         reference_map = {}
         i = 0
         while i < len(self.lines):
-            match = pattern.match(self.lines[i])
-            if match:
-                name = match.group(1)
+            found = CLASSIFIER.match(self.lines[i])
+            if found:
+                name = found[1]['name']
                 start = i
                 while i < len(self.lines):
-                    if re.match(r'^\s*end\b', self.lines[i]):
+                    if END.match(self.lines[i]):
                         break
                     i += 1
                 end = i
@@ -28,21 +29,4 @@ class CodeCRISPR:
             i += 1
         return reference_map
 
-    def replace_method(self, method_name, new_code):
-        if method_name not in self.reference_map:
-            raise ValueError(f"MATLAB function '{method_name}' not found.")
-        start = self.reference_map[method_name]["start"]
-        end = self.reference_map[method_name]["end"]
-        new_lines = new_code.strip("\n").splitlines()
-        self.lines[start:end+1] = new_lines
-        shift = len(new_lines) - (end - start + 1)
-        for name, pos in self.reference_map.items():
-            if pos["start"] > end:
-                pos["start"] += shift
-                pos["end"] += shift
-        self.reference_map[method_name]["end"] = start + len(new_lines) - 1
-
-    def save(self, output_path=None):
-        path = output_path or self.filepath
-        with open(path, "w") as f:
-            f.write("\n".join(self.lines) + "\n")
\ No newline at end of file
+    _parse = _parse_functions
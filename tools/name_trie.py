@@ -0,0 +1,134 @@
+"""
+Prefix tree of block names for CodeCRISPR
+
+A radix tree: each edge holds a run of characters, so a file's names share
+their common prefixes (`Parser.`, `test_`) and a lookup walks one edge per
+distinct run instead of comparing against every name. A prefix query costs
+O(k) in the length of the prefix plus the size of the answer, however many
+blocks the file has.
+
+    trie = NameTrie()
+    trie.add('Parser.parse', 'Parser.parse')
+    trie.add('parse', 'Parser.parse')           # short-name alias
+    trie.prefix('pars')                         # ['Parser.parse']
+    trie.glob('Parser.*e')                      # ['Parser.parse']
+"""
+from fnmatch import fnmatchcase
+
+# Characters that make a pattern a glob rather than a plain prefix
+WILDCARDS = '*?['
+
+
+class _Node:
+    __slots__ = ('edges', 'values')
+
+    def __init__(self):
+        # First character of an edge -> [label, child]
+        self.edges = {}
+        self.values = None
+
+
+class NameTrie:
+    """Maps string keys to lists of values and answers prefix and glob queries"""
+
+    def __init__(self, items=()):
+        self.root = _Node()
+        for key, value in items:
+            self.add(key, value)
+
+    def add(self, key, value):
+        node = self.root
+        pos = 0
+        while pos < len(key):
+            edge = node.edges.get(key[pos])
+            if edge is None:
+                child = _Node()
+                node.edges[key[pos]] = [key[pos:], child]
+                node = child
+                break
+            label, child = edge
+            common = _common_length(label, key, pos)
+            if common < len(label):
+                # Split the edge where key leaves it
+                middle = _Node()
+                middle.edges[label[common]] = [label[common:], child]
+                edge[0], edge[1] = label[:common], middle
+                child = middle
+            node = child
+            pos += common
+        if node.values is None:
+            node.values = []
+        node.values.append(value)
+
+    def _walk(self, node, text):
+        """Yield (key, values) for every key at or below node"""
+        stack = [(node, text)]
+        while stack:
+            node, text = stack.pop()
+            if node.values:
+                yield text, node.values
+            for label, child in node.edges.values():
+                stack.append((child, text + label))
+
+    def items(self, prefix=''):
+        """(key, values) pairs for every key that starts with prefix"""
+        found = self._locate(prefix)
+        return [] if found is None else list(self._walk(*found))
+
+    def _locate(self, prefix):
+        node = self.root
+        pos = 0
+        while pos < len(prefix):
+            edge = node.edges.get(prefix[pos])
+            if edge is None:
+                return None
+            label, child = edge
+            common = _common_length(label, prefix, pos)
+            if common < len(label) and pos + common < len(prefix):
+                return None
+            # Either the edge is used up or prefix ends inside it
+            if pos + common == len(prefix):
+                return child, prefix[:pos] + label
+            node = child
+            pos += len(label)
+        return node, prefix
+
+    def get(self, key):
+        """Values stored under exactly key, or an empty list"""
+        found = self._locate(key)
+        if found is None or found[1] != key:
+            return []
+        return list(found[0].values or ())
+
+    def prefix(self, prefix):
+        """Distinct values of every key starting with prefix, in no set order"""
+        return _unique(values for _, values in self.items(prefix))
+
+    def glob(self, pattern):
+        """Distinct values of every key matching an fnmatch-style pattern
+
+        The literal text before the first wildcard is looked up in the tree,
+        so only keys under that prefix are matched against the pattern.
+        """
+        cut = min((i for i, c in enumerate(pattern) if c in WILDCARDS), default=len(pattern))
+        if cut == len(pattern):
+            return self.get(pattern)
+        return _unique(values for key, values in self.items(pattern[:cut])
+                       if fnmatchcase(key, pattern))
+
+
+def _common_length(label, key, pos):
+    """How many leading characters of label match key from pos on"""
+    n = min(len(label), len(key) - pos)
+    i = 0
+    while i < n and label[i] == key[pos + i]:
+        i += 1
+    return i
+
+
+def _unique(groups):
+    seen = {}
+    for values in groups:
+        for value in values:
+            seen.setdefault(value, None)
+    return list(seen)
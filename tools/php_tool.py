@@ -1,94 +1,71 @@
-import re
+from .brace_scanner import BraceScanner, block_end, nesting
+from .line_classifier import LineClassifier
+from .line_editor import LineEditor
 
-class CodeCRISPR:
-    def __init__(self, filepath):
-        self.filepath = filepath
-        self.lines = self._read_file()
-        self.reference_map = self._parse_methods()
+SCANNER = BraceScanner(line_comments=('//', '#'))
 
-    def _read_file(self):
-        with open(self.filepath, 'r') as f:
-            return f.read().splitlines()
+# Every pattern contains a keyword: a type, `function` or `fn`
+CLASSIFIER = LineClassifier([
+    # Classes, interfaces, traits and enums
+    ('class', r'^\s*(?:(?:abstract|final|readonly)\s+)*(?:class|interface|trait|enum)\s+(?P<type>\w+)'),
+    # Regular and static methods with various modifiers
+    ('method', r'^\s*(?:(?:public|protected|private)\s+)?(?:static\s+)?(?:final\s+)?(?:abstract\s+)?function\s+(?P<name>\w+)\s*\(.*?\)(?:\s*:\s*\??\w+)?(?:\s*\{|;)'),
+    # Magic methods (__construct, __destruct, etc.)
+    ('magic', r'^\s*(?:(?:public|protected|private)\s+)?function\s+(?P<name>__\w+)\s*\(.*?\)(?:\s*:\s*\??\w+)?(?:\s*\{|;)'),
+    # Anonymous functions assigned to variables
+    ('closure', r'^\s*\$(?P<name>\w+)\s*=\s*function\s*\(.*?\)(?:\s*use\s*\(.*?\))?\s*\{'),
+    # Arrow functions (PHP 7.4+)
+    ('arrow', r'^\s*\$(?P<name>\w+)\s*=\s*fn\s*\(.*?\)\s*=>\s*[^;]+;'),
+], keywords=('function', 'fn', 'class', 'interface', 'trait', 'enum'))
+
+def _type_end(scan, i):
+    """Line closing a type whose header is line i; its `{` may open on a later line"""
+    j = i
+    while j < len(scan.ends) - 1 and scan.ends[j] < 0:
+        j += 1
+    return block_end(scan, j)
+
+class CodeCRISPR(LineEditor):
+    not_found_message = "Function '{name}' not found."
+    qualifier = '::'
 
     def _parse_methods(self):
-        # Enhanced patterns for PHP functions and methods
-        patterns = [
-            # Regular and static methods with various modifiers
-            re.compile(r'^\s*(?:(?:public|protected|private)\s+)?(?:static\s+)?(?:final\s+)?(?:abstract\s+)?function\s+(\w+)\s*\(.*?\)(?:\s*:\s*\??\w+)?(?:\s*\{|;)'),
-            # Magic methods (__construct, __destruct, etc.)
-            re.compile(r'^\s*(?:(?:public|protected|private)\s+)?function\s+(__\w+)\s*\(.*?\)(?:\s*:\s*\??\w+)?(?:\s*\{|;)'),
-            # Anonymous functions assigned to variables
-            re.compile(r'^\s*\$(\w+)\s*=\s*function\s*\(.*?\)(?:\s*use\s*\(.*?\))?\s*\{'),
-            # Arrow functions (PHP 7.4+)
-            re.compile(r'^\s*\$(\w+)\s*=\s*fn\s*\(.*?\)\s*=>\s*[^;]+;'),
-        ]
-        
         reference_map = {}
+        scan = SCANNER.scan(self.lines)
         i = 0
+        # Enclosing types as (name, end line), innermost last
+        types = []
         
         while i < len(self.lines):
+            while types and types[-1][1] < i:
+                types.pop()
             line = self.lines[i]
+            found = scan.in_code[i] and CLASSIFIER.match(line)
+            if not found:
+                i += 1
+                continue
+            if found[0] == 'class':
+                types.append((found[1]['type'], _type_end(scan, i)))
+                i += 1
+                continue
+            
+            # Methods are named Class::method, as PHP itself writes them
+            name = '::'.join([t for t, _ in types] + [found[1]['name']])
             
-            # Match functions and methods
-            for pattern in patterns:
-                match = pattern.match(line)
-                if match:
-                    name = match.group(1)
-                    
-                    # Check if it's an abstract method (ends with ;)
-                    if line.rstrip().endswith(';'):
-                        reference_map[name] = {"start": i, "end": i}
-                        i += 1
-                        break
-                    
-                    # For arrow functions (single line)
-                    if 'fn' in line and '=>' in line:
-                        reference_map[name] = {"start": i, "end": i}
-                        i += 1
-                        break
-                    
-                    # Regular functions/methods with body
-                    start = i
-                    brace_count = 0
-                    j = i
-                    
-                    # Count braces to find the end
-                    while j < len(self.lines):
-                        # Skip string literals
-                        clean_line = re.sub(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'', '', self.lines[j])
-                        # Skip comments
-                        clean_line = re.sub(r'//.*$|#.*$|/\*.*?\*/', '', clean_line)
-                        
-                        brace_count += clean_line.count('{')
-                        brace_count -= clean_line.count('}')
-                        if brace_count == 0 and j > i:
-                            break
-                        j += 1
-                    
-                    end = j
-                    reference_map[name] = {"start": start, "end": end}
-                    i = end + 1
-                    break
-            else:
+            # Abstract methods (ending with ;) and arrow functions are one line
+            if line.rstrip().endswith(';') or ('fn' in line and '=>' in line):
+                reference_map[name] = {"start": i, "end": i}
                 i += 1
+                continue
+            
+            # Regular functions/methods with body
+            end = block_end(scan, i)
+            reference_map[name] = {"start": i, "end": end}
+            i = end + 1
         
         return reference_map
 
-    def replace_method(self, method_name, new_code):
-        if method_name not in self.reference_map:
-            raise ValueError(f"Function '{method_name}' not found.")
-        start = self.reference_map[method_name]["start"]
-        end = self.reference_map[method_name]["end"]
-        new_lines = new_code.strip('\n').splitlines()
-        self.lines[start:end+1] = new_lines
-        shift = len(new_lines) - (end - start + 1)
-        for name, pos in self.reference_map.items():
-            if pos["start"] > end:
-                pos["start"] += shift
-                pos["end"] += shift
-        self.reference_map[method_name]["end"] = start + len(new_lines) - 1
+    _parse = _parse_methods
 
-    def save(self, output_path=None):
-        path = output_path or self.filepath
-        with open(path, 'w') as f:
-            f.write('\n'.join(self.lines) + '\n')
\ No newline at end of file
+    def _nesting(self, lines):
+        return nesting(SCANNER.scan(lines))
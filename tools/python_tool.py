@@ -1,93 +1,89 @@
-import re
+from .line_classifier import LineClassifier
+from .line_editor import LineEditor
 
-class CodeCRISPR:
-    def __init__(self, filepath):
-        self.filepath = filepath
-        self.lines = self._read_file()
-        self.reference_map = self._parse_methods()
+# Decorators, definitions and class headers each contain one of the keywords
+CLASSIFIER = LineClassifier([
+    ('decorator', r"^\s*@"),
+    # Regular and async functions
+    ('function', r"^\s*(?:async\s+)?def\s+(?P<name>\w+)\s*\(.*?\):"),
+    ('class', r"^\s*class\s+(?P<name>\w+)"),
+], keywords=('@', 'def', 'class'))
 
-    def _read_file(self):
-        with open(self.filepath, 'r') as f:
-            return f.read().splitlines()
+def _code_indent(line):
+    """Indentation of a line of code, or None for blank and comment lines"""
+    stripped = line.lstrip()
+    if not stripped or stripped[0] == '#':
+        return None
+    return len(line) - len(stripped)
+
+class CodeCRISPR(LineEditor):
+    not_found_message = "Function '{name}' not found."
+    qualifier = '.'
 
     def _parse_methods(self):
-        # Enhanced patterns for Python functions and methods
-        patterns = [
-            # Regular and async functions
-            re.compile(r"^\s*(async\s+)?def\s+(\w+)\s*\(.*?\):"),
-            # Class methods with decorators (staticmethod, classmethod, property)
-            re.compile(r"^\s*@(staticmethod|classmethod|property)\s*$"),
-            # Custom decorators
-            re.compile(r"^\s*@\w+(?:\.\w+)*(?:\(.*?\))?\s*$"),
-        ]
-        
         reference_map = {}
         i = 0
-        in_class = False
-        class_indent = 0
+        # Enclosing classes as (indent, name), innermost last
+        classes = []
         
         while i < len(self.lines):
             line = self.lines[i]
+            kind = CLASSIFIER.kind(line)
             
-            # Track class context
-            if re.match(r"^\s*class\s+\w+", line):
-                in_class = True
-                class_indent = len(line) - len(line.lstrip())
-            elif in_class and line.strip() and len(line) - len(line.lstrip()) <= class_indent:
-                if not re.match(r"^\s*def\s+", line) and not re.match(r"^\s*@", line):
-                    in_class = False
+            # Track class context: code at or left of a class header ends it
+            indent = _code_indent(line)
+            if indent is not None:
+                while classes and classes[-1][0] >= indent:
+                    classes.pop()
+            if kind == 'class':
+                found = CLASSIFIER.match(line)
+                if found:
+                    classes.append((indent, found[1]['name']))
             
             # Check for decorators
             decorator_lines = []
             original_i = i
-            while i < len(self.lines) and re.match(r"^\s*@", self.lines[i]):
+            while kind == 'decorator':
                 decorator_lines.append(i)
                 i += 1
+                kind = CLASSIFIER.kind(self.lines[i]) if i < len(self.lines) else None
             
             # Check for function definition after decorators
-            if i < len(self.lines):
-                match = re.match(r"^\s*(async\s+)?def\s+(\w+)\s*\(.*?\):", self.lines[i])
-                if match:
-                    name = match.group(2)
-                    start = decorator_lines[0] if decorator_lines else i
-                    indent = len(self.lines[i]) - len(self.lines[i].lstrip())
-                    j = i + 1
-                    
-                    # Find the end of the function
-                    while j < len(self.lines):
-                        line = self.lines[j]
-                        if line.strip() == "":
-                            j += 1
-                            continue
-                        line_indent = len(line) - len(line.lstrip())
-                        if line_indent <= indent:
-                            break
+            found = CLASSIFIER.match(self.lines[i]) if kind == 'function' else None
+            if found:
+                name = '.'.join([c for _, c in classes] + [found[1]['name']])
+                start = decorator_lines[0] if decorator_lines else i
+                indent = len(self.lines[i]) - len(self.lines[i].lstrip())
+                j = i + 1
+                
+                # Find the end of the function
+                while j < len(self.lines):
+                    line = self.lines[j]
+                    if line.strip() == "":
                         j += 1
-                    
-                    end = j - 1
-                    reference_map[name] = {"start": start, "end": end}
-                    i = j
-                else:
-                    i = original_i + 1
+                        continue
+                    line_indent = len(line) - len(line.lstrip())
+                    if line_indent <= indent:
+                        break
+                    j += 1
+                
+                end = j - 1
+                reference_map[name] = {"start": start, "end": end}
+                i = j
             else:
                 i = original_i + 1
         
         return reference_map
-    def replace_method(self, method_name, new_code):
-        if method_name not in self.reference_map:
-            raise ValueError(f"Function '{method_name}' not found.")
-        start = self.reference_map[method_name]["start"]
-        end = self.reference_map[method_name]["end"]
-        new_lines = new_code.strip('\n').splitlines()
-        self.lines[start:end+1] = new_lines
-        shift = len(new_lines) - (end - start + 1)
-        for name, pos in self.reference_map.items():
-            if pos['start'] > end:
-                pos['start'] += shift
-                pos['end'] += shift
-        self.reference_map[method_name]["end"] = start + len(new_lines) - 1
 
-    def save(self, output_path=None):
-        path = output_path or self.filepath
-        with open(path, 'w') as f:
-            f.write('\n'.join(self.lines) + '\n')
+    _parse = _parse_methods
+
+    def _closes_enclosing(self, lines):
+        # Code left of the first line may end the class around it
+        first = None
+        for line in lines:
+            indent = _code_indent(line)
+            if first is None:
+                first = indent
+            elif indent is not None and indent < first:
+                return True
+        return False
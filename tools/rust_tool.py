@@ -1,89 +1,60 @@
-import re
+from .brace_scanner import BraceScanner, block_end, nesting
+from .line_classifier import LineClassifier
+from .line_editor import LineEditor
 
-class CodeCRISPR:
-    def __init__(self, filepath):
-        self.filepath = filepath
-        self.lines = self._read_file()
-        self.reference_map = self._parse_functions()
+# char_quote tells char literals ('{') apart from lifetimes ('a)
+SCANNER = BraceScanner(quotes=('"',), char_quote="'")
 
-    def _read_file(self):
-        with open(self.filepath, 'r') as f:
-            return f.read().splitlines()
+CLASSIFIER = LineClassifier([
+    ('impl', r"^\s*impl(?:<.*?>)?\s+(?:\w+\s+for\s+)?(?P<type>\w+)"),
+    # Inline modules; `mod name;` only declares a file
+    ('module', r"^\s*(?:pub(?:\(.*?\))?\s+)?mod\s+(?P<type>\w+)\s*\{"),
+    # Free functions and methods (async, const, pub, etc.)
+    ('function', r"^\s*(?:pub(?:\(.*?\))?\s+)?(?:async\s+)?(?:const\s+)?(?:unsafe\s+)?fn\s+(?P<name>\w+)\s*(?:<.*?>)?\s*\(.*?\)(?:\s*->\s*[^{]+)?\s*\{"),
+], keywords=('fn', 'impl', 'mod'))
+
+class CodeCRISPR(LineEditor):
+    not_found_message = "Rust function '{name}' not found."
+    qualifier = '::'
 
     def _parse_functions(self):
-        # Enhanced patterns for Rust functions and methods
-        patterns = [
-            # Free functions (async, const, pub, etc.)
-            re.compile(r"^\s*(?:pub(?:\(.*?\))?\s+)?(?:async\s+)?(?:const\s+)?(?:unsafe\s+)?fn\s+(\w+)\s*(?:<.*?>)?\s*\(.*?\)(?:\s*->\s*[^{]+)?\s*\{"),
-            # Methods in impl blocks
-            re.compile(r"^\s*(?:pub(?:\(.*?\))?\s+)?(?:async\s+)?(?:const\s+)?(?:unsafe\s+)?fn\s+(\w+)\s*(?:<.*?>)?\s*\(.*?\)(?:\s*->\s*[^{]+)?\s*\{"),
-        ]
-        
         reference_map = {}
+        scan = SCANNER.scan(self.lines)
         i = 0
-        in_impl = False
-        impl_type = ""
+        # Enclosing modules and impls as (name, end line), innermost last
+        scopes = []
         
         while i < len(self.lines):
             line = self.lines[i]
-            
-            # Track impl blocks
-            impl_match = re.match(r"^\s*impl(?:<.*?>)?\s+(?:(\w+)\s+for\s+)?(\w+)", line)
-            if impl_match:
-                in_impl = True
-                impl_type = impl_match.group(2)
+            if not scan.in_code[i]:
                 i += 1
                 continue
             
-            # Check if leaving impl block
-            if in_impl and line.strip() == "}" and self.lines[i-1].strip() != "}":
-                in_impl = False
-                impl_type = ""
+            while scopes and scopes[-1][1] < i:
+                scopes.pop()
+            found = CLASSIFIER.match(line)
             
-            # Match functions
-            for pattern in patterns:
-                match = pattern.match(line)
-                if match:
-                    name = match.group(1)
-                    # If in impl block, prefix with type name
-                    if in_impl and impl_type:
-                        name = f"{impl_type}::{name}"
-                    
-                    start = i
-                    brace_count = 0
-                    j = i
-                    
-                    # Count braces to find the end
-                    while j < len(self.lines):
-                        brace_count += self.lines[j].count("{")
-                        brace_count -= self.lines[j].count("}")
-                        if brace_count == 0 and j > i:
-                            break
-                        j += 1
-                    
-                    end = j
-                    reference_map[name] = {"start": start, "end": end}
-                    i = end + 1
-                    break
+            # Track modules and impl blocks; the body may open on a later line (where clauses)
+            if found and found[0] in ('impl', 'module'):
+                j = i
+                while j < len(self.lines) - 1 and scan.ends[j] < 0:
+                    j += 1
+                scopes.append((found[1]['type'], block_end(scan, j)))
+                i += 1
+                continue
+            
+            # Match functions, prefixed with the enclosing modules and type
+            if found:
+                name = '::'.join([n for n, _ in scopes] + [found[1]['name']])
+                end = block_end(scan, i)
+                reference_map[name] = {"start": i, "end": end}
+                i = end + 1
             else:
                 i += 1
         
         return reference_map
-    def replace_method(self, name, new_code):
-        if name not in self.reference_map:
-            raise ValueError(f"Rust function '{name}' not found.")
-        start = self.reference_map[name]['start']
-        end = self.reference_map[name]['end']
-        new_lines = new_code.strip('\n').splitlines()
-        self.lines[start:end + 1] = new_lines
-        shift = len(new_lines) - (end - start + 1)
-        for k, v in self.reference_map.items():
-            if v['start'] > end:
-                v['start'] += shift
-                v['end'] += shift
-        self.reference_map[name]['end'] = start + len(new_lines) - 1
 
-    def save(self, output_path=None):
-        path = output_path or self.filepath
-        with open(path, "w") as f:
-            f.write("\n".join(self.lines) + "\n")
+    _parse = _parse_functions
+
+    def _nesting(self, lines):
+        return nesting(SCANNER.scan(lines))
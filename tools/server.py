@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+Persistent server mode for CodeCRISPR
+
+Keeps parsed editors resident between calls so repeated inspect, preview and
+replace requests against the same files skip interpreter startup, tool
+loading, reading and parsing. Requests are JSON-RPC 2.0 objects, one per
+line, read from stdin or from a local Unix socket.
+"""
+import io
+import json
+import os
+import stat
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import redirect_stdout
+
+import codecrispr
+
+
+# Error code for an edit whose block changed underneath it (a stale if_hash
+# or a concurrent writer)
+CONFLICT = -32001
+
+# JSON type of every parameter a method takes; the optional ones may be null
+PARAM_TYPES = {'path': str, 'name': str, 'code': str, 'if_hash': str, 'preview': bool, 'updates': list}
+OPTIONAL_PARAMS = ('if_hash', 'preview')
+JSON_TYPES = {str: 'a string', bool: 'a boolean', list: 'an array'}
+
+
+class RequestError(Exception):
+    """Error reported back to the client as a JSON-RPC error object"""
+    def __init__(self, message, code=-32000):
+        super().__init__(message)
+        self.code = code
+
+
+class EditorCache:
+    """LRU of parsed editors keyed by absolute path, validated by mtime and size"""
+
+    def __init__(self, config, max_editors=32):
+        self.config = config
+        self.max_editors = max_editors
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _stamp(path):
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+
+    def get(self, path):
+        path = os.path.abspath(path)
+        try:
+            stamp = self._stamp(path)
+        except OSError:
+            self.entries.pop(path, None)
+            raise RequestError(f"File not found: {path}")
+
+        entry = self.entries.get(path)
+        if entry is not None and entry[0] == stamp:
+            self.entries.move_to_end(path)
+            self.hits += 1
+            return entry[1]
+
+        # Missing or changed on disk: (re)load and parse
+        self.misses += 1
+        self.entries.pop(path, None)
+        editor = _capture(codecrispr.load_editor, path, self.config)
+        self.entries[path] = (stamp, editor)
+        while len(self.entries) > self.max_editors:
+            self.entries.popitem(last=False)
+        return editor
+
+    def refresh(self, path):
+        """Record the current on-disk identity after the server wrote the file"""
+        path = os.path.abspath(path)
+        if path in self.entries:
+            self.entries[path] = (self._stamp(path), self.entries[path][1])
+
+    def invalidate(self, path=None):
+        if path is None:
+            self.entries.clear()
+        else:
+            self.entries.pop(os.path.abspath(path), None)
+
+
+def _check_params(method, params):
+    """Raise RequestError -32602 unless params have the types the methods expect"""
+    if not isinstance(params, dict):
+        raise RequestError("Invalid params: expected an object", -32602)
+    for key, value in params.items():
+        expected = PARAM_TYPES.get(key)
+        if expected is None or (value is None and (key in OPTIONAL_PARAMS or method == 'invalidate')):
+            continue
+        if not isinstance(value, expected):
+            raise RequestError(f"Invalid params: '{key}' must be {JSON_TYPES[expected]}", -32602)
+    for i, item in enumerate(params.get('updates') or ()):
+        if (not isinstance(item, dict) or not isinstance(item.get('method'), str)
+                or not isinstance(item.get('code'), str)
+                or not isinstance(item.get('if_hash', ''), (str, type(None)))):
+            raise RequestError(f"Invalid params: update #{i} needs a string 'method' and 'code'", -32602)
+
+
+def _capture(func, *args):
+    """Run a core helper, turning its printed errors and exits into RequestError"""
+    buf = io.StringIO()
+    try:
+        with redirect_stdout(buf):
+            return func(*args)
+    except SystemExit:
+        lines = [l for l in buf.getvalue().splitlines() if l.startswith('[ERROR]')]
+        message = lines[-1][len('[ERROR] '):] if lines else f"{func.__name__} failed"
+        raise RequestError(message)
+
+
+class CodeCRISPRServer:
+    """Dispatches JSON-RPC requests against a shared EditorCache"""
+
+    def __init__(self, config):
+        self.config = config
+        max_editors = config.getint('server', 'max_editors', fallback=32)
+        self.cache = EditorCache(config, max_editors)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.total_ms = 0.0
+        self.running = True
+
+    # --- methods -----------------------------------------------------------
+
+    def inspect(self, path):
+        editor = self.cache.get(path)
+        blocks = {}
+        hashes = codecrispr.block_hashes(editor)
+        for name, start, end in codecrispr.block_spans(editor.reference_map):
+            if start is not None:
+                blocks[name] = {
+                    'start': start,
+                    'end': end,
+                    getattr(editor, 'span_unit', 'lines'): end - start + 1,
+                    'hash': hashes.get(name)
+                }
+            else:
+                blocks[name] = {}
+        return {
+            'file': path,
+            'language': codecrispr.detect_language(path),
+            'blocks': blocks
+        }
+
+    def preview(self, path, name):
+        editor = self.cache.get(path)
+        if name not in editor.reference_map:
+            raise RequestError(codecrispr.missing_block_message(editor.reference_map, name))
+        block = editor.reference_map[name]
+        if hasattr(editor, 'lines'):
+            code = '\n'.join(editor.lines[block['start']:block['end'] + 1])
+        else:
+            code = editor.reference_map.read(name).decode('utf-8', 'surrogateescape')
+        return {
+            'name': name,
+            'start': block['start'],
+            'end': block['end'],
+            'code': code
+        }
+
+    def replace(self, path, name, code, preview=False, if_hash=None):
+        editor = self.cache.get(path)
+        code = code.strip('`')
+        if if_hash is not None:
+            try:
+                codecrispr.check_block_hash(editor, name, if_hash)
+            except codecrispr.ConflictError as e:
+                raise RequestError(str(e), CONFLICT)
+        if preview:
+            if name not in editor.reference_map:
+                raise RequestError(codecrispr.missing_block_message(editor.reference_map, name, 'Method'))
+            original = codecrispr.block_lines(editor, name)
+            return {'diff': codecrispr.generate_diff(original, code.splitlines(), config=self.config)}
+        try:
+            base = codecrispr.block_hash(editor, name) if name in editor.reference_map else None
+            changed = editor.replace_method(name, code)
+        except Exception as e:
+            raise RequestError(f"Failed to replace method: {e}")
+        if changed is False:
+            return {'unchanged': name}
+        self._write(path, editor, [(name, code, base)])
+        return {'updated': name}
+
+    def batch(self, path, updates, preview=False):
+        editor = self.cache.get(path)
+        triples = [(item['method'], item['code'], item.get('if_hash')) for item in updates]
+        if preview:
+            try:
+                patch, report = _capture(codecrispr.batch_patch, editor, triples, path, self.config)
+            finally:
+                if not hasattr(editor, 'lines'):
+                    # Byte-span editors now hold the previewed replacements
+                    self.cache.invalidate(path)
+            return {
+                'patch': ''.join(line + '\n' for line in patch),
+                'updated': report['changed'],
+                'unchanged': report['unchanged'],
+                'failed': [{'method': m, 'error': e} for m, e in report['failed']],
+                'skipped': report['skipped'],
+                'superseded': [{'method': m, 'by': outer} for m, outer in report['superseded']],
+            }
+        unchanged, applied = [], []
+        successful, failed = _capture(codecrispr.batch_replace_methods, editor, triples, unchanged, applied)
+        if successful:
+            self._write(path, editor, applied)
+        done = set(successful) | set(unchanged) | set(dict(failed))
+        return {
+            'updated': successful,
+            'unchanged': unchanged,
+            'failed': [{'method': m, 'error': e} for m, e in failed],
+            'skipped': [m for m, _, _ in triples if m not in done]
+        }
+
+    def invalidate(self, path=None):
+        self.cache.invalidate(path)
+        return {'cached': len(self.cache.entries)}
+
+    def stats(self):
+        return {
+            'requests': self.requests,
+            'cached': len(self.cache.entries),
+            'hits': self.cache.hits,
+            'misses': self.cache.misses,
+            'mean_ms': round(self.total_ms / self.requests, 3) if self.requests else 0.0
+        }
+
+    def shutdown(self):
+        self.running = False
+        return {'shutdown': True}
+
+    def _write(self, path, editor, edits):
+        buf = io.StringIO()
+        try:
+            with redirect_stdout(buf):
+                ok = codecrispr.write_editor(editor, path, self.config, edits)
+        except codecrispr.ConflictError as e:
+            self.cache.invalidate(path)
+            raise RequestError(str(e), CONFLICT)
+        if not ok:
+            # The in-memory copy no longer matches the file
+            self.cache.invalidate(path)
+            raise RequestError(buf.getvalue().strip() or "Failed to save changes to file.")
+        self.cache.refresh(path)
+
+    # --- dispatch ----------------------------------------------------------
+
+    METHODS = ('inspect', 'preview', 'replace', 'batch', 'invalidate', 'stats', 'shutdown')
+
+    def handle(self, line):
+        """Handle one JSON-RPC request line and return the response object"""
+        started = time.perf_counter()
+        request_id = None
+        try:
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                raise RequestError(f"Parse error: {e}", -32700)
+            if not isinstance(request, dict) or 'method' not in request:
+                raise RequestError("Invalid request", -32600)
+            request_id = request.get('id')
+            method = request['method']
+            if method not in self.METHODS:
+                raise RequestError(f"Method not found: {method}", -32601)
+            params = request.get('params') or {}
+            _check_params(method, params)
+            with self.lock:
+                try:
+                    result = getattr(self, method)(**params)
+                except TypeError as e:
+                    raise RequestError(f"Invalid params: {e}", -32602)
+            response = {'jsonrpc': '2.0', 'id': request_id, 'result': result}
+        except RequestError as e:
+            response = {'jsonrpc': '2.0', 'id': request_id,
+                        'error': {'code': e.code, 'message': str(e)}}
+        except Exception as e:
+            # One bad request must not take down the server
+            response = {'jsonrpc': '2.0', 'id': request_id,
+                        'error': {'code': -32000, 'message': f"{type(e).__name__}: {e}"}}
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.requests += 1
+        self.total_ms += elapsed_ms
+        response['elapsed_ms'] = round(elapsed_ms, 3)
+        return response
+
+
+def _serve_stream(server, reader, writer):
+    for line in reader:
+        if not line.strip():
+            continue
+        response = server.handle(line)
+        writer.write(json.dumps(response) + '\n')
+        writer.flush()
+        if not server.running:
+            break
+
+
+def serve(config, socket_path=None):
+    """Serve requests on stdio, or on a Unix socket when socket_path is given"""
+    server = CodeCRISPRServer(config)
+
+    if socket_path is None:
+        # Anything the core helpers print must not corrupt the protocol stream
+        with redirect_stdout(sys.stderr):
+            _serve_stream(server, sys.stdin, sys.__stdout__)
+        return
+
+    import socketserver
+
+    socket_path = os.path.expanduser(socket_path)
+    _remove_socket(socket_path)
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            reader = io.TextIOWrapper(self.rfile, encoding='utf-8')
+            writer = io.TextIOWrapper(self.wfile, encoding='utf-8', write_through=True)
+            _serve_stream(server, reader, writer)
+            if not server.running:
+                threading.Thread(target=listener.shutdown, daemon=True).start()
+
+    class Listener(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+
+    listener = Listener(socket_path, Handler)
+    print(f"[SERVER] Listening on {socket_path}", file=sys.stderr)
+    try:
+        listener.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        listener.server_close()
+        _remove_socket(socket_path)
+
+
+def _remove_socket(path):
+    """Unlink a leftover socket at path; refuse to delete anything else"""
+    try:
+        mode = os.lstat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise FileExistsError(f"Not a socket: {path}")
+    os.remove(path)
@@ -1,23 +1,20 @@
-import re
+from .line_classifier import LineClassifier
+from .line_editor import LineEditor
 
-class CodeCRISPR:
-    def __init__(self, filepath):
-        self.filepath = filepath
-        self.lines = self._read_file()
-        self.reference_map = self._parse_functions()
+CLASSIFIER = LineClassifier([
+    ('function', r'^\s*(?P<name>\w+)\s*\(\)\s*\{\s*$'),
+], keywords=('()',))
 
-    def _read_file(self):
-        with open(self.filepath, 'r') as f:
-            return f.read().splitlines()
+class CodeCRISPR(LineEditor):
+    not_found_message = "Shell function '{name}' not found."
 
     def _parse_functions(self):
-        pattern = re.compile(r'^\s*(\w+)\s*\(\)\s*\{\s*$')
         reference_map = {}
         i = 0
         while i < len(self.lines):
-            match = pattern.match(self.lines[i])
-            if match:
-                name = match.group(1)
+            found = CLASSIFIER.match(self.lines[i])
+            if found:
+                name = found[1]['name']
                 start = i
                 brace_count = 0
                 j = i
@@ -35,21 +32,4 @@ class CodeCRISPR:
                 i += 1
         return reference_map
 
-    def replace_method(self, name, new_code):
-        if name not in self.reference_map:
-            raise ValueError(f"Shell function '{name}' not found.")
-        start = self.reference_map[name]["start"]
-        end = self.reference_map[name]["end"]
-        new_lines = new_code.strip('\n').splitlines()
-        self.lines[start:end+1] = new_lines
-        shift = len(new_lines) - (end - start + 1)
-        for k, bounds in self.reference_map.items():
-            if bounds['start'] > end:
-                bounds['start'] += shift
-                bounds['end'] += shift
-        self.reference_map[name]["end"] = start + len(new_lines) - 1
-
-    def save(self, output_path=None):
-        path = output_path or self.filepath
-        with open(path, 'w') as f:
-            f.write('\n'.join(self.lines) + '\n')
\ No newline at end of file
+    _parse = _parse_functions
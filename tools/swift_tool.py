@@ -1,23 +1,41 @@
-import re
+from .line_classifier import LineClassifier
+from .line_editor import LineEditor
 
-class MethodEditor:
-    def __init__(self, filepath):
-        self.filepath = filepath
-        self.lines = self._read_file()
-        self.reference_map = self._parse_functions()
+CLASSIFIER = LineClassifier([
+    # Types and extensions, whose methods are named Type.method (not `class func`)
+    ('type', r'^\s*(?:(?:public|private|fileprivate|internal|open|final)\s+)*(?:class|struct|enum|extension|protocol|actor)\s+(?!(?:func|var|let)\b)(?P<type>\w+)'),
+    ('function', r'^\s*(?:override\s+)?func\s+(?P<name>\w+)\s*\([^)]*\)\s*(?:->\s*\w+)?\s*\{'),
+], keywords=('func', 'class', 'struct', 'enum', 'extension', 'protocol', 'actor'))
 
-    def _read_file(self):
-        with open(self.filepath, 'r') as f:
-            return f.read().splitlines()
+def _type_end(lines, i):
+    """Line closing a type whose header is line i, counting braces from its first `{`"""
+    brace_count = 0
+    opened = False
+    for j in range(i, len(lines)):
+        brace_count += lines[j].count('{')
+        brace_count -= lines[j].count('}')
+        opened = opened or '{' in lines[j]
+        if opened and brace_count <= 0:
+            return j
+    return len(lines)
+
+class CodeCRISPR(LineEditor):
+    not_found_message = "Function '{name}' not found."
+    qualifier = '.'
 
     def _parse_functions(self):
-        pattern = re.compile(r'^\s*(?:override\s+)?func\s+(\w+)\s*\([^)]*\)\s*(?:->\s*\w+)?\s*\{')
         reference_map = {}
         i = 0
+        # Enclosing types as (name, end line), innermost last
+        types = []
         while i < len(self.lines):
-            match = pattern.match(self.lines[i])
-            if match:
-                name = match.group(1)
+            while types and types[-1][1] < i:
+                types.pop()
+            found = CLASSIFIER.match(self.lines[i])
+            if found and found[0] == 'type':
+                types.append((found[1]['type'], _type_end(self.lines, i)))
+            elif found:
+                name = '.'.join([t for t, _ in types] + [found[1]['name']])
                 start = i
                 brace_count = 0
                 while i < len(self.lines):
@@ -31,21 +49,17 @@ class MethodEditor:
             i += 1
         return reference_map
 
-    def replace_method(self, method_name, new_code):
-        if method_name not in self.reference_map:
-            raise ValueError(f"Function '{method_name}' not found.")
-        start = self.reference_map[method_name]["start"]
-        end = self.reference_map[method_name]["end"]
-        new_lines = new_code.strip("\n").splitlines()
-        self.lines[start:end + 1] = new_lines
-        shift = len(new_lines) - (end - start + 1)
-        for name, pos in self.reference_map.items():
-            if pos["start"] > end:
-                pos["start"] += shift
-                pos["end"] += shift
-        self.reference_map[method_name]["end"] = start + len(new_lines) - 1
-
-    def save(self, output_path=None):
-        path = output_path or self.filepath
-        with open(path, "w") as f:
-            f.write("\n".join(self.lines) + "\n")
\ No newline at end of file
+    _parse = _parse_functions
+
+    def _nesting(self, lines):
+        # Braces closing what was open before lines, and braces left open
+        depth = lowest = 0
+        for line in lines:
+            depth -= line.count('}')
+            lowest = min(lowest, depth)
+            depth += line.count('{')
+        return -lowest, depth - lowest
+
+
+# Alias for backwards compatibility
+MethodEditor = CodeCRISPR
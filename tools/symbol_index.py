@@ -0,0 +1,177 @@
+"""
+Repository-wide symbol index for CodeCRISPR
+
+Walks a directory tree, parses every supported file with its language tool
+and records each block in a SQLite database, so `--where NAME` can answer
+"which file defines NAME" without inspecting files one by one. Re-indexing
+only re-parses files whose size or mtime changed.
+"""
+import os
+import sqlite3
+import time
+
+import codecrispr
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    language TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS blocks (
+    name TEXT NOT NULL,
+    qualified_name TEXT NOT NULL,
+    file TEXT NOT NULL REFERENCES files(path) ON DELETE CASCADE,
+    language TEXT NOT NULL,
+    start INTEGER,
+    end INTEGER,
+    hash TEXT
+);
+CREATE INDEX IF NOT EXISTS blocks_name ON blocks(name);
+CREATE INDEX IF NOT EXISTS blocks_qualified_name ON blocks(qualified_name);
+CREATE INDEX IF NOT EXISTS blocks_file ON blocks(file);
+"""
+
+
+def connect(db_path):
+    db_path = os.path.expanduser(db_path)
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA foreign_keys=ON')
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def short_name(qualified_name, qualifier='::'):
+    """`Type::method` -> `method` (`Type.method` with qualifier '.'); unqualified names are returned unchanged"""
+    return qualified_name.rsplit(qualifier, 1)[-1]
+
+
+def walk_sources(root, exclude_dirs):
+    """Yield (path, tool_name, size, mtime_ns) for every file with a known extension"""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d not in exclude_dirs and not d.startswith('.')]
+        for filename in filenames:
+            ext = os.path.splitext(filename)[1]
+            tool_name = codecrispr.LANGUAGE_MAP.get(ext) or codecrispr.LANGUAGE_MAP.get(ext.lower())
+            if tool_name is None:
+                continue
+            path = os.path.join(dirpath, filename)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            yield path, tool_name, st.st_size, st.st_mtime_ns
+
+
+def parse_file(job):
+    """Parse one file and return its block rows; runs in a worker process"""
+    path, tool_name = job
+    try:
+        module = codecrispr.load_tool_module(tool_name)
+        editor = module.CodeCRISPR(path)
+    except Exception as e:
+        return path, None, str(e)
+
+    # Byte spans (JSON) are not line numbers and are left out
+    by_line = getattr(editor, 'span_unit', 'lines') == 'lines'
+    hashes = codecrispr.block_hashes(editor) if by_line and hasattr(editor, 'lines') else {}
+    qualifier = getattr(editor, 'qualifier', None) or '::'
+    rows = []
+    for name, start, end in codecrispr.block_spans(editor.reference_map):
+        if not by_line:
+            start = end = None
+        rows.append((short_name(name, qualifier), name, path, tool_name, start, end, hashes.get(name)))
+    return path, rows, None
+
+
+def build_index(root, db_path, workers=None, exclude_dirs=()):
+    """Index root incrementally and return a summary dictionary"""
+    from concurrent.futures import ProcessPoolExecutor
+
+    started = time.perf_counter()
+    root = os.path.abspath(root)
+    conn = connect(db_path)
+
+    known = {}
+    prefix = root.rstrip(os.sep) + os.sep
+    for path, size, mtime_ns in conn.execute(
+            "SELECT path, size, mtime_ns FROM files WHERE substr(path, 1, ?) = ?",
+            (len(prefix), prefix)):
+        known[path] = (size, mtime_ns)
+
+    seen = set()
+    stale = []
+    scanned = 0
+    for path, tool_name, size, mtime_ns in walk_sources(root, set(exclude_dirs)):
+        scanned += 1
+        seen.add(path)
+        if known.get(path) != (size, mtime_ns):
+            stale.append((path, tool_name, size, mtime_ns))
+
+    removed = [path for path in known if path not in seen]
+    errors = []
+    blocks = 0
+
+    with conn:
+        conn.executemany("DELETE FROM files WHERE path = ?", [(p,) for p in removed])
+
+        jobs = [(path, tool_name) for path, tool_name, _, _ in stale]
+        meta = {path: (tool_name, size, mtime_ns) for path, tool_name, size, mtime_ns in stale}
+        workers = max(1, min(workers or os.cpu_count() or 1, len(jobs) or 1))
+        if workers == 1:
+            results = map(parse_file, jobs)
+            pool = None
+        else:
+            pool = ProcessPoolExecutor(max_workers=workers, initializer=codecrispr.register_tools)
+            results = pool.map(parse_file, jobs, chunksize=max(1, min(64, len(jobs) // (workers * 4) or 1)))
+        try:
+            for path, rows, error in results:
+                tool_name, size, mtime_ns = meta[path]
+                conn.execute("DELETE FROM files WHERE path = ?", (path,))
+                if error is not None:
+                    # Leave the file unindexed so the next run retries it
+                    errors.append({'file': path, 'error': error})
+                    continue
+                conn.execute("INSERT INTO files VALUES (?, ?, ?, ?)", (path, tool_name, size, mtime_ns))
+                conn.executemany("INSERT INTO blocks VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+                blocks += len(rows)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+    conn.close()
+    return {
+        'root': root,
+        'scanned': scanned,
+        'reparsed': len(stale) - len(errors),
+        'removed': len(removed),
+        'blocks': blocks,
+        'errors': errors,
+        'seconds': round(time.perf_counter() - started, 3)
+    }
+
+
+def where(db_path, name):
+    """Look up blocks by short or qualified name; `*` and `?` act as wildcards"""
+    db_path = os.path.expanduser(db_path)
+    if not os.path.exists(db_path):
+        return []
+    conn = sqlite3.connect(db_path)
+    try:
+        if '*' in name or '?' in name:
+            query = ("SELECT qualified_name, file, language, start, end, hash FROM blocks "
+                     "WHERE name GLOB ? OR qualified_name GLOB ? ORDER BY file, start")
+        else:
+            query = ("SELECT qualified_name, file, language, start, end, hash FROM blocks "
+                     "WHERE name = ? OR qualified_name = ? ORDER BY file, start")
+        rows = conn.execute(query, (name, name)).fetchall()
+    finally:
+        conn.close()
+    return [
+        {'name': q, 'file': f, 'language': lang, 'start': s, 'end': e, 'hash': h}
+        for q, f, lang, s, e, h in rows
+    ]
@@ -0,0 +1,226 @@
+"""
+Chunked line buffer for CodeCRISPR editors
+
+A rope of line chunks with a Fenwick tree over the chunk lengths. Finding a
+line and splicing a block cost O(log c + chunk size) for c chunks, instead of
+moving every later line of a plain list, and the buffer is written out chunk
+by chunk without joining the whole file into one string. A buffer can also
+sit on top of a read-only line sequence, such as a memory-mapped file, and
+copy a chunk's lines out of it only when that chunk is first modified.
+"""
+from itertools import chain
+
+# Target lines per chunk; a chunk is split once it grows past twice this
+CHUNK_LINES = 512
+
+
+class _SourceChunk:
+    """Lines start..stop-1 of a read-only source, standing in for a chunk list"""
+
+    __slots__ = ('source', 'start', 'stop')
+
+    def __init__(self, source, start, stop):
+        self.source = source
+        self.start = start
+        self.stop = stop
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __iter__(self):
+        return iter(self.source[self.start:self.stop])
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, _ = key.indices(self.stop - self.start)
+            return self.source[self.start + start:self.start + max(start, stop)]
+        return self.source[self.start + key]
+
+
+class LineBuffer:
+    """List-like sequence of lines supporting fast block splices
+
+    Supports len(), iteration, integer and slice reads (slices return plain
+    lists), and slice assignment / deletion with step 1.
+    """
+
+    def __init__(self, lines=()):
+        self._load(list(lines))
+
+    def _load(self, lines):
+        self._chunks = [lines[i:i + CHUNK_LINES] for i in range(0, len(lines), CHUNK_LINES)] or [[]]
+        self._len = len(lines)
+        self._source = None
+        self._rebuild_tree()
+
+    @classmethod
+    def over(cls, source):
+        """Buffer over the read-only line sequence source, copying chunks out on first write"""
+        buf = cls.__new__(cls)
+        n = len(source)
+        buf._chunks = [_SourceChunk(source, i, min(i + CHUNK_LINES, n)) for i in range(0, n, CHUNK_LINES)] or [[]]
+        buf._len = n
+        buf._source = source
+        buf._modified = False
+        buf._rebuild_tree()
+        return buf
+
+    def _writable(self, index):
+        """Chunk index as a list, copying it out of the source if need be"""
+        chunk = self._chunks[index]
+        if self._source is not None:
+            self._modified = True
+            if not isinstance(chunk, list):
+                chunk = self._chunks[index] = list(chunk)
+        return chunk
+
+    def sequence(self):
+        """The lines as an indexable sequence for a parser to run over
+
+        A plain list, except for a buffer over a source: the source itself
+        while nothing has changed, then the buffer, so the file's text is
+        never copied out as a whole.
+        """
+        if self._source is None:
+            return list(self)
+        return self if self._modified else self._source
+
+    def _rebuild_tree(self):
+        n = len(self._chunks)
+        tree = [0] * (n + 1)
+        for i, chunk in enumerate(self._chunks, 1):
+            tree[i] += len(chunk)
+            j = i + (i & -i)
+            if j <= n:
+                tree[j] += tree[i]
+        self._tree = tree
+        self._top = 1 << (n.bit_length() - 1) if n else 0
+        # (chunk index, first line) of the last chunk read, for sequential scans
+        self._cursor = (0, 0)
+
+    def _add(self, index, delta):
+        tree = self._tree
+        i = index + 1
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+    def _locate(self, line):
+        """Return (chunk index, offset in chunk) of 0 <= line < len(self)"""
+        c, first = self._cursor
+        if first <= line < first + len(self._chunks[c]):
+            return c, line - first
+        tree = self._tree
+        pos, rem, step = 0, line, self._top
+        while step:
+            nxt = pos + step
+            if nxt < len(tree) and tree[nxt] <= rem:
+                pos = nxt
+                rem -= tree[nxt]
+            step >>= 1
+        self._cursor = (pos, line - rem)
+        return pos, rem
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        return chain.from_iterable(self._chunks)
+
+    def __repr__(self):
+        return f"LineBuffer({self._len} lines, {len(self._chunks)} chunks)"
+
+    def _bounds(self, key):
+        start, stop, step = key.indices(self._len)
+        if step != 1:
+            raise ValueError("LineBuffer slices do not support a step")
+        return start, max(start, stop)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            if key.step not in (None, 1):
+                return list(self)[key]
+            start, stop = self._bounds(key)
+            if start == stop:
+                return []
+            c, off = self._locate(start)
+            out = self._chunks[c][off:off + stop - start]
+            while len(out) < stop - start:
+                c += 1
+                out.extend(self._chunks[c][:stop - start - len(out)])
+            return out
+        if key < 0:
+            key += self._len
+        if not 0 <= key < self._len:
+            raise IndexError("LineBuffer index out of range")
+        c, off = self._locate(key)
+        return self._chunks[c][off]
+
+    def __setitem__(self, key, value):
+        if isinstance(key, slice):
+            start, stop = self._bounds(key)
+            self.splice(start, stop, list(value))
+            return
+        if key < 0:
+            key += self._len
+        if not 0 <= key < self._len:
+            raise IndexError("LineBuffer assignment index out of range")
+        c, off = self._locate(key)
+        self._writable(c)[off] = value
+
+    def __delitem__(self, key):
+        if not isinstance(key, slice):
+            key = slice(key, key + 1 if key != -1 else None)
+        start, stop = self._bounds(key)
+        self.splice(start, stop, [])
+
+    def splice(self, start, stop, new_lines):
+        """Replace lines start..stop-1 with new_lines"""
+        if start == self._len:
+            c = len(self._chunks) - 1
+            off = len(self._chunks[c])
+        else:
+            c, off = self._locate(start)
+
+        chunk = self._writable(c)
+        removed = stop - start
+        if off + removed <= len(chunk):
+            # Common case: the whole edit lies within one chunk
+            chunk[off:off + removed] = new_lines
+            self._add(c, len(new_lines) - removed)
+        else:
+            last, last_off = self._locate(stop - 1)
+            tail = self._chunks[last][last_off + 1:]
+            self._add(c, off + len(new_lines) + len(tail) - len(chunk))
+            chunk[off:] = new_lines
+            chunk.extend(tail)
+            for i in range(c + 1, last + 1):
+                self._add(i, -len(self._chunks[i]))
+                self._chunks[i] = []
+        self._len += len(new_lines) - removed
+
+        if len(chunk) > 2 * CHUNK_LINES or self._cursor[0] >= c:
+            self._cursor = (0, 0)
+        if len(chunk) > 2 * CHUNK_LINES:
+            self._rechunk()
+
+    def _rechunk(self):
+        """Split oversized chunks and drop empty ones, then rebuild the tree"""
+        chunks = []
+        for chunk in self._chunks:
+            if len(chunk) > 2 * CHUNK_LINES:
+                chunks.extend(chunk[i:i + CHUNK_LINES] for i in range(0, len(chunk), CHUNK_LINES))
+            elif chunk:
+                chunks.append(chunk)
+        self._chunks = chunks or [[]]
+        self._rebuild_tree()
+
+    def write_to(self, f, newline='\n'):
+        """Write every line followed by newline to the text file f, chunk by chunk"""
+        if not self._len:
+            f.write(newline)
+            return
+        for chunk in self._chunks:
+            if chunk:
+                f.write(newline.join(chunk))
+                f.write(newline)
@@ -0,0 +1,129 @@
+"""
+Per-phase timings for CodeCRISPR runs
+
+Code marks its phases with `phase(name)` and its counters with `note()`.
+Both do nothing unless a recorder is active, so they stay in place for
+every run; an active recorder costs two perf_counter() calls per phase.
+
+    from . import timings
+    with timings.record() as recorder:
+        editor = codecrispr.load_editor(path)
+    print(recorder.report())
+"""
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+_active = None
+
+
+def _peak_rss_kib():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KiB elsewhere
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+class Timings:
+    """Monotonic phase timings and counters for one run
+
+    A phase's time excludes the phases nested inside it, so the phases of a
+    run add up to about its total. A phase entered more than once accumulates.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self.phases = {}
+        self.counters = {}
+        # Time spent in nested phases, one entry per open phase
+        self._nested = []
+
+    def enter(self):
+        self._nested.append(0.0)
+        return time.perf_counter()
+
+    def leave(self, name, start):
+        elapsed = time.perf_counter() - start
+        nested = self._nested.pop()
+        if self._nested:
+            self._nested[-1] += elapsed
+        self.phases[name] = self.phases.get(name, 0.0) + elapsed - nested
+
+    def report(self):
+        """The run so far as a JSON-serializable dictionary"""
+        return {
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+            'seconds': round(time.perf_counter() - self._start, 6),
+            'phases': {name: round(seconds, 6) for name, seconds in self.phases.items()},
+            'counters': dict(self.counters),
+            'peak_rss_kib': _peak_rss_kib(),
+        }
+
+    def emit(self, destination='-'):
+        """Write the report as one JSON line to stderr ('-') or append it to a file"""
+        import json
+        line = json.dumps(self.report())
+        if destination == '-':
+            print(line, file=sys.stderr)
+            return
+        with open(os.path.expanduser(destination), 'a') as f:
+            f.write(line + '\n')
+
+
+def recording():
+    """Whether a recorder is active; guards counters that cost something to compute"""
+    return _active is not None
+
+
+def start():
+    """Make a new recorder active and return it"""
+    global _active
+    _active = Timings()
+    return _active
+
+
+def stop():
+    """Deactivate the active recorder and return it (None if there is none)"""
+    global _active
+    recorder, _active = _active, None
+    return recorder
+
+
+@contextmanager
+def record():
+    """Record the phases of the enclosed code, restoring any outer recorder afterwards"""
+    global _active
+    outer = _active
+    recorder = start()
+    try:
+        yield recorder
+    finally:
+        _active = outer
+
+
+@contextmanager
+def phase(name):
+    """Time the enclosed code as phase name of the active recorder"""
+    recorder = _active
+    if recorder is None:
+        yield
+        return
+    start = recorder.enter()
+    try:
+        yield
+    finally:
+        recorder.leave(name, start)
+
+
+def note(name, value, add=False):
+    """Set counter name of the active recorder to value, or add value to it"""
+    if _active is None:
+        return
+    if add:
+        value += _active.counters.get(name, 0)
+    _active.counters[name] = value
@@ -0,0 +1,375 @@
+"""
+Watch mode for CodeCRISPR
+
+Keeps an editor for every watched file and, when a file changes on disk,
+re-parses only the blocks around the changed lines. Each change is written
+to stdout as one JSON object per line (NDJSON) listing the blocks that were
+added, removed, changed or moved, so clients can keep their reference maps
+current without running --inspect again.
+
+Changes are picked up through Linux inotify where it is available, and by
+polling file stamps every `watch.interval` seconds otherwise.
+"""
+import configparser
+import json
+import os
+import select
+import struct
+import sys
+import time
+from contextlib import redirect_stdout
+
+import codecrispr
+from .line_editor import common_affixes
+from .symbol_index import walk_sources
+
+BACKENDS = ('auto', 'inotify', 'poll')
+# Quiet period that ends a burst of notifications (a checkout, a formatter run)
+SETTLE_SECONDS = 0.05
+
+# inotify(7) event bits
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_Q_OVERFLOW = 0x4000
+IN_ISDIR = 0x40000000
+_EVENT = struct.Struct('iIII')
+
+
+class Inotify:
+    """Change notifications for whole directories, through libc's inotify calls"""
+
+    MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        # AttributeError on systems without inotify
+        self._add_watch = libc.inotify_add_watch
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.fd = fd
+        self._get_errno = ctypes.get_errno
+        self._dirs = {}
+
+    def add(self, directory):
+        wd = self._add_watch(self.fd, os.fsencode(directory), self.MASK)
+        if wd < 0:
+            raise OSError(self._get_errno(), f"Cannot watch {directory}")
+        self._dirs[wd] = directory
+
+    def wait(self, timeout=None):
+        """Paths changed in the watched directories, or None if events were lost
+
+        Blocks until the first event (or timeout seconds), then keeps reading
+        until no event has arrived for SETTLE_SECONDS.
+        """
+        paths = set()
+        while select.select([self.fd], [], [], timeout)[0]:
+            try:
+                data = os.read(self.fd, 1 << 16)
+            except BlockingIOError:
+                break
+            pos = 0
+            while pos < len(data):
+                wd, mask, _, size = _EVENT.unpack_from(data, pos)
+                name = data[pos + _EVENT.size:pos + _EVENT.size + size].rstrip(b'\0')
+                pos += _EVENT.size + size
+                if mask & IN_Q_OVERFLOW:
+                    return None
+                directory = self._dirs.get(wd)
+                if directory is not None and name:
+                    paths.add(os.path.join(directory, os.fsdecode(name)))
+            timeout = SETTLE_SECONDS
+        return paths
+
+    def close(self):
+        os.close(self.fd)
+
+
+def _stamp(path):
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+
+def spans(editor):
+    """name -> (start, end) for every block with a position"""
+    return {name: (start, end) for name, start, end in codecrispr.block_spans(editor.reference_map)
+            if start is not None}
+
+
+def block_delta(old, new, old_hashes, new_hashes):
+    """Compare two span maps and the content hashes of their blocks
+
+    A block whose content hash differs changed; one with the same content at
+    another span moved, wherever the edit was. Moves are reported as runs:
+    every block that started in from..to (old positions) and is not listed
+    as changed or removed moved by the same amount.
+    """
+    added = [{'name': name, 'start': s, 'end': e} for name, (s, e) in new.items() if name not in old]
+    removed = [name for name in old if name not in new]
+    changed = []
+    moves = {}
+    for name, (s, e) in new.items():
+        span = old.get(name)
+        if span is None:
+            continue
+        if old_hashes.get(name) != new_hashes.get(name):
+            changed.append({'name': name, 'start': s, 'end': e})
+        elif s != span[0]:
+            moves[name] = s - span[0]
+    moved = []
+    run = None
+    for start, end, name in sorted((s, e, name) for name, (s, e) in old.items()):
+        delta = moves.get(name)
+        if delta is not None:
+            if run is not None and run['lines'] == delta:
+                run['to'] = start
+            else:
+                run = {'from': start, 'to': start, 'lines': delta}
+                moved.append(run)
+        elif new.get(name) == (start, end):
+            # A block that stayed put ends the run
+            run = None
+    return {'added': added, 'removed': removed, 'changed': changed, 'moved': moved}
+
+
+def rehash(editor, old, new, old_hashes, first, last, shift):
+    """Content hashes for the span map new, given that old positions first..last were rewritten
+
+    Positions after the rewritten range moved by shift. A block that kept
+    clear of that range and moved with the text around it still has its old
+    content, so only the blocks inside or across the range are hashed again.
+    """
+    hashes = {}
+    for name, (s, e) in new.items():
+        span = old.get(name)
+        if span is not None and name in old_hashes and (span[1] < first or span[0] > last):
+            expected = shift if span[0] > last else 0
+            if (s - span[0], e - span[1]) == (expected, expected):
+                hashes[name] = old_hashes[name]
+                continue
+        hashes[name] = codecrispr.block_hash(editor, name)
+    return hashes
+
+
+class _Watched:
+    """A watched file: its stamp, editor, block spans and hashes and (for byte tools) content"""
+
+    __slots__ = ('stamp', 'editor', 'spans', 'hashes', 'data')
+
+    def __init__(self, stamp, editor, data=None):
+        self.stamp = stamp
+        self.editor = editor
+        self.spans = spans(editor)
+        self.hashes = codecrispr.block_hashes(editor)
+        self.data = data
+
+
+class Watcher:
+    """Tracks files and directory trees and reports block changes as NDJSON"""
+
+    def __init__(self, config, paths, out=None):
+        # Watched files are held in memory: a mapped file rewritten in place
+        # could not be compared with its previous version
+        self.config = configparser.ConfigParser()
+        self.config.read_dict(config)
+        self.config.set('editor', 'mmap_threshold_mb', '0')
+        self.out = out or sys.stdout
+        self.interval = config.getfloat('watch', 'interval', fallback=0.5)
+        self.backend = config.get('watch', 'backend', fallback='auto')
+        if self.backend not in BACKENDS:
+            raise ValueError(f"watch.backend must be one of {', '.join(BACKENDS)}")
+        self.exclude = {d.strip() for d in config.get('index', 'exclude_dirs', fallback='').split(',') if d.strip()}
+        self.roots = [os.path.abspath(p) for p in paths if os.path.isdir(p)]
+        self.explicit = {os.path.abspath(p) for p in paths if not os.path.isdir(p)}
+        self.files = {}
+        self.inotify = None
+
+    def emit(self, event):
+        self.out.write(json.dumps(event) + '\n')
+        self.out.flush()
+
+    # Editors
+
+    def _load(self, path):
+        tool_name = codecrispr.detect_language(path)
+        module = codecrispr.load_tool_module(tool_name)
+        if hasattr(module.CodeCRISPR, 'from_config'):
+            return module.CodeCRISPR.from_config(path, self.config)
+        return module.CodeCRISPR(path)
+
+    @staticmethod
+    def _content(editor, path):
+        # Byte-span documents are compared by content; their mapping may
+        # change underneath them, so a copy is kept
+        if hasattr(editor.reference_map, 'write_to'):
+            with open(path, 'rb') as f:
+                return f.read()
+        return None
+
+    def _open(self, path, stamp):
+        editor = self._load(path)
+        entry = _Watched(stamp, editor, self._content(editor, path))
+        self.files[path] = entry
+        return entry
+
+    def _update(self, path, entry, stamp):
+        """Bring entry up to date; return the block delta, or None if nothing changed"""
+        old = entry.spans
+        entry.stamp = stamp
+        if hasattr(entry.editor, 'reload'):
+            region = entry.editor.reload()
+            if region is None:
+                return None
+            first, last, shift = region
+        else:
+            editor = self._load(path)
+            data = self._content(editor, path)
+            first, last, shift = 0, float('inf'), 0
+            if entry.data is not None and data is not None:
+                prefix, suffix = common_affixes(entry.data, data)
+                if prefix == len(entry.data) == len(data):
+                    return None
+                first, last = prefix, len(entry.data) - suffix - 1
+                shift = len(data) - len(entry.data)
+            entry.editor, entry.data = editor, data
+        old_hashes = entry.hashes
+        entry.spans = spans(entry.editor)
+        entry.hashes = rehash(entry.editor, old, entry.spans, old_hashes, first, last, shift)
+        return block_delta(old, entry.spans, old_hashes, entry.hashes)
+
+    def check(self, path, announce=True):
+        """Compare path with its last known state and report any change"""
+        try:
+            stamp = _stamp(path)
+        except OSError:
+            if self.files.pop(path, None) is not None:
+                self.emit({'event': 'deleted', 'file': path})
+            return
+        entry = self.files.get(path)
+        if entry is not None and entry.stamp == stamp:
+            return
+        started = time.perf_counter()
+        try:
+            if entry is None:
+                entry = self._open(path, stamp)
+                if not announce:
+                    return
+                event = {'event': 'created', 'file': path,
+                         'blocks': [{'name': n, 'start': s, 'end': e} for n, (s, e) in entry.spans.items()]}
+            else:
+                delta = self._update(path, entry, stamp)
+                if delta is None or not any(delta.values()):
+                    return
+                event = dict({'event': 'changed', 'file': path}, **delta)
+        except Exception as e:
+            self.files.pop(path, None)
+            self.emit({'event': 'error', 'file': path, 'error': str(e)})
+            return
+        event['unit'] = getattr(entry.editor, 'span_unit', 'lines')
+        event['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 3)
+        self.emit(event)
+
+    # Discovery
+
+    def _excluded(self, path):
+        """Whether a path under a root lies in a hidden or excluded directory"""
+        for root in self.roots:
+            if path.startswith(root + os.sep):
+                parts = os.path.relpath(os.path.dirname(path), root).split(os.sep)
+                return any(p in self.exclude or (p.startswith('.') and p != '.') for p in parts)
+        return True
+
+    def _wanted(self, path):
+        if path in self.explicit:
+            return True
+        ext = os.path.splitext(path)[1]
+        if not (codecrispr.LANGUAGE_MAP.get(ext) or codecrispr.LANGUAGE_MAP.get(ext.lower())):
+            return False
+        return not self._excluded(path)
+
+    def _directories(self, root):
+        for dirpath, dirnames, _ in os.walk(root):
+            dirnames[:] = [d for d in dirnames if d not in self.exclude and not d.startswith('.')]
+            yield dirpath
+
+    def scan(self, announce=True):
+        """Check every known file and look for new ones under the roots"""
+        for path in self.explicit:
+            self.check(path, announce)
+        for root in self.roots:
+            for path, _, _, _ in walk_sources(root, self.exclude):
+                self.check(path, announce)
+        for path in [p for p in self.files if p not in self.explicit]:
+            if not os.path.exists(path):
+                self.check(path)
+
+    def _watch_tree(self, directory):
+        """Watch directory and the directories below it; check files already there"""
+        for dirpath in self._directories(directory):
+            self.inotify.add(dirpath)
+        for path, _, _, _ in walk_sources(directory, self.exclude):
+            self.check(path)
+
+    # Main loop
+
+    def start(self):
+        if self.backend != 'poll':
+            try:
+                self.inotify = Inotify()
+                for path in self.explicit:
+                    self.inotify.add(os.path.dirname(path))
+                for root in self.roots:
+                    for dirpath in self._directories(root):
+                        self.inotify.add(dirpath)
+            except (OSError, AttributeError) as e:
+                if self.inotify is not None:
+                    self.inotify.close()
+                    self.inotify = None
+                if self.backend == 'inotify':
+                    raise OSError(f"inotify is not available: {e}") from None
+        self.scan(announce=False)
+        self.emit({'event': 'watching', 'files': len(self.files),
+                   'blocks': sum(len(entry.spans) for entry in self.files.values()),
+                   'backend': 'poll' if self.inotify is None else 'inotify'})
+
+    def step(self, timeout=None):
+        """Wait for changes once and report them"""
+        if self.inotify is None:
+            time.sleep(self.interval if timeout is None else timeout)
+            self.scan()
+            return
+        paths = self.inotify.wait(timeout)
+        if paths is None:
+            # The kernel queue overflowed and events were lost
+            self.scan()
+            return
+        for path in sorted(paths):
+            if os.path.isdir(path):
+                if not self._excluded(os.path.join(path, '')):
+                    self._watch_tree(path)
+            elif path in self.files or self._wanted(path):
+                self.check(path)
+
+    def run(self):
+        self.start()
+        try:
+            while True:
+                self.step()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if self.inotify is not None:
+                self.inotify.close()
+
+
+def watch(paths, config):
+    """Watch paths (files or directory trees) until interrupted"""
+    # Anything the core helpers print must not corrupt the event stream
+    with redirect_stdout(sys.stderr):
+        Watcher(config, paths, out=sys.__stdout__).run()
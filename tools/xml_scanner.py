@@ -0,0 +1,103 @@
+"""
+Incremental XML element indexer for the XML and SVG tools
+
+Feeds the document to expat in fixed-size chunks and records the byte span
+and path of every element, so a file of any size is indexed without
+building an ElementTree. Repeated sibling tags get a 1-based index from the
+second occurrence on (`root/item`, `root/item[2]`), so every path is unique.
+"""
+import re
+from array import array
+from xml.parsers import expat
+
+# Bytes handed to expat per call
+CHUNK_BYTES = 1 << 20
+
+# A start tag, with quoted attribute values that may contain `>`
+_START_TAG = re.compile(rb'<[^\s/>]+(?:\s+[^\s=/>]+\s*=\s*(?:"[^"]*"|\'[^\']*\'))*\s*(/?)>')
+
+
+def _id_suffix(attrs):
+    element_id = attrs.get('id')
+    return f"[id={element_id}]" if element_id else ''
+
+
+def scan_element(buf, start, end, name=None, depth=0, limit=0, id_keys=False):
+    """Index the XML element in buf[start:end] (the whole document when name is None)
+
+    Returns parallel (names, starts, ends) in document order with exclusive
+    end offsets. Elements deeper than limit (0: no limit) are parsed but not
+    indexed. With id_keys, each path segment carries the element's id as an
+    `[id=...]` suffix. Raises ValueError on malformed XML.
+    """
+    names, starts, ends = [], array('q'), array('q')
+    # Open elements: [slot, name, depth, child tag counts, has children],
+    # or None for elements past the depth limit
+    stack = []
+    parser = expat.ParserCreate()
+
+    def start_element(tag, attrs):
+        pos = start + parser.CurrentByteIndex
+        if stack:
+            parent = stack[-1]
+            if parent is None or (limit and parent[2] >= limit):
+                stack.append(None)
+                return
+            parent[4] = True
+            n = parent[3][tag] = parent[3].get(tag, 0) + 1
+            key = f"{parent[1]}/{tag}" if n == 1 else f"{parent[1]}/{tag}[{n}]"
+            level = parent[2] + 1
+        elif name is None:
+            key, level = tag, 1
+        else:
+            key, level = name, depth
+        if id_keys and (stack or name is None):
+            key += _id_suffix(attrs)
+        stack.append([len(names), key, level, {}, False])
+        names.append(key)
+        starts.append(pos)
+        ends.append(pos)
+
+    def end_element(tag):
+        frame = stack.pop()
+        if frame is None:
+            return
+        slot = frame[0]
+        pos = start + parser.CurrentByteIndex
+        if not frame[4]:
+            # `<tag/>` ends with its start tag; expat gives no position for it
+            m = _START_TAG.match(buf, starts[slot], end)
+            if m and m.group(1):
+                ends[slot] = m.end()
+                return
+        ends[slot] = buf.find(b'>', pos, end) + 1
+
+    parser.StartElementHandler = start_element
+    parser.EndElementHandler = end_element
+    try:
+        for pos in range(start, end, CHUNK_BYTES):
+            parser.Parse(buf[pos:min(pos + CHUNK_BYTES, end)], False)
+        parser.Parse(b'', True)
+    except expat.ExpatError as e:
+        raise ValueError(f"Invalid XML: {e}") from None
+    return names, starts, ends
+
+
+_SIBLING_INDEX = re.compile(r'\[\d+\]')
+
+
+def replace_element(document, path, data, id_keys=False):
+    """Splice data over the element at path in a ByteDocument built with scan_element
+
+    When the new element's tag (or id, with id_keys) differs from the old
+    one, the paths of its siblings change too, so the parent is re-indexed.
+    Returns False if the element already read data.
+    """
+    new_key = scan_element(data, 0, len(data), limit=1, id_keys=id_keys)[0][0]
+    parent, _, segment = path.rpartition('/')
+    if _SIBLING_INDEX.sub('', segment, count=1) == new_key:
+        return document.replace(path, data)
+    elif parent:
+        return document.replace(path, data, scope=parent)
+    else:
+        return document.replace(path, data, rename=new_key)
@@ -1,35 +1,27 @@
-import xml.etree.ElementTree as ET
+from .byte_document import ByteDocument
+from .xml_scanner import replace_element, scan_element
 
 class CodeCRISPR:
-    def __init__(self, filepath):
+    # Deepest element path indexed up front (0: every element); deeper ones on demand
+    index_depth = 0
+    # reference_map spans are byte offsets
+    span_unit = 'bytes'
+
+    def __init__(self, filepath, index_depth=None):
         self.filepath = filepath
-        self.tree = ET.parse(filepath)
-        self.root = self.tree.getroot()
-        self.reference_map = self._map_elements()
+        if index_depth is not None:
+            self.index_depth = index_depth
+        self.reference_map = ByteDocument(filepath, scan_element, self.index_depth, sep='/')
 
-    def _map_elements(self):
-        reference_map = {}
-        def recurse(elem, path=""):
-            tag_path = f"{path}/{elem.tag}" if path else elem.tag
-            reference_map[tag_path] = elem
-            for child in elem:
-                recurse(child, tag_path)
-        recurse(self.root)
-        return reference_map
+    @classmethod
+    def from_config(cls, filepath, config):
+        return cls(filepath, index_depth=config.getint('xml', 'index_depth', fallback=0))
 
     def replace_method(self, tag_path, new_content):
         if tag_path not in self.reference_map:
             raise ValueError(f"XML tag path '{tag_path}' not found.")
-        parent_path = '/'.join(tag_path.split('/')[:-1])
-        tag_name = tag_path.split('/')[-1]
-        parent_elem = self.reference_map.get(parent_path, self.root)
-
-        new_elem = ET.fromstring(new_content.strip())
-        for i, child in enumerate(parent_elem):
-            if child.tag == tag_name:
-                parent_elem[i] = new_elem
-                break
+        # The new element is parsed before it is spliced in, so malformed XML is rejected
+        return replace_element(self.reference_map, tag_path, new_content.strip().encode('utf-8'))
 
     def save(self, output_path=None):
-        path = output_path or self.filepath
-        self.tree.write(path, encoding='unicode', xml_declaration=True)
\ No newline at end of file
+        self.reference_map.save(output_path or self.filepath)